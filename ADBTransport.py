@@ -0,0 +1,503 @@
+import asyncio
+import queue
+import shlex
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+from typing import List, Optional, Tuple
+
+
+# adb协议命令字
+A_CNXN = 0x4e584e43
+A_AUTH = 0x48545541
+A_OPEN = 0x4e45504f
+A_OKAY = 0x59414b4f
+A_CLSE = 0x45534c43
+A_WRTE = 0x45545257
+
+# 0x01000001起双方不再校验数据校验和，发送时仍计算以兼容旧版adbd
+A_VERSION = 0x01000001
+MAX_PAYLOAD = 256 * 1024
+
+# 直连执行命令时在输出末尾追加返回码，用于取得命令的真实返回码
+EXIT_MARKER = '__WJDR_EXIT__'
+EXIT_STATUS_COMMAND = f"printf '{EXIT_MARKER}%d' $?"
+
+
+def split_exit_status(output: bytearray) -> Tuple[int, bytearray]:
+    """
+    从追加了EXIT_STATUS_COMMAND的命令输出中分离返回码
+
+    Returns:
+        (返回码, 命令本身的输出)，找不到返回码(如命令被中断)时返回码为-1
+    """
+    index = output.rfind(EXIT_MARKER.encode('ascii'))
+    if index < 0:
+        return -1, output
+    try:
+        returncode = int(output[index + len(EXIT_MARKER):].strip())
+    except ValueError:
+        return -1, output
+    del output[index:]
+    return returncode, output
+
+
+class ADBShellSession:
+    """常驻adb shell会话：一个进程，命令写入stdin，通过完成标记读取结果"""
+
+    def __init__(self, command: List[str], timeout: float = 5):
+        """
+        初始化shell会话
+
+        Args:
+            command: 启动交互式shell的完整命令，如 MuMuManager.exe adb -v 0 -c shell
+            timeout: 单条命令的默认超时时间(秒)
+        """
+        self.command = command
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+        self._lines = queue.Queue()
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def start(self):
+        """启动shell进程，并用一条空命令确认会话可用"""
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, bufsize=0)
+        reader = threading.Thread(target=self._read_output, args=(self.process,), daemon=True)
+        reader.start()
+        returncode, _ = self.run('true')
+        if returncode != 0:
+            self.close()
+            raise Exception(f"shell会话启动失败，返回码: {returncode}")
+
+    def _read_output(self, process: subprocess.Popen):
+        """后台读取shell输出，逐行放入队列，进程结束时放入None"""
+        for line in iter(process.stdout.readline, b''):
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, command: str, timeout: float = None) -> Tuple[int, str]:
+        """
+        在会话中执行一条命令
+
+        Args:
+            command: shell命令字符串
+            timeout: 超时时间(秒)，为None时使用默认值
+
+        Returns:
+            (返回码, 输出文本)
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        with self._lock:
+            if not self.is_alive():
+                raise Exception("shell会话未启动或已退出")
+
+            # 清掉上一条命令残留的输出
+            while True:
+                try:
+                    self._lines.get_nowait()
+                except queue.Empty:
+                    break
+
+            self._counter += 1
+            marker = f'__WJDR_DONE_{self._counter}__'
+            self.process.stdin.write(f'{command}; echo {marker} $?\n'.encode('utf-8'))
+            self.process.stdin.flush()
+
+            output = []
+            deadline = time.time() + timeout
+            while True:
+                remaining = deadline - time.time()
+                try:
+                    if remaining <= 0:
+                        raise queue.Empty
+                    line = self._lines.get(timeout=remaining)
+                except queue.Empty:
+                    # 会话状态未知，直接关闭，由调用方决定是否重建
+                    self._close()
+                    raise TimeoutError(f"shell命令超时: {command}")
+
+                if line is None:
+                    self._close()
+                    raise Exception("shell会话意外退出")
+
+                text = line.decode('utf-8', errors='replace').rstrip('\r\n')
+                # 命令输出不以换行结尾时，完成标记紧跟在最后一行输出之后
+                index = text.find(marker)
+                if index >= 0:
+                    if index > 0:
+                        output.append(text[:index])
+                    returncode = int(text[index + len(marker):].strip() or 0)
+                    return returncode, '\n'.join(output)
+                output.append(text)
+
+    def run_args(self, args: List[str], timeout: float = None) -> Tuple[int, str]:
+        """以参数列表形式执行命令，每个参数都会被转义"""
+        return self.run(' '.join(shlex.quote(str(arg)) for arg in args), timeout=timeout)
+
+    def _close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.process.terminate()
+            self.process.wait(timeout=1)
+        except Exception:
+            self.process.kill()
+        self.process = None
+
+    def close(self):
+        """关闭会话"""
+        with self._lock:
+            self._close()
+
+
+def pack_adb_message(command: int, arg0: int, arg1: int, data: bytes = b'', checksum: bool = True) -> bytes:
+    """打包一条adb协议消息: 24字节消息头 + 数据"""
+    checksum = sum(data) & 0xFFFFFFFF if checksum else 0
+    header = struct.pack('<6I', command, arg0, arg1, len(data), checksum, command ^ 0xFFFFFFFF)
+    return header + data
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("adb连接被关闭")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def read_adb_message(sock: socket.socket) -> Tuple[int, int, int, bytes]:
+    """读取一条adb协议消息，返回(命令字, arg0, arg1, 数据)"""
+    command, arg0, arg1, length, _, magic = struct.unpack('<6I', _recv_exact(sock, 24))
+    if magic != command ^ 0xFFFFFFFF:
+        raise ConnectionError("adb消息头校验失败")
+    data = _recv_exact(sock, length) if length else b''
+    return command, arg0, arg1, data
+
+
+class _ADBConnection:
+    """与adbd之间的一条TCP连接，同一时刻只承载一个流"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local_id = 0
+
+        self.sock.sendall(pack_adb_message(A_CNXN, A_VERSION, MAX_PAYLOAD, b'host::\0'))
+        command, _, _, _ = read_adb_message(self.sock)
+        if command == A_AUTH:
+            raise ConnectionError("adbd要求RSA认证，不支持直连")
+        if command != A_CNXN:
+            raise ConnectionError(f"adb握手失败: {command:#x}")
+
+    def open_stream(self, service: str, timeout: float) -> bytearray:
+        """
+        打开一个服务流(如 shell:ls、exec:screencap)，读取全部输出直到对端关闭
+
+        Args:
+            service: adb服务名
+            timeout: 超时时间(秒)
+
+        Returns:
+            服务输出的原始字节，直接返回接收缓冲区，不再复制
+        """
+        self.sock.settimeout(timeout)
+        self._local_id += 1
+        local_id = self._local_id
+        self.sock.sendall(pack_adb_message(A_OPEN, local_id, 0, service.encode('utf-8') + b'\0'))
+
+        remote_id = 0
+        output = bytearray()
+        while True:
+            command, arg0, arg1, data = read_adb_message(self.sock)
+            if arg1 != local_id:
+                # 上一个流残留的消息，忽略
+                continue
+            if command == A_OKAY:
+                remote_id = arg0
+            elif command == A_WRTE:
+                output.extend(data)
+                self.sock.sendall(pack_adb_message(A_OKAY, local_id, arg0))
+            elif command == A_CLSE:
+                if remote_id == 0 and not output:
+                    # 对端拒绝打开服务
+                    raise ConnectionError(f"adb服务打开失败: {service}")
+                self.sock.sendall(pack_adb_message(A_CLSE, local_id, arg0))
+                return output
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ADBSocketTransport:
+    """直接通过TCP与模拟器adbd通信，绕过MuMuManager.exe和adb server"""
+
+    def __init__(self, host: str, port: int, timeout: float = 5, max_connections: int = 4,
+                 retry_interval: float = 30):
+        """
+        初始化socket传输
+
+        Args:
+            host: adbd地址
+            port: adbd端口
+            timeout: 连接与命令的默认超时时间(秒)
+            max_connections: 保持的空闲连接数上限
+            retry_interval: 连接失败后多久(秒)内不再尝试连接
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retry_interval = retry_interval
+        self._idle: List[_ADBConnection] = []
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        """最近一次连接失败后的等待期内为False，调用方应直接走其他通道"""
+        return time.monotonic() >= self._down_until
+
+    def connect(self):
+        """建立一条连接并完成握手，用于确认adbd可达"""
+        self._release(self._acquire())
+
+    def _acquire(self) -> _ADBConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        if not self.available:
+            raise ConnectionError("adbd直连暂不可用")
+        try:
+            connection = _ADBConnection(self.host, self.port, self.timeout)
+        except Exception:
+            # 每次重连都可能等满超时，失败后一段时间内不再尝试
+            self._down_until = time.monotonic() + self.retry_interval
+            raise
+        self._down_until = 0.0
+        return connection
+
+    def _release(self, connection: _ADBConnection):
+        with self._lock:
+            if len(self._idle) < self.max_connections:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def run_service(self, service: str, timeout: float = None) -> bytearray:
+        """在一条空闲连接上执行adb服务，连接异常时丢弃该连接"""
+        if timeout is None:
+            timeout = self.timeout
+        connection = self._acquire()
+        try:
+            output = connection.open_stream(service, timeout)
+        except Exception:
+            connection.close()
+            raise
+        self._release(connection)
+        return output
+
+    def shell(self, command: str, timeout: float = None) -> bytearray:
+        """执行shell命令"""
+        return self.run_service(f'shell:{command}', timeout)
+
+    def exec_out(self, command: str, timeout: float = None) -> bytearray:
+        """执行命令并返回未经转换的二进制输出，等同于 adb exec-out"""
+        return self.run_service(f'exec:{command}', timeout)
+
+    def run_status(self, service: str, command: str, timeout: float = None) -> Tuple[int, bytearray]:
+        """
+        执行命令并取得返回码
+
+        Args:
+            service: 'shell'或'exec'
+            command: shell命令字符串
+
+        Returns:
+            (返回码, 输出)
+        """
+        return split_exit_status(self.run_service(f'{service}:{command}; {EXIT_STATUS_COMMAND}', timeout))
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            connections, self._idle = self._idle, []
+        for connection in connections:
+            connection.close()
+
+
+async def read_adb_message_async(reader: asyncio.StreamReader) -> Tuple[int, int, int, bytes]:
+    """read_adb_message的asyncio版本"""
+    try:
+        command, arg0, arg1, length, _, magic = struct.unpack('<6I', await reader.readexactly(24))
+        data = await reader.readexactly(length) if length else b''
+    except asyncio.IncompleteReadError:
+        raise ConnectionError("adb连接被关闭")
+    if magic != command ^ 0xFFFFFFFF:
+        raise ConnectionError("adb消息头校验失败")
+    return command, arg0, arg1, data
+
+
+class _AsyncADBConnection:
+    """_ADBConnection的asyncio版本"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._local_id = 0
+
+    @classmethod
+    async def open(cls, host: str, port: int) -> '_AsyncADBConnection':
+        reader, writer = await asyncio.open_connection(host, port)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = cls(reader, writer)
+        try:
+            writer.write(pack_adb_message(A_CNXN, A_VERSION, MAX_PAYLOAD, b'host::\0'))
+            await writer.drain()
+            command, _, _, _ = await read_adb_message_async(reader)
+            if command == A_AUTH:
+                raise ConnectionError("adbd要求RSA认证，不支持直连")
+            if command != A_CNXN:
+                raise ConnectionError(f"adb握手失败: {command:#x}")
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    async def open_stream(self, service: str) -> bytearray:
+        """打开一个服务流，读取全部输出直到对端关闭"""
+        self._local_id += 1
+        local_id = self._local_id
+        self.writer.write(pack_adb_message(A_OPEN, local_id, 0, service.encode('utf-8') + b'\0'))
+        await self.writer.drain()
+
+        remote_id = 0
+        output = bytearray()
+        while True:
+            command, arg0, arg1, data = await read_adb_message_async(self.reader)
+            if arg1 != local_id:
+                # 上一个流残留的消息，忽略
+                continue
+            if command == A_OKAY:
+                remote_id = arg0
+            elif command == A_WRTE:
+                output.extend(data)
+                self.writer.write(pack_adb_message(A_OKAY, local_id, arg0))
+                await self.writer.drain()
+            elif command == A_CLSE:
+                if remote_id == 0 and not output:
+                    # 对端拒绝打开服务
+                    raise ConnectionError(f"adb服务打开失败: {service}")
+                self.writer.write(pack_adb_message(A_CLSE, local_id, arg0))
+                await self.writer.drain()
+                return output
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncADBSocketTransport:
+    """
+    ADBSocketTransport的asyncio版本：在事件循环中直接与adbd通信
+
+    只能在创建它的事件循环中使用，一个事件循环可以同时驱动多台设备
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 5, max_connections: int = 4,
+                 retry_interval: float = 30):
+        """
+        初始化socket传输
+
+        Args:
+            host: adbd地址
+            port: adbd端口
+            timeout: 连接与命令的默认超时时间(秒)
+            max_connections: 保持的空闲连接数上限
+            retry_interval: 连接失败后多久(秒)内不再尝试连接
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retry_interval = retry_interval
+        self._idle: List[_AsyncADBConnection] = []
+        self._down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        """最近一次连接失败后的等待期内为False，调用方应直接走其他通道"""
+        return time.monotonic() >= self._down_until
+
+    async def connect(self):
+        """建立一条连接并完成握手，用于确认adbd可达"""
+        self._release(await self._acquire())
+
+    async def _acquire(self) -> _AsyncADBConnection:
+        if self._idle:
+            return self._idle.pop()
+        if not self.available:
+            raise ConnectionError("adbd直连暂不可用")
+        try:
+            connection = await asyncio.wait_for(_AsyncADBConnection.open(self.host, self.port), self.timeout)
+        except Exception:
+            self._down_until = time.monotonic() + self.retry_interval
+            raise
+        self._down_until = 0.0
+        return connection
+
+    def _release(self, connection: _AsyncADBConnection):
+        if len(self._idle) < self.max_connections:
+            self._idle.append(connection)
+        else:
+            connection.close()
+
+    async def run_service(self, service: str, timeout: float = None) -> bytearray:
+        """在一条空闲连接上执行adb服务，连接异常或超时时丢弃该连接"""
+        if timeout is None:
+            timeout = self.timeout
+        connection = await self._acquire()
+        try:
+            output = await asyncio.wait_for(connection.open_stream(service), timeout)
+        except BaseException:
+            connection.close()
+            raise
+        self._release(connection)
+        return output
+
+    async def shell(self, command: str, timeout: float = None) -> bytearray:
+        """执行shell命令"""
+        return await self.run_service(f'shell:{command}', timeout)
+
+    async def exec_out(self, command: str, timeout: float = None) -> bytearray:
+        """执行命令并返回未经转换的二进制输出，等同于 adb exec-out"""
+        return await self.run_service(f'exec:{command}', timeout)
+
+    async def run_status(self, service: str, command: str, timeout: float = None) -> Tuple[int, bytearray]:
+        """执行命令并取得返回码，见ADBSocketTransport.run_status"""
+        return split_exit_status(await self.run_service(f'{service}:{command}; {EXIT_STATUS_COMMAND}', timeout))
+
+    def close(self):
+        """关闭所有连接"""
+        connections, self._idle = self._idle, []
+        for connection in connections:
+            connection.close()
@@ -0,0 +1,26 @@
+import os
+
+
+def user_data_dir(*parts: str, create: bool = True) -> str:
+    """
+    本机用户数据目录，用于保存运行中学习或缓存的数据，不写入源码目录
+
+    可用环境变量WJDR_DATA_DIR指定；否则Windows下为%LOCALAPPDATA%\\WJDR，其他系统为~/.local/share/WJDR
+
+    Args:
+        parts: 子路径
+        create: 目录不存在时是否创建，为False时只返回路径，由写入方在需要时创建
+
+    Returns:
+        目录路径
+    """
+    base = os.environ.get('WJDR_DATA_DIR')
+    if not base:
+        if os.name == 'nt':
+            base = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 'WJDR')
+        else:
+            base = os.path.join(os.environ.get('XDG_DATA_HOME', os.path.expanduser('~/.local/share')), 'WJDR')
+    path = os.path.join(base, *parts)
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
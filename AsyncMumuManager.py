@@ -0,0 +1,388 @@
+import asyncio
+import functools
+import io
+import itertools
+import json
+import random
+import shlex
+import subprocess
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from ADBTransport import AsyncADBSocketTransport
+from BootOrchestrator import get_boot_orchestrator
+from DeviceRegistry import get_device_registry
+from ImageMatcher import ImageMatcher, MatchCache
+from InputBatch import InputBatch
+from MatchExecutor import match_executor
+from MumuManager import ADBController, MumuGameAutomator
+from OCRProcessor import OCRProcessor, VLMEncoding
+from ScreenCapture import Frame
+from ScreenClassifier import ScreenClassifier
+from TemplateRegistry import template_registry
+from WaitStrategy import WaitStrategy, ExponentialBackoff
+
+
+class AsyncADBController:
+    """
+    ADBController的asyncio版本
+
+    命令优先通过asyncio socket直连adbd，不可达时用asyncio子进程经MuMuManager转发，
+    等待都不阻塞事件循环，一个事件循环可以同时驱动多台设备。
+    创建后需要先 await connect()
+    """
+
+    def __init__(self, device_id: int, mmm_path: str = r'C:\Program Files\Netease\MuMu\nx_main\MuMuManager.exe'):
+        self.device_id = device_id
+        self.str_device_id = str(self.device_id)
+        self.device_name = None
+        self.mmm_path = [mmm_path]
+        self.device_registry = get_device_registry(mmm_path)
+        self.transport: Optional[AsyncADBSocketTransport] = None
+        # 连接时选定的截图方式，之后一直使用，失败时才重新探测
+        self.screenshot_method: Optional[str] = None
+        self.last_input_time = 0.0
+        self._frame_counter = itertools.count(1)
+        # 按帧内容缓存的匹配结果，LRU淘汰
+        self.match_cache = MatchCache()
+
+    async def connect(self):
+        """确认设备已启动(未启动时启动它)，并尝试直连adbd"""
+        loop = asyncio.get_running_loop()
+        devices = await loop.run_in_executor(None, self.device_registry.snapshot)
+        if self.device_id not in devices:
+            raise Exception(f"指定设备 {self.device_id} 未连接或不可用")
+        if not devices[self.device_id]['state']:
+            boot = get_boot_orchestrator(self.mmm_path[0])
+            result = (await loop.run_in_executor(None, boot.boot, [self.device_id]))[self.device_id]
+            if not result.ready:
+                raise Exception(f"设备 {self.device_id} 启动失败: {result.error}")
+            devices = await loop.run_in_executor(None, self.device_registry.snapshot)
+
+        device = devices[self.device_id]
+        self.device_name = device['name']
+        print(f"已选择设备: {self.device_name}")
+
+        address = await self._resolve_adb_address(device)
+        if address is not None:
+            # 连接失败也保留transport：它会在等待期过后自行重试
+            self.transport = AsyncADBSocketTransport(*address)
+            try:
+                await self.transport.connect()
+                print(f"已直连adbd: {address[0]}:{address[1]}")
+            except Exception as e:
+                print(f"无法直连adbd {address[0]}:{address[1]}，暂时使用MuMuManager转发: {e}")
+
+        try:
+            await self._probe_screenshot_method()
+        except Exception as e:
+            print(f"截图方式探测失败，将在首次截图时重试: {e}")
+
+    async def _resolve_adb_address(self, device) -> Optional[Tuple[str, int]]:
+        """解析模拟器adbd的地址和端口，设备信息中没有时查询一次MuMuManager"""
+        host, port = device.get('adb_host'), device.get('adb_port')
+        if not host or not port:
+            try:
+                _, stdout = await self._exec(self.mmm_path + ['adb', '-v', self.str_device_id], timeout=10)
+                info = json.loads(stdout.decode('utf-8'))
+                host = info.get('adb_host', info.get('adb_host_ip'))
+                port = info.get('adb_port')
+            except Exception as e:
+                print(f"获取adb地址失败: {e}")
+                return None
+        if not host or not port:
+            return None
+        return host, int(port)
+
+    def _get_adb_command(self, command: List[str]) -> List[str]:
+        return self.mmm_path + ['adb', '-v', self.str_device_id, '-c'] + command
+
+    @staticmethod
+    async def _exec(cmd: List[str], timeout: float = None) -> Tuple[int, bytes]:
+        """以asyncio子进程执行命令，返回(返回码, 标准输出)"""
+        process = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.DEVNULL)
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        return process.returncode, stdout
+
+    async def run_adb(self, command: List[str], timeout: float = None, raw: bool = False) -> bytes:
+        """
+        执行ADB命令，shell/exec-out命令优先通过socket直连adbd
+
+        Args:
+            command: adb参数，如 ['shell', 'wm', 'size']、['exec-out', 'screencap', '-p']
+            timeout: 超时时间(秒)
+            raw: command[1]是已拼好的shell脚本(可含管道等)，直连时不再转义
+
+        Returns:
+            命令输出的原始字节
+        """
+        if self.transport is not None and self.transport.available and command[0] in ('shell', 'exec-out'):
+            if raw:
+                script = ' '.join(command[1:])
+            else:
+                script = ' '.join(shlex.quote(str(arg)) for arg in command[1:])
+            service = 'shell' if command[0] == 'shell' else 'exec'
+            try:
+                returncode, output = await self.transport.run_status(service, script, timeout=timeout)
+            except Exception as e:
+                print(f"adbd直连执行失败，改用MuMuManager转发: {e}")
+            else:
+                # 命令本身失败时不再经MuMuManager重复执行
+                if returncode != 0:
+                    raise Exception(f"adb命令执行失败，返回码: {returncode}")
+                # 直接返回接收缓冲区，原始帧缓冲解析时不再复制
+                return output
+
+        returncode, stdout = await self._exec(self._get_adb_command(command), timeout)
+        if returncode != 0:
+            raise Exception(f"adb命令执行失败，返回码: {returncode}")
+        return stdout
+
+    async def _run_input(self, args: Union[List[str], str], timeout: float = 5) -> bool:
+        """
+        执行input类shell命令
+
+        Args:
+            args: shell命令参数，如 ['input', 'tap', '100', '200']，或已拼好的shell脚本(见InputBatch)
+            timeout: 等待命令完成的超时时间(秒)
+
+        Returns:
+            命令是否执行成功
+        """
+        script = args if isinstance(args, str) else ' '.join(shlex.quote(str(arg)) for arg in args)
+        try:
+            await self.run_adb(['shell', script], timeout=timeout, raw=True)
+            return True
+        except Exception as e:
+            print(f"输入命令执行失败: {e}")
+            return False
+        finally:
+            self._mark_input()
+
+    def _mark_input(self):
+        """记录输入事件：之后的识别需要新帧"""
+        self.last_input_time = time.time()
+
+    async def tap(self, x, y, random_range: int = 3):
+        offset = abs(random_range)
+        x = x + random.randint(-offset, offset)
+        y = y + random.randint(-offset, offset)
+        await self._run_input(['input', 'tap', str(x), str(y)])
+        await asyncio.sleep(0.1)
+
+    async def swipe(self, start_x, start_y, end_x, end_y, duration=500):
+        """执行滑动操作"""
+        await self._run_input(['input', 'swipe', str(start_x), str(start_y), str(end_x), str(end_y),
+                               str(duration)], timeout=duration / 1000 + 5)
+        # 滑动后等待0.1秒
+        await asyncio.sleep(0.1)
+
+    async def press_key(self, keycode):
+        """按下按键"""
+        await self._run_input(['input', 'keyevent', str(keycode)])
+
+    async def back(self):
+        """返回键，与ADBController.back一样经MuMuManager的go_back发送"""
+        try:
+            await self._exec(self._get_adb_command(['go_back']), timeout=3)
+        except Exception as e:
+            print(f"返回键发送失败: {e}")
+        finally:
+            self._mark_input()
+
+    def input_batch(self) -> InputBatch:
+        """创建输入批处理，编好后用 await batch.asend() 一次发送"""
+        return InputBatch(self)
+
+    async def send_batch(self, batch: InputBatch) -> bool:
+        """一次发送输入批处理并等待全部执行完，等同于 await batch.asend()"""
+        return await batch.asend()
+
+    async def _screenshot_raw(self) -> np.ndarray:
+        """原始帧缓冲，解析只创建视图，不需要放到线程池"""
+        return ADBController._parse_raw_screenshot(await self.run_adb(['exec-out', 'screencap'], timeout=3))
+
+    async def _screenshot_png(self) -> np.ndarray:
+        data = await self.run_adb(['exec-out', 'screencap', '-p'], timeout=3)
+        idx = data.find(b'\x89PNG\r\n\x1a\n')
+        if idx < 0:
+            raise Exception("截图数据不是PNG格式")
+        # PNG解码占用CPU，放到线程池执行
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: np.array(Image.open(io.BytesIO(data[idx:]))))
+
+    async def _probe_screenshot_method(self):
+        """依次尝试各截图方式，选定第一个可用的并在之后一直使用"""
+        for name in ('raw', 'png'):
+            try:
+                image = await getattr(self, f'_screenshot_{name}')()
+                if image is not None and image.size > 0:
+                    self.screenshot_method = name
+                    print(f"截图方式: {name}")
+                    return
+            except Exception as e:
+                print(f"截图方式 {name} 不可用: {e}")
+        self.screenshot_method = None
+        raise Exception("所有截图方法都失败，请检查设备是否支持screencap命令")
+
+    async def screenshot(self) -> Frame:
+        """获取屏幕截图，返回Frame"""
+        if self.screenshot_method is None:
+            await self._probe_screenshot_method()
+
+        start_time = time.time()
+        try:
+            image = await getattr(self, f'_screenshot_{self.screenshot_method}')()
+        except Exception as e:
+            # 已选定的方式失效时才重新探测一次
+            print(f"截图失败({self.screenshot_method}): {e}，重新选择截图方式")
+            await self._probe_screenshot_method()
+            image = await getattr(self, f'_screenshot_{self.screenshot_method}')()
+        return Frame(image, next(self._frame_counter), start_time)
+
+    async def get_frame(self) -> Frame:
+        """获取一帧用于识别"""
+        return await self.screenshot()
+
+    def close(self):
+        """释放常驻连接"""
+        if self.transport is not None:
+            self.transport.close()
+
+
+class AsyncMumuGameAutomator:
+    """
+    MumuGameAutomator的asyncio版本
+
+    截图、输入在事件循环中异步执行；模板匹配提交到共享的匹配线程池，
+    OCR(包括VLM请求)放到默认线程池，都不阻塞事件循环。
+    用法: automator = await AsyncMumuGameAutomator(0).connect()
+    """
+
+    SCREENS = MumuGameAutomator.SCREENS
+
+    def __init__(self, mumu_device: int = 0, game_package: str = None,
+                 mmm_path: str = r'C:\Program Files\Netease\MuMu\nx_main\MuMuManager.exe',
+                 ocr_lang: str = 'eng+chi_sim', wait_strategy: WaitStrategy = None):
+        """
+        初始化
+
+        Args:
+            mumu_device: Mumu模拟器序号
+            game_package: 游戏包名
+            wait_strategy: 等待识别接口的默认轮询策略，默认指数退避
+        """
+        self.mmm_path = mmm_path
+        self.mumu_device = mumu_device
+        self.game_package = game_package
+        self.adb = AsyncADBController(mumu_device, mmm_path)
+        self.image_matcher = ImageMatcher(cache=self.adb.match_cache)
+        # 模板缓存进程内共享，已加载过的模板不会重复读取
+        template_registry.preload()
+        self.screen_classifier = ScreenClassifier(self.SCREENS)
+        self.wait_strategy = wait_strategy or ExponentialBackoff()
+        self.ocr = OCRProcessor(lang=ocr_lang)
+
+    async def connect(self) -> 'AsyncMumuGameAutomator':
+        await self.adb.connect()
+        return self
+
+    def close(self):
+        self.adb.close()
+
+    async def _run_matching(self, fn, *args, **kwargs):
+        """在共享的匹配线程池中执行，按设备公平调度"""
+        return await asyncio.wrap_future(match_executor.submit(self.mumu_device, fn, *args, **kwargs))
+
+    async def get_image_pos(self, template_path: str, timeout: int = 3, threshold: float = 0.8,
+                            offset_x: int = 0, offset_y: int = 0, scale_match: bool = False,
+                            scale_range: tuple = (0.5, 2.0), wait_strategy: WaitStrategy = None):
+        template = self.image_matcher.load_template(template_path)
+
+        async for screenshot in (wait_strategy or self.wait_strategy).aframes(self.adb, timeout):
+            position = await self._run_matching(self.image_matcher.match, screenshot, template, threshold,
+                                                scale_match=scale_match, scale_range=scale_range)
+            if position:
+                x, y = position
+                return x + offset_x, y + offset_y
+
+        return False
+
+    async def wait_and_click(self, template_path: str, timeout: int = 3, hold: bool = False, hold_time: int = 3,
+                             threshold: float = 0.8, offset_x: int = 0, offset_y: int = 0,
+                             scale_match: bool = False, scale_range: tuple = (0.5, 2.0),
+                             wait_strategy: WaitStrategy = None) -> bool:
+        position = await self.get_image_pos(template_path=template_path, timeout=timeout, threshold=threshold,
+                                            offset_x=offset_x, offset_y=offset_y,
+                                            scale_match=scale_match, scale_range=scale_range,
+                                            wait_strategy=wait_strategy)
+        if not position:
+            return False
+        x, y = position
+        if hold:
+            await self.adb.swipe(x, y, x + 1, y + 1, hold_time * 1000)
+        else:
+            await self.adb.tap(x, y)
+        return True
+
+    async def wait_for_image(self, template_path: str, timeout: int = 30,
+                             threshold: float = 0.8, wait_strategy: WaitStrategy = None) -> bool:
+        position = await self.get_image_pos(template_path=template_path, threshold=threshold,
+                                            timeout=timeout, wait_strategy=wait_strategy)
+        return bool(position)
+
+    async def detect_screen(self) -> Optional[str]:
+        """识别当前所在界面"""
+        screenshot = await self.adb.get_frame()
+        return await self._run_matching(self.screen_classifier.classify, screenshot)
+
+    async def detect_screens(self) -> List[str]:
+        """识别当前截图上同时出现的所有界面"""
+        screenshot = await self.adb.get_frame()
+        return await self._run_matching(self.screen_classifier.classify_all, screenshot)
+
+    async def read_digits(self, region: Tuple[int, int, int, int], fmt: str = 'number',
+                          min_confidence: float = 0.85, with_qwen3: bool = True) -> List[int]:
+        """读取屏幕上的数字，本地识别置信度不足时才请求VLM"""
+        screenshot = await self.adb.get_frame()
+        read = functools.partial(self.ocr.read_digits, screenshot, region, fmt, min_confidence,
+                                 with_qwen3=with_qwen3)
+        return await asyncio.get_running_loop().run_in_executor(None, read)
+
+    async def get_regions_text(self, regions: Dict[str, Tuple[int, int, int, int]], preprocess: bool = True,
+                               with_qwen3: bool = True) -> Dict[str, str]:
+        """在同一帧上识别多个区域的文字，使用VLM时合并为一次请求"""
+        screenshot = await self.adb.get_frame()
+        extract = functools.partial(self.ocr.extract_regions, screenshot, regions, preprocess=preprocess,
+                                    with_qwen3=with_qwen3)
+        return await asyncio.get_running_loop().run_in_executor(None, extract)
+
+    async def read_digits_regions(self, regions: Dict[str, Tuple[Tuple[int, int, int, int], str]],
+                                  min_confidence: float = 0.85, with_qwen3: bool = True) -> Dict[str, List[int]]:
+        """在同一帧上读取多个区域的数字，本地识别置信度不足的区域合并为一次VLM请求"""
+        screenshot = await self.adb.get_frame()
+        read = functools.partial(self.ocr.read_digits_regions, screenshot, regions, min_confidence,
+                                 with_qwen3=with_qwen3)
+        return await asyncio.get_running_loop().run_in_executor(None, read)
+
+    async def get_screen_text(self, region: Tuple[int, int, int, int] = None,
+                              numbers: bool = False, preprocess: bool = True, with_qwen3: bool = True,
+                              encoding: VLMEncoding = None) -> str:
+        screenshot = await self.adb.get_frame()
+        if numbers:
+            extract = functools.partial(self.ocr.extract_numbers, screenshot, preprocess=preprocess,
+                                        region=region, with_qwen3=with_qwen3)
+        else:
+            extract = functools.partial(self.ocr.extract_text, screenshot, preprocess=preprocess,
+                                        region=region, with_qwen3=with_qwen3, encoding=encoding)
+        # tesseract和VLM请求都是阻塞调用，放到线程池执行
+        return await asyncio.get_running_loop().run_in_executor(None, extract)
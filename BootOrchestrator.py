@@ -0,0 +1,207 @@
+import argparse
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from DeviceRegistry import Devices, get_device_registry
+
+
+@dataclass
+class BootResult:
+    """单个实例的启动结果"""
+    device_id: int
+    ready: bool = False
+    # 从发出启动命令到就绪的秒数，启动前已在运行时为0
+    time_to_ready: Optional[float] = None
+    error: str = ""
+
+
+class BootOrchestrator:
+    """
+    多开模拟器并行启动
+
+    同时启动的实例数有上限，相邻两次启动之间间隔一段时间，避免CPU和磁盘瞬间打满；
+    所有实例的就绪状态来自同一个设备信息缓存的轮询，而不是每个实例各自查询。
+    并发上限和启动间隔对同一启动器上所有线程的boot调用共同生效，
+    各控制器应通过get_boot_orchestrator共用同一个启动器
+    """
+
+    def __init__(self, mmm_path: str, max_concurrent: int = 2, stagger: float = 5.0,
+                 timeout: float = 300.0, poll_interval: float = 1.0):
+        """
+        初始化启动器
+
+        Args:
+            mmm_path: MuMuManager.exe路径
+            max_concurrent: 同时处于启动中(已发出启动命令但未就绪)的实例数上限
+            stagger: 相邻两次启动命令之间的最小间隔(秒)
+            timeout: 单个实例从发出启动命令到就绪的超时时间(秒)
+            poll_interval: 轮询设备状态的间隔(秒)
+        """
+        self.mmm_path = [mmm_path]
+        self.registry = get_device_registry(mmm_path)
+        self.max_concurrent = max(max_concurrent, 1)
+        self.stagger = stagger
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        # 所有boot调用共用的启动中实例: {编号: (启动时间, 启动命令进程)}
+        self._booting: Dict[int, tuple] = {}
+        self._last_launch: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_ready(device: Dict) -> bool:
+        """安卓系统启动完成才算就绪，旧版MuMuManager没有该信息时以进程已启动为准"""
+        return bool(device.get('android_started', device['state']))
+
+    def _launch(self, device_id: int) -> subprocess.Popen:
+        cmd = self.mmm_path + ['control', '-v', str(device_id), 'launch']
+        return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+    @staticmethod
+    def _reap(process: subprocess.Popen):
+        """回收启动命令进程，仍在运行时在后台线程中等待其退出"""
+        if process.poll() is None:
+            threading.Thread(target=process.communicate, daemon=True).start()
+        else:
+            process.communicate()
+
+    def _try_launch(self, device_id: int) -> Optional[tuple]:
+        """
+        有空位且距上次启动已过间隔时启动实例，其他调用已在启动该实例时直接沿用
+
+        Returns:
+            (启动时间, 启动命令进程)，暂时不能启动时返回None
+        """
+        with self._lock:
+            if device_id in self._booting:
+                return self._booting[device_id]
+            now = time.monotonic()
+            if len(self._booting) >= self.max_concurrent or \
+                    (self._last_launch is not None and now - self._last_launch < self.stagger):
+                return None
+            print(f"启动实例 {device_id}")
+            self._booting[device_id] = (now, self._launch(device_id))
+            self._last_launch = now
+            return self._booting[device_id]
+
+    def _finish(self, device_id: int, process: subprocess.Popen):
+        """实例已就绪或失败，释放启动名额"""
+        with self._lock:
+            if self._booting.get(device_id, (None, None))[1] is process:
+                del self._booting[device_id]
+                self._reap(process)
+
+    def boot(self, device_ids: Iterable[int]) -> Dict[int, BootResult]:
+        """
+        启动一组实例并等待全部就绪
+
+        Args:
+            device_ids: 实例编号
+
+        Returns:
+            {实例编号: BootResult}
+        """
+        device_ids = list(dict.fromkeys(device_ids))
+        results = {device_id: BootResult(device_id) for device_id in device_ids}
+        devices: Devices = self.registry.snapshot(max_age=0)
+
+        queue = []
+        for device_id in device_ids:
+            if device_id not in devices:
+                results[device_id].error = "实例不存在"
+            elif self.is_ready(devices[device_id]):
+                results[device_id].ready = True
+                results[device_id].time_to_ready = 0.0
+            else:
+                queue.append(device_id)
+
+        # 本次调用等待的启动中实例: {编号: (启动时间, 启动命令进程)}
+        booting: Dict[int, tuple] = {}
+        while queue or booting:
+            if queue:
+                device_id = queue[0]
+                try:
+                    launched = self._try_launch(device_id)
+                except Exception as e:
+                    queue.pop(0)
+                    results[device_id].error = f"启动命令执行失败: {e}"
+                    continue
+                if launched is not None:
+                    queue.pop(0)
+                    booting[device_id] = launched
+                    continue
+
+            devices = self.registry.snapshot(max_age=self.poll_interval)
+            now = time.monotonic()
+            for device_id, (start, process) in list(booting.items()):
+                result = results[device_id]
+                if device_id in devices and self.is_ready(devices[device_id]):
+                    result.ready = True
+                    result.time_to_ready = now - start
+                    print(f"实例 {device_id} 已就绪，用时 {result.time_to_ready:.1f}秒")
+                elif process.poll() not in (None, 0):
+                    try:
+                        detail = process.stderr.read().strip()
+                    except ValueError:
+                        # 同一实例的另一个boot调用已回收了该进程
+                        detail = ''
+                    result.error = f"启动命令失败: {detail}"
+                elif now - start > self.timeout:
+                    result.error = "启动超时"
+                else:
+                    continue
+                if result.error:
+                    print(f"实例 {device_id} {result.error}")
+                del booting[device_id]
+                self._finish(device_id, process)
+
+            # 有空位时只等到可以启动下一个实例
+            wait = self.poll_interval
+            with self._lock:
+                if queue and len(self._booting) < self.max_concurrent:
+                    since = now - self._last_launch if self._last_launch is not None else self.stagger
+                    wait = min(wait, max(self.stagger - since, 0))
+            time.sleep(wait)
+
+        return results
+
+
+_orchestrators: Dict[str, BootOrchestrator] = {}
+_orchestrators_lock = threading.Lock()
+
+
+def get_boot_orchestrator(mmm_path: str) -> BootOrchestrator:
+    """获取指定MuMuManager路径共用的启动器，使并发上限对所有控制器生效"""
+    with _orchestrators_lock:
+        orchestrator = _orchestrators.get(mmm_path)
+        if orchestrator is None:
+            orchestrator = _orchestrators[mmm_path] = BootOrchestrator(mmm_path)
+        return orchestrator
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并行启动多个Mumu模拟器实例')
+    parser.add_argument('deviceids', type=int, nargs='+', help='Mumu模拟器的编号')
+    parser.add_argument('--mmm-path', default=r'C:\Program Files\Netease\MuMu\nx_main\MuMuManager.exe',
+                        help='MuMuManager.exe路径')
+    parser.add_argument('--concurrency', type=int, default=2, help='同时启动的实例数上限')
+    parser.add_argument('--stagger', type=float, default=5.0, help='相邻两次启动的间隔(秒)')
+    parser.add_argument('--timeout', type=float, default=300.0, help='单个实例的启动超时(秒)')
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    orchestrator = BootOrchestrator(args.mmm_path, args.concurrency, args.stagger, args.timeout)
+    results = orchestrator.boot(args.deviceids)
+    for result in results.values():
+        if result.ready:
+            print(f"实例 {result.device_id}: 就绪，用时 {result.time_to_ready:.1f}秒")
+        else:
+            print(f"实例 {result.device_id}: 失败，{result.error}")
+    print(f"总用时 {time.monotonic() - start:.1f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import copy
+import json
+import subprocess
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+Devices = Dict[int, Dict[str, Any]]
+
+
+class DeviceRegistry:
+    """
+    MuMuManager设备信息的共享缓存
+
+    查询一次设备列表要启动一个或多个MuMuManager.exe进程，多开时各处频繁调用开销很大。
+    同一个MuMuManager路径的所有调用方共用一份缓存：后台线程按间隔刷新，调用方拿到的是缓存的快照；
+    同时到达的刷新请求合并为一次查询，一段时间无人使用后后台线程自动退出
+    """
+
+    def __init__(self, mmm_path: str, refresh_interval: float = 5.0, idle_timeout: float = 60.0):
+        """
+        初始化设备信息缓存
+
+        Args:
+            mmm_path: MuMuManager.exe路径
+            refresh_interval: 后台刷新间隔(秒)，也是快照的默认有效期
+            idle_timeout: 超过该时间(秒)没有调用方读取时停止后台刷新
+        """
+        self.mmm_path = [mmm_path]
+        self.refresh_interval = refresh_interval
+        self.idle_timeout = idle_timeout
+        self._devices: Optional[Devices] = None
+        self._refresh_time = 0.0
+        self._last_access = 0.0
+        # 正在进行的查询，其他调用方等待它的结果而不是再查一次
+        self._pending: Optional[Future] = None
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.query_count = 0
+
+    def _query(self) -> Devices:
+        """调用MuMuManager查询所有设备信息"""
+        devices = {}
+        try:
+            # 获取设备列表
+            mmm_info = self.mmm_path + ['info', '-v', 'all']
+            result = subprocess.run(mmm_info, capture_output=True, text=True, encoding='utf-8')
+            if result.returncode != 0:
+                mmm_info = self.mmm_path + ['setting', '-v', 'all', '-a']
+                result = subprocess.run(mmm_info, capture_output=True, text=True, check=True, encoding='utf-8')
+            lines = json.loads(result.stdout)
+
+            for key, value in lines.items():
+                name = value['name'] if 'name' in value else value.get('player_name', '')
+                tab_name = format(zlib.crc32(name.encode('utf-8')), '08x')
+                state = False
+                adb_host = value.get('adb_host_ip', value.get('adb_host'))
+                adb_port = value.get('adb_port')
+                if 'is_process_started' in value:
+                    state = value['is_process_started']
+                else:
+                    mmm_info = self.mmm_path + ['adb', '-v', key]
+                    result = subprocess.run(mmm_info, capture_output=True, text=True, encoding='utf-8')
+                    info = json.loads(result.stdout)
+                    if 'adb_host' in info:
+                        state = True
+                        adb_host = info['adb_host']
+                        adb_port = info.get('adb_port')
+                key = int(key)
+                devices[key] = {
+                    'id': key,
+                    'name': name,
+                    'tab_name': tab_name,
+                    'state': state,
+                    # 安卓系统是否启动完成，旧版MuMuManager没有该字段
+                    'android_started': value.get('is_android_started', state),
+                    'adb_host': adb_host,
+                    'adb_port': adb_port
+                }
+        except subprocess.CalledProcessError:
+            raise Exception("ADB命令执行失败，请检查ADB是否正确安装")
+
+        if not devices:
+            raise Exception("未检测到连接的ADB设备")
+        return devices
+
+    def refresh(self) -> Devices:
+        """
+        立即查询一次设备信息并更新缓存，已有查询在进行时等待它的结果
+
+        Returns:
+            设备信息快照 {设备编号: {'id', 'name', 'tab_name', 'state', 'adb_host', 'adb_port'}}
+        """
+        with self._condition:
+            pending = self._pending
+            owner = pending is None
+            if owner:
+                pending = self._pending = Future()
+
+        if owner:
+            try:
+                devices = self._query()
+            except Exception as e:
+                with self._condition:
+                    self._pending = None
+                pending.set_exception(e)
+                raise
+            with self._condition:
+                self.query_count += 1
+                self._devices = devices
+                self._refresh_time = time.monotonic()
+                self._pending = None
+                self._condition.notify_all()
+            pending.set_result(devices)
+
+        return copy.deepcopy(pending.result())
+
+    def snapshot(self, max_age: float = None) -> Devices:
+        """
+        获取设备信息快照，缓存未过期时不查询
+
+        Args:
+            max_age: 可接受的缓存时长(秒)，None为refresh_interval，0表示总是重新查询
+
+        Returns:
+            设备信息快照，调用方可以随意修改
+        """
+        if max_age is None:
+            max_age = self.refresh_interval
+        with self._condition:
+            self._last_access = time.monotonic()
+            self._ensure_thread()
+            if self._devices is not None and time.monotonic() - self._refresh_time <= max_age:
+                return copy.deepcopy(self._devices)
+        return self.refresh()
+
+    def wait_for(self, predicate: Callable[[Devices], bool], timeout: float = None,
+                 interval: float = 1.0) -> Optional[Devices]:
+        """
+        等待设备信息满足条件，多个等待方共用同一次查询
+
+        Args:
+            predicate: 判断快照是否满足条件的函数
+            timeout: 超时时间(秒)，None表示一直等待
+            interval: 等待期间快照的最长有效期(秒)
+
+        Returns:
+            满足条件的快照，超时返回None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            devices = self.snapshot(max_age=interval)
+            if predicate(devices):
+                return devices
+            wait = interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                wait = min(wait, remaining)
+            # 其他调用方刷新了缓存时提前醒来
+            with self._condition:
+                refresh_time = self._refresh_time
+                self._condition.wait_for(lambda: self._refresh_time != refresh_time, timeout=wait)
+
+    def _ensure_thread(self):
+        # 调用时已持有self._condition
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name='DeviceRegistry', daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait(self.refresh_interval)
+                if time.monotonic() - self._last_access > self.idle_timeout:
+                    self._thread = None
+                    return
+                if time.monotonic() - self._refresh_time < self.refresh_interval:
+                    continue
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"刷新设备信息失败: {e}")
+
+
+_registries: Dict[str, DeviceRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_device_registry(mmm_path: str) -> DeviceRegistry:
+    """获取指定MuMuManager路径共用的设备信息缓存"""
+    with _registries_lock:
+        registry = _registries.get(mmm_path)
+        if registry is None:
+            registry = _registries[mmm_path] = DeviceRegistry(mmm_path)
+        return registry
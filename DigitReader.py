@@ -0,0 +1,304 @@
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from AppPaths import user_data_dir
+
+
+@dataclass
+class DigitReading:
+    """一次数字识别的结果"""
+    text: str
+    # 按格式解析出的数字，文本不符合格式时为None
+    values: Optional[List[int]]
+    # 各字符匹配得分的最小值，0~1
+    confidence: float
+
+
+class DigitReader:
+    """
+    游戏内固定字体数字的本地识别
+
+    二值化后按连通域切出字符，缩放到统一大小，与字符模板库逐个比对。
+    随代码提供的模板库在templates/digits/<字符>/下，每个字符可以有多个样本(不同字体、字号)；
+    可以用VLM的识别结果调用learn()补充模板库，学到的样本经两次独立识别确认后才保存到用户数据目录
+    """
+
+    # 字符统一缩放到的宽高，高度对应整行文字的高度
+    GLYPH_WIDTH = 24
+    GLYPH_HEIGHT = 28
+    # 文件名不能使用的字符在模板库中的目录名
+    LABEL_NAMES = {':': 'colon', '/': 'slash', ',': 'comma', '.': 'dot'}
+    # 每个字符最多保留的样本数
+    MAX_SAMPLES = 20
+    # learn时已能以该得分识别的字符不再加入样本
+    LEARN_SKIP = 0.95
+    # 两次独立识别得到的同一字符样本相关系数达到该值才确认加入
+    LEARN_CONFIRM = 0.9
+    # 每个字符保留的待确认样本数
+    MAX_PENDING = 20
+    # 支持的文本格式
+    FORMATS = {
+        'time': r'(?:(\d+):)?(\d{1,2}):(\d{2})',
+        'fraction': r'(\d+)/(\d+)',
+        'coordinate': r'(\d+),(\d+)',
+        'number': r'(\d{1,3}(?:,\d{3})+|\d+)',
+    }
+    # 各格式可能出现的字符，fmt为None时只要求数字
+    ALPHABETS = {
+        None: '0123456789',
+        'time': '0123456789:',
+        'fraction': '0123456789/',
+        'coordinate': '0123456789,',
+        'number': '0123456789,',
+    }
+
+    def __init__(self, bank_dir: str = 'templates/digits', learned_dir: Optional[str] = None):
+        """
+        Args:
+            bank_dir: 随代码提供的字符模板库目录，只读
+            learned_dir: 保存learn()确认的样本的目录，None时不保存
+        """
+        self.bank_dir = bank_dir
+        self.learned_dir = learned_dir
+        self._samples: Dict[str, List[np.ndarray]] = {}
+        # 待确认的样本: {字符: [(归一化向量, 来源图像哈希)]}
+        self._pending: Dict[str, List[tuple]] = {}
+        # 所有样本展平归一化后的矩阵和对应字符，样本变化后重建
+        self._matrix: Optional[np.ndarray] = None
+        self._labels: List[str] = []
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _label_dir(self, char: str) -> str:
+        return os.path.join(self.learned_dir, self.LABEL_NAMES.get(char, char))
+
+    def _load(self):
+        # 调用时已持有self._lock
+        if self._loaded:
+            return
+        names = {name: char for char, name in self.LABEL_NAMES.items()}
+        paths = glob.glob(os.path.join(self.bank_dir, '*', '*.png'))
+        if self.learned_dir:
+            paths += glob.glob(os.path.join(self.learned_dir, '*', '*.png'))
+        for path in paths:
+            name = os.path.basename(os.path.dirname(path))
+            char = names.get(name, name)
+            glyph = np.array(Image.open(path).convert('L'))
+            if glyph.shape == (self.GLYPH_HEIGHT, self.GLYPH_WIDTH):
+                self._samples.setdefault(char, []).append(glyph)
+        self._loaded = True
+        self._matrix = None
+
+    def _bank(self):
+        with self._lock:
+            self._load()
+            if self._matrix is None:
+                labels, vectors = [], []
+                for char, glyphs in self._samples.items():
+                    for glyph in glyphs:
+                        labels.append(char)
+                        vectors.append(self._vector(glyph))
+                self._labels = labels
+                self._matrix = np.array(vectors) if vectors else None
+            return self._matrix, self._labels
+
+    @staticmethod
+    def _vector(glyph: np.ndarray) -> np.ndarray:
+        """展平并归一化为零均值单位长度，点积即为相关系数"""
+        vector = glyph.astype(np.float32).ravel()
+        vector -= vector.mean()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def covers(self, fmt: str = None) -> bool:
+        """模板库是否包含该格式可能出现的所有字符"""
+        with self._lock:
+            self._load()
+            return set(self.ALPHABETS[fmt]) <= set(self._samples)
+
+    def segment(self, image: np.ndarray) -> List[np.ndarray]:
+        """
+        切分字符
+
+        Args:
+            image: 只包含一行数字的图像
+
+        Returns:
+            从左到右的字符图像，每个都是GLYPH_HEIGHT x GLYPH_WIDTH的二值图
+        """
+        if image.ndim == 3:
+            code = cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            gray = cv2.cvtColor(image, code)
+        else:
+            gray = image
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # 文字笔画占少数像素，深色字时反转
+        if np.count_nonzero(binary) > binary.size / 2:
+            binary = 255 - binary
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        boxes = [stats[i, :4] for i in range(1, count) if stats[i, cv2.CC_STAT_AREA] >= 3]
+        if not boxes:
+            return []
+
+        # 以较高的连通域确定文字行的上下边界，行外的噪点丢弃
+        max_height = max(h for _, _, _, h in boxes)
+        tall = [(y, y + h) for _, y, _, h in boxes if h >= max_height * 0.6]
+        top, bottom = min(y1 for y1, _ in tall), max(y2 for _, y2 in tall)
+        boxes = [(x, y, w, h) for x, y, w, h in boxes if y < bottom and y + h > top]
+
+        # 横向重叠的连通域属于同一字符(如冒号的两个点)
+        spans = []
+        for x, _, w, _ in sorted(boxes, key=lambda box: box[0]):
+            if spans and x < spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], x + w)
+            else:
+                spans.append([x, x + w])
+
+        line_height = bottom - top
+        scale = self.GLYPH_HEIGHT / line_height
+        glyphs = []
+        for x1, x2 in spans:
+            crop = binary[top:bottom, x1:x2]
+            width = min(max(int(round((x2 - x1) * scale)), 1), self.GLYPH_WIDTH)
+            crop = cv2.resize(crop, (width, self.GLYPH_HEIGHT), interpolation=cv2.INTER_AREA)
+            glyph = np.zeros((self.GLYPH_HEIGHT, self.GLYPH_WIDTH), np.uint8)
+            offset = (self.GLYPH_WIDTH - width) // 2
+            glyph[:, offset:offset + width] = crop
+            glyphs.append(glyph)
+        return glyphs
+
+    def _classify(self, glyphs: List[np.ndarray]) -> List[tuple]:
+        """每个字符的(最佳匹配字符, 得分)，模板库为空时得分为0"""
+        matrix, labels = self._bank()
+        if matrix is None or not glyphs:
+            return [('?', 0.0) for _ in glyphs]
+        scores = matrix @ np.array([self._vector(glyph) for glyph in glyphs]).T
+        best = scores.argmax(axis=0)
+        return [(labels[index], float(scores[index, i])) for i, index in enumerate(best)]
+
+    @classmethod
+    def parse(cls, text: str, fmt: str = None) -> Optional[List[int]]:
+        """
+        按格式解析数字
+
+        Args:
+            text: 识别出的文本
+            fmt: FORMATS中的格式名，None时提取所有数字
+
+        Returns:
+            数字列表，time格式为[时, 分, 秒]；不符合格式时返回None
+        """
+        if fmt is None:
+            numbers = [int(number) for number in re.findall(r'\d+', text)]
+            return numbers or None
+        match = re.fullmatch(cls.FORMATS[fmt], text)
+        if match is None:
+            return None
+        if fmt == 'time':
+            return [int(value or 0) for value in match.groups()]
+        return [int(value.replace(',', '')) for value in match.groups()]
+
+    @classmethod
+    def find(cls, text: str, fmt: str = None) -> Optional[str]:
+        """从其他OCR的输出中找出符合格式的部分，如'下次刷新：01:25:56'中的'01:25:56'"""
+        text = re.sub(r'\s+', '', text).replace('：', ':').replace('，', ',')
+        if fmt is None:
+            return text or None
+        match = re.search(cls.FORMATS[fmt], text)
+        return match.group(0) if match else None
+
+    def read(self, image: np.ndarray, fmt: str = None) -> DigitReading:
+        """
+        识别一行数字
+
+        Args:
+            image: 只包含一行数字的图像
+            fmt: FORMATS中的格式名，None时不校验格式
+
+        Returns:
+            DigitReading，不符合格式或模板库缺少该格式的字符时confidence为0
+        """
+        results = self._classify(self.segment(image))
+        text = ''.join(char for char, _ in results)
+        values = self.parse(text, fmt)
+        # 缺少的字符会被强行匹配成最相近的其他字符，结果不可信
+        if not results or values is None or not self.covers(fmt):
+            return DigitReading(text, values, 0.0)
+        return DigitReading(text, values, min(score for _, score in results))
+
+    def _confirm(self, char: str, glyph: np.ndarray, source: str) -> bool:
+        """
+        另一张图像上已有相似的同一字符待确认样本时返回True，否则记为待确认
+
+        同一张图像重复识别(如命中OCR缓存)不算独立识别
+        """
+        vector = self._vector(glyph)
+        with self._lock:
+            pending = self._pending.setdefault(char, [])
+            for i, (other, other_source) in enumerate(pending):
+                if other_source != source and float(other @ vector) >= self.LEARN_CONFIRM:
+                    del pending[i]
+                    return True
+            pending.append((vector, source))
+            del pending[:-self.MAX_PENDING]
+            return False
+
+    def learn(self, image: np.ndarray, text: str, save: bool = True) -> int:
+        """
+        用已知文本(如VLM的识别结果)补充模板库
+
+        切出的字符数与文本字符数一致时才学习，已能可靠识别的字符不重复加入；
+        单次识别可能有误，字符样本要在另一张图像上以同样的文本再次出现才加入模板库
+
+        Args:
+            image: 与read()相同区域的图像
+            text: 图像中的文本，不含空白
+            save: 是否保存到learned_dir
+
+        Returns:
+            新加入的样本数
+        """
+        glyphs = self.segment(image)
+        if not glyphs or len(glyphs) != len(text):
+            return 0
+
+        source = hashlib.blake2b(np.ascontiguousarray(image).data, digest_size=16).hexdigest()
+        added = 0
+        for glyph, char, (best, score) in zip(glyphs, text, self._classify(glyphs)):
+            if best == char and score >= self.LEARN_SKIP:
+                continue
+            if not self._confirm(char, glyph, source):
+                continue
+            with self._lock:
+                samples = self._samples.setdefault(char, [])
+                if len(samples) >= self.MAX_SAMPLES:
+                    continue
+                samples.append(glyph)
+                self._matrix = None
+            added += 1
+            if save and self.learned_dir:
+                directory = self._label_dir(char)
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f'{time.time_ns()}.png')
+                Image.fromarray(glyph).save(path)
+        return added
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return sum(len(glyphs) for glyphs in self._samples.values())
+
+
+# 导入时不创建目录，learn()保存第一个样本时才创建
+digit_reader = DigitReader(learned_dir=user_data_dir('digits', create=False))
@@ -1,99 +1,376 @@
+import threading
+from collections import OrderedDict
+
 import numpy as np
 import cv2
 
 from PIL import Image
-from typing import Optional, Tuple, List
+from typing import Any, Hashable, Optional, Tuple, List
+from ScreenCapture import Frame
+from TemplateRegistry import Template, template_registry
+
+
+class MatchCache:
+    """
+    单帧匹配结果的LRU缓存
+
+    键为(帧内容哈希, 模板, 阈值, 搜索区域等匹配参数)，同一帧上重复查询同一模板时直接返回上次结果；
+    画面没有变化的新帧内容相同，也能命中。按内容而不是帧序号区分，裁剪出的视图和未编号的帧不会互相串用，
+    也不需要在截图或输入后清空，旧结果按LRU淘汰
+    """
+
+    def __init__(self, size: int = 64):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        查询缓存
+
+        Returns:
+            (是否命中, 缓存的结果)
+        """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return True, self._results[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, result: Any):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self) -> dict:
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
 
 
 class ImageMatcher:
     """图像匹配工具类"""
 
+    # 金字塔匹配的默认层级，0为全分辨率穷举匹配，1为1/2，2为1/4。
+    # tests/截图上1/2和1/4的结果都与穷举匹配完全一致(benchmark.py pyramid)，默认取更保守的1/2
+    PYRAMID_LEVEL = 1
+    # 缩小后模板的最小边长，再小就降低层级
+    PYRAMID_MIN_SIZE = 8
+    # 粗匹配阶段的阈值放宽量，以及保留的候选峰值数
+    PYRAMID_MARGIN = 0.15
+    PYRAMID_CANDIDATES = 5
+    # 缩放匹配的尺度数，以及优先尝试上次成功尺度两侧各几个相邻尺度
+    SCALE_STEPS = 30
+    SCALE_NEIGHBOURS = 1
+    # 搜索区域内的得分需高出阈值到1之间余量的这一比例才直接采用，否则再搜索全屏取得分最高的位置；
+    # 按比例计算，阈值很高(如0.99)时区域内的结果仍可能直接采用
+    ROI_CONFIRM_MARGIN = 0.5
+
+    def __init__(self, cache: MatchCache = None):
+        """
+        Args:
+            cache: 匹配结果缓存，通常使用ADBController.match_cache，为None时不缓存
+        """
+        self.cache = cache
+
+    def match(self, screenshot: np.ndarray, template: np.ndarray, threshold: float = 0.8,
+              scale_match: bool = False, scale_range: tuple = (0.5, 2.0)) -> Optional[Tuple[int, int]]:
+        """
+        带缓存的find_template，截图为Frame时相同内容上相同参数的查询只匹配一次
+
+        Returns:
+            匹配位置的坐标(x, y)或None
+        """
+        if self.cache is None or not isinstance(screenshot, Frame):
+            return self.find_template(screenshot, template, threshold, scale_match, scale_range)
+
+        template_id = template.path if isinstance(template, Template) and template.path else id(template)
+        key = (screenshot.shape, screenshot.hash, template_id, threshold, getattr(template, 'roi', None),
+               scale_match, tuple(scale_range) if scale_match else None)
+        hit, position = self.cache.get(key)
+        if not hit:
+            position = self.find_template(screenshot, template, threshold, scale_match, scale_range)
+            self.cache.put(key, position)
+        return position
+
+    @staticmethod
+    def to_gray(image: np.ndarray) -> np.ndarray:
+        """转换为灰度图，Frame和Template直接使用已缓存的灰度图"""
+        if isinstance(image, Frame):
+            return image.gray
+        if isinstance(image, Template) and image.gray is not None:
+            return image.gray
+        if len(image.shape) == 3:
+            return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        return image
+
+    @staticmethod
+    def pyramid(image: np.ndarray, level: int) -> np.ndarray:
+        """灰度图金字塔层级，Frame和Template使用各自的缓存"""
+        if isinstance(image, Frame):
+            return image.pyramid(level)
+        if isinstance(image, Template) and image.gray is not None:
+            return image.pyramid(level)
+        image = ImageMatcher.to_gray(image)
+        for _ in range(level):
+            image = cv2.resize(image, (image.shape[1] // 2, image.shape[0] // 2), interpolation=cv2.INTER_AREA)
+        return image
+
     @staticmethod
     def find_template(screenshot: np.ndarray, template: np.ndarray, threshold: float = 0.8,
-                      scale_match: bool = False, scale_range: tuple = (0.5, 2.0)) -> Optional[Tuple[int, int]]:
+                      scale_match: bool = False, scale_range: tuple = (0.5, 2.0),
+                      pyramid_level: int = None) -> Optional[Tuple[int, int]]:
         """
         在屏幕截图中查找模板图像
 
+        模板带有搜索区域(Template.search_roi)时先只在区域内查找，得分不低于
+        threshold + ROI_CONFIRM_MARGIN * (1 - threshold)时直接采用；
+        未找到或得分不够确定时再搜索全屏，取两者中得分高的。
+        返回的坐标始终是全屏坐标
+
         Args:
-            screenshot: 屏幕截图(numpy数组)
-            template: 模板图像(numpy数组)
+            screenshot: 屏幕截图(numpy数组或Frame)
+            template: 模板图像(numpy数组或Template)
             threshold: 匹配阈值(0-1之间)
-            scale_match: 在不同尺度下搜索
+            scale_match: 在不同尺度下搜索，模板上次匹配成功的尺度及其相邻尺度优先尝试
             scale_range: 缩放范围(最小值, 最大值)
+            pyramid_level: 金字塔匹配层级，先在缩小的图上找候选位置，再在原图上小窗口内确认；
+                           为None时使用ImageMatcher.PYRAMID_LEVEL，0为穷举匹配
 
         Returns:
             匹配位置的坐标(x, y)或None
         """
         # 转换为灰度图
-        if len(screenshot.shape) == 3:
-            screenshot_gray = cv2.cvtColor(screenshot, cv2.COLOR_RGB2GRAY)
-        else:
-            screenshot_gray = screenshot
+        screenshot_gray = ImageMatcher.to_gray(screenshot)
+        template_gray = ImageMatcher.to_gray(template)
 
-        if len(template.shape) == 3:
-            template_gray = cv2.cvtColor(template, cv2.COLOR_RGB2GRAY)
-        else:
-            template_gray = template
+        if pyramid_level is None:
+            pyramid_level = ImageMatcher.PYRAMID_LEVEL
+        # 模板缩小后太小时粗匹配不可靠
+        while pyramid_level > 0 and min(template_gray.shape[:2]) >> pyramid_level < ImageMatcher.PYRAMID_MIN_SIZE:
+            pyramid_level -= 1
+        template_small = ImageMatcher.pyramid(template, pyramid_level) if pyramid_level else None
 
-        # 模板匹配
+        scales, preferred = [], []
         if scale_match:
-            for scale in np.linspace(scale_range[0], scale_range[1], 30):
+            scales, preferred = ImageMatcher._scale_order(template, scale_range)
+
+        match = None
+        roi = template.search_roi(screenshot_gray.shape) if isinstance(template, Template) else None
+        if roi is not None:
+            x1, y1, x2, y2 = roi
+            crop = screenshot_gray[y1:y2, x1:x2]
+            screenshot_small = ImageMatcher.pyramid(crop, pyramid_level) if pyramid_level else None
+            match = ImageMatcher._match(crop, template_gray, threshold, scale_match, scales,
+                                        pyramid_level, screenshot_small, template_small)
+            if match:
+                x, y, w, h, scale, score = match
+                match = (x + x1, y + y1, w, h, scale, score)
+
+        # 区域内勉强过阈值的可能只是相似的图案，目标已移到别处
+        if match is None or match[5] < threshold + ImageMatcher.ROI_CONFIRM_MARGIN * (1 - threshold):
+            screenshot_small = ImageMatcher.pyramid(screenshot, pyramid_level) if pyramid_level else None
+            global_match = ImageMatcher._match(screenshot_gray, template_gray, threshold, scale_match, scales,
+                                               pyramid_level, screenshot_small, template_small)
+            if global_match is not None and (match is None or global_match[5] > match[5]):
+                match = global_match
+
+        if match is None:
+            return None
+        if preferred:
+            template.record_scale_lookup(match[4] in preferred)
+
+        x, y, w, h, scale, _ = match
+        if isinstance(template, Template):
+            template.record_match(x, y, w, h)
+            if scale_match:
+                template.last_scale = scale
+        # 返回中心点坐标
+        return x + w // 2, y + h // 2
+
+    @staticmethod
+    def _scale_order(template: np.ndarray, scale_range: tuple) -> Tuple[List[float], List[float]]:
+        """
+        缩放匹配要尝试的尺度顺序
+
+        Returns:
+            (全部尺度, 优先尝试的尺度)，模板没有记录过成功尺度时优先列表为空
+        """
+        scales = [float(scale) for scale in np.linspace(scale_range[0], scale_range[1], ImageMatcher.SCALE_STEPS)]
+        last_scale = getattr(template, 'last_scale', None)
+        if last_scale is None:
+            return scales, []
+
+        index = int(np.argmin([abs(scale - last_scale) for scale in scales]))
+        preferred = [index]
+        for step in range(1, ImageMatcher.SCALE_NEIGHBOURS + 1):
+            preferred += [i for i in (index - step, index + step) if 0 <= i < len(scales)]
+        preferred = [scales[i] for i in preferred]
+        return preferred + [scale for scale in scales if scale not in preferred], preferred
+
+    @staticmethod
+    def _match(screenshot_gray: np.ndarray, template_gray: np.ndarray, threshold: float,
+               scale_match: bool, scales: List[float] = (), pyramid_level: int = 0,
+               screenshot_small: np.ndarray = None, template_small: np.ndarray = None
+               ) -> Optional[Tuple[int, int, int, int, float, float]]:
+        """
+        在灰度图中匹配模板
+
+        Args:
+            scales: 缩放匹配时依次尝试的尺度
+            pyramid_level: 大于0时(仅非缩放匹配)使用screenshot_small和template_small做金字塔匹配
+
+        Returns:
+            匹配区域(左上角x, 左上角y, 宽, 高, 尺度, 得分)或None
+        """
+        if scale_match:
+            for scale in scales:
                 resized = cv2.resize(template_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
                 if resized.shape[0] > screenshot_gray.shape[0] or resized.shape[1] > screenshot_gray.shape[1]:
                     continue
                 result = cv2.matchTemplate(screenshot_gray, resized, cv2.TM_CCOEFF_NORMED)
                 min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
                 if max_val >= threshold:
-                    # 返回中心点坐标
                     h, w = resized.shape[:2]
-                    center_x = max_loc[0] + w // 2
-                    center_y = max_loc[1] + h // 2
-                    return center_x, center_y
+                    return max_loc[0], max_loc[1], w, h, scale, max_val
         else:
+            h, w = template_gray.shape[:2]
+            if h > screenshot_gray.shape[0] or w > screenshot_gray.shape[1]:
+                return None
+            if pyramid_level > 0:
+                return ImageMatcher._match_pyramid(screenshot_gray, template_gray, threshold, pyramid_level,
+                                                   screenshot_small, template_small)
             result = cv2.matchTemplate(screenshot_gray, template_gray, cv2.TM_CCOEFF_NORMED)
             min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
 
             if max_val >= threshold:
-                # 返回中心点坐标
-                h, w = template_gray.shape[:2]
-                center_x = max_loc[0] + w // 2
-                center_y = max_loc[1] + h // 2
-                return center_x, center_y
+                return max_loc[0], max_loc[1], w, h, 1.0, max_val
 
         return None
 
     @staticmethod
-    def find_all_templates(screenshot: np.ndarray, template: np.ndarray,
-                           threshold: float = 0.8) -> List[Tuple[int, int]]:
+    def _match_pyramid(screenshot_gray: np.ndarray, template_gray: np.ndarray, threshold: float, level: int,
+                       screenshot_small: np.ndarray, template_small: np.ndarray
+                       ) -> Optional[Tuple[int, int, int, int, float, float]]:
         """
-        在屏幕截图中查找所有匹配的模板图像
+        金字塔匹配：在缩小的图上取得分最高的几个候选峰值，再在原图上只匹配候选附近的小窗口
 
         Returns:
-            匹配位置列表[(x1, y1), (x2, y2), ...]
+            原图上的匹配区域(左上角x, 左上角y, 宽, 高, 尺度, 得分)或None
         """
-        if len(screenshot.shape) == 3:
-            screenshot_gray = cv2.cvtColor(screenshot, cv2.COLOR_RGB2GRAY)
-        else:
-            screenshot_gray = screenshot
+        small_h, small_w = template_small.shape[:2]
+        if small_h > screenshot_small.shape[0] or small_w > screenshot_small.shape[1]:
+            return None
+        result = cv2.matchTemplate(screenshot_small, template_small, cv2.TM_CCOEFF_NORMED)
 
-        if len(template.shape) == 3:
-            template_gray = cv2.cvtColor(template, cv2.COLOR_RGB2GRAY)
-        else:
-            template_gray = template
+        candidates = []
+        coarse_threshold = threshold - ImageMatcher.PYRAMID_MARGIN
+        for _ in range(ImageMatcher.PYRAMID_CANDIDATES):
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            if max_val < coarse_threshold:
+                break
+            candidates.append(max_loc)
+            # 抑制该峰值附近，避免同一目标产生多个候选
+            x, y = max_loc
+            result[max(y - small_h // 2, 0):y + small_h // 2 + 1, max(x - small_w // 2, 0):x + small_w // 2 + 1] = -1
 
-        result = cv2.matchTemplate(screenshot_gray, template_gray, cv2.TM_CCOEFF_NORMED)
-        locations = np.where(result >= threshold)
+        h, w = template_gray.shape[:2]
+        screen_h, screen_w = screenshot_gray.shape[:2]
+        factor = 1 << level
+        # 确认窗口覆盖整个被抑制的邻域，再留出缩小取整带来的偏差
+        radius_x = (small_w // 2 + 2) * factor
+        radius_y = (small_h // 2 + 2) * factor
+        best_val, best_loc = -1.0, None
+        for x, y in candidates:
+            x1 = min(max(x * factor - radius_x, 0), screen_w - w)
+            y1 = min(max(y * factor - radius_y, 0), screen_h - h)
+            x2 = min(x * factor + radius_x + w, screen_w)
+            y2 = min(y * factor + radius_y + h, screen_h)
+            window = cv2.matchTemplate(screenshot_gray[y1:y2, x1:x2], template_gray, cv2.TM_CCOEFF_NORMED)
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(window)
+            if max_val > best_val:
+                best_val, best_loc = max_val, (max_loc[0] + x1, max_loc[1] + y1)
+
+        if best_loc is not None and best_val >= threshold:
+            return best_loc[0], best_loc[1], w, h, 1.0, best_val
+        return None
+
+    @staticmethod
+    def find_all_templates(screenshot: np.ndarray, template: np.ndarray, threshold: float = 0.8,
+                           min_distance: int = 8, overlap: float = 0.3) -> List[Tuple[int, int, float]]:
+        """
+        在屏幕截图中查找所有匹配的模板图像
+
+        先取匹配得分图上的局部极大值，再对重叠的匹配框做非极大值抑制
+
+        Args:
+            min_distance: 局部极大值的邻域半径(像素)，距离更近的峰值只保留得分高的
+            overlap: 两个匹配框的交并比超过该值时只保留得分高的
+
+        Returns:
+            按得分从高到低排列的匹配列表[(x1, y1, score1), (x2, y2, score2), ...]，坐标为中心点
+        """
+        screenshot_gray = ImageMatcher.to_gray(screenshot)
+        template_gray = ImageMatcher.to_gray(template)
 
-        matches = []
         h, w = template_gray.shape[:2]
+        if h > screenshot_gray.shape[0] or w > screenshot_gray.shape[1]:
+            return []
+        result = cv2.matchTemplate(screenshot_gray, template_gray, cv2.TM_CCOEFF_NORMED)
+
+        # 局部极大值：不低于邻域内最大值的点
+        kernel = np.ones((2 * min_distance + 1, 2 * min_distance + 1), np.uint8)
+        peaks = (result >= threshold) & (result >= cv2.dilate(result, kernel))
+        ys, xs = np.nonzero(peaks)
+        if len(xs) == 0:
+            return []
+
+        scores = result[ys, xs]
+        order = np.argsort(-scores, kind='stable')
+        xs, ys, scores = xs[order], ys[order], scores[order]
+        keep = ImageMatcher._suppress_overlaps(xs, ys, w, h, overlap)
 
-        # 对匹配结果进行非极大值抑制
-        for pt in zip(*locations[::-1]):
-            center_x = pt[0] + w // 2
-            center_y = pt[1] + h // 2
-            matches.append((center_x, center_y))
+        return [(int(x) + w // 2, int(y) + h // 2, float(score))
+                for x, y, score in zip(xs[keep], ys[keep], scores[keep])]
 
-        return matches
+    @staticmethod
+    def _suppress_overlaps(xs: np.ndarray, ys: np.ndarray, w: int, h: int, overlap: float) -> np.ndarray:
+        """
+        对按得分降序排列的同尺寸匹配框做非极大值抑制
+
+        贪心抑制中每个框是否保留取决于之前保留的框，无法整体向量化：
+        Python循环只在保留的框上执行，每次用numpy算出它与后面所有框的交并比，
+        被抑制的框直接跳过
+
+        Returns:
+            保留的下标数组
+        """
+        suppressed = np.zeros(len(xs), dtype=bool)
+        keep = []
+        i = 0
+        while i < len(xs):
+            keep.append(i)
+            # 同尺寸框的交集只取决于偏移量，一次算出与后面所有框的交并比
+            inter = (np.clip(w - np.abs(xs[i + 1:] - xs[i]), 0, None) *
+                     np.clip(h - np.abs(ys[i + 1:] - ys[i]), 0, None))
+            suppressed[i + 1:] |= inter / (2 * w * h - inter) > overlap
+            # 跳到下一个未被抑制的框
+            remaining = np.flatnonzero(~suppressed[i + 1:])
+            if len(remaining) == 0:
+                break
+            i += 1 + int(remaining[0])
+        return np.array(keep, dtype=int)
 
     @staticmethod
     def save_screenshot(screenshot: np.ndarray, filename: str):
@@ -101,6 +378,6 @@ class ImageMatcher:
         Image.fromarray(screenshot).save(filename)
 
     @staticmethod
-    def load_template(filename: str) -> np.ndarray:
-        """加载模板图像"""
-        return np.array(Image.open(filename))
+    def load_template(filename: str) -> Template:
+        """加载模板图像，经由共享的模板缓存，同一文件只读取一次"""
+        return template_registry.get(filename)
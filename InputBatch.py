@@ -0,0 +1,94 @@
+import inspect
+import random
+from typing import List
+
+
+class InputBatch:
+    """
+    输入批处理：把多次点击、滑动、按键和等待编成一个shell脚本，一次发送到设备上执行
+
+    用法: adb.input_batch().tap(540, 860, delay=0.2).tap(540, 860).send()
+    AsyncADBController创建的批处理用 await batch.asend() 发送
+    """
+
+    def __init__(self, adb):
+        """
+        Args:
+            adb: 执行脚本的ADBController或AsyncADBController
+        """
+        self.adb = adb
+        self.commands: List[str] = []
+        # 脚本中所有等待和滑动的总时长(秒)，用于计算超时
+        self.duration = 0.0
+
+    def __len__(self):
+        return len(self.commands)
+
+    def _add(self, command: str, delay: float, duration: float = 0.0) -> 'InputBatch':
+        self.commands.append(command)
+        self.duration += duration
+        return self.sleep(delay)
+
+    def tap(self, x: int, y: int, random_range: int = 3, delay: float = 0.0) -> 'InputBatch':
+        """
+        点击
+
+        Args:
+            random_range: 坐标随机偏移范围，与ADBController.tap一致
+            delay: 点击后等待的时间(秒)
+        """
+        offset = abs(random_range)
+        x += random.randint(-offset, offset)
+        y += random.randint(-offset, offset)
+        return self._add(f'input tap {x} {y}', delay)
+
+    def swipe(self, start_x: int, start_y: int, end_x: int, end_y: int, duration: int = 500,
+              delay: float = 0.0) -> 'InputBatch':
+        """滑动，duration为滑动时长(毫秒)，delay为滑动结束后等待的时间(秒)"""
+        return self._add(f'input swipe {start_x} {start_y} {end_x} {end_y} {duration}', delay, duration / 1000)
+
+    def key(self, keycode: int, delay: float = 0.0) -> 'InputBatch':
+        """按键"""
+        return self._add(f'input keyevent {keycode}', delay)
+
+    def sleep(self, seconds: float) -> 'InputBatch':
+        """在设备上等待"""
+        if seconds > 0:
+            self.commands.append(f'sleep {seconds:g}')
+            self.duration += seconds
+        return self
+
+    def script(self) -> str:
+        """生成shell脚本"""
+        return '; '.join(self.commands)
+
+    def _take(self):
+        """取出脚本和超时时间并清空批处理"""
+        # 设备上每条input命令启动也要时间，超时按命令数留出余量
+        script, timeout = self.script(), self.duration + len(self.commands) * 0.5 + 5
+        self.commands = []
+        self.duration = 0.0
+        return script, timeout
+
+    def send(self) -> bool:
+        """
+        一次发送并等待全部执行完
+
+        Returns:
+            是否执行成功
+        """
+        if inspect.iscoroutinefunction(self.adb._run_input):
+            raise TypeError("异步控制器的批处理请使用 await batch.asend()")
+        if not self.commands:
+            return True
+        script, timeout = self._take()
+        return self.adb._run_input(script, timeout=timeout)
+
+    async def asend(self) -> bool:
+        """send的异步版本，用于AsyncADBController"""
+        if not inspect.iscoroutinefunction(self.adb._run_input):
+            raise TypeError("同步控制器的批处理请使用 batch.send()")
+        if not self.commands:
+            return True
+        script, timeout = self._take()
+        return await self.adb._run_input(script, timeout=timeout)
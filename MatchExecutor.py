@@ -0,0 +1,127 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable, List
+
+
+class MatchExecutor:
+    """
+    进程内共享的模板匹配线程池
+
+    工作线程数等于CPU核数，所有自动化实例共用。任务按设备分别排队，
+    工作线程在有任务的设备之间轮流取任务，某个设备短时间提交大量任务也不会让其他设备饿死；
+    每个设备排队的任务数有上限，超出时提交方阻塞等待。
+    在工作线程中执行的任务再提交任务时直接在当前线程执行，避免所有工作线程互相等待而死锁
+    """
+
+    def __init__(self, max_workers: int = None, max_queued: int = 64):
+        """
+        初始化线程池
+
+        Args:
+            max_workers: 工作线程数，为None时使用CPU核数
+            max_queued: 每个设备最多排队的任务数
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self._queues: Dict[Hashable, deque] = {}
+        # 有任务排队的设备，按轮转顺序排列
+        self._ready = deque()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._shutdown = False
+        # 标记当前线程是否为本线程池的工作线程
+        self._local = threading.local()
+
+    def _start_workers(self):
+        for _ in range(self.max_workers - len(self._threads)):
+            thread = threading.Thread(target=self._worker, name=f'MatchExecutor-{len(self._threads)}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, device: Hashable, fn: Callable, *args, **kwargs) -> Future:
+        """
+        提交一个任务
+
+        Args:
+            device: 提交任务的设备标识，用于公平调度
+            fn: 要执行的函数
+
+        Returns:
+            Future对象
+        """
+        future = Future()
+        if getattr(self._local, 'worker', False):
+            # 工作线程中提交的任务排队后，等待它的工作线程可能再也等不到空闲线程
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("匹配线程池已关闭")
+            if not self._threads:
+                self._start_workers()
+            queue = self._queues.setdefault(device, deque())
+            self._condition.wait_for(lambda: len(queue) < self.max_queued or self._shutdown)
+            if self._shutdown:
+                raise RuntimeError("匹配线程池已关闭")
+            queue.append((future, fn, args, kwargs))
+            if device not in self._ready:
+                self._ready.append(device)
+            self._condition.notify_all()
+        return future
+
+    def map(self, device: Hashable, fn: Callable, iterable: Iterable) -> List[Any]:
+        """对每个元素执行fn，按原顺序返回结果，任一任务异常时抛出"""
+        futures = [self.submit(device, fn, item) for item in iterable]
+        return [future.result() for future in futures]
+
+    def _next_task(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._ready or self._shutdown)
+            if not self._ready:
+                return None
+            device = self._ready.popleft()
+            queue = self._queues[device]
+            task = queue.popleft()
+            if queue:
+                self._ready.append(device)
+            # 唤醒因队列已满而等待的提交方
+            self._condition.notify_all()
+            return task
+
+    def _worker(self):
+        self._local.worker = True
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def pending(self) -> Dict[Hashable, int]:
+        """各设备排队中的任务数"""
+        with self._condition:
+            return {device: len(queue) for device, queue in self._queues.items() if queue}
+
+    def shutdown(self, wait: bool = True):
+        """关闭线程池，已排队的任务仍会执行完"""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            threads, self._threads = self._threads, []
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+match_executor = MatchExecutor()
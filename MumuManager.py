@@ -1,131 +1,76 @@
-from typing import Tuple, Dict, Optional, List, Any
+from typing import Tuple, Dict, Optional, List, Any, Union
 import subprocess
 import json
 import re
+import shlex
+import struct
 import time
 import io
+import itertools
 import random
-import zlib
+import threading
+import cv2
 import numpy as np
 
 from PIL import Image
-from concurrent.futures import ThreadPoolExecutor
-from OCRProcessor import OCRProcessor
-from ImageMatcher import ImageMatcher
-
-
-def find_distinct_points(coordinates, threshold=8):
-    """
-    方法3：寻找显著不同的点
-    """
-
-    # 对坐标进行排序
-    sorted_points = sorted(coordinates, key=lambda p: (p[1], p[0]))
-
-    distinct_points = []
-
-    for point in sorted_points:
-        if not distinct_points:
-            distinct_points.append(point)
-        else:
-            # 检查点是否与已有显著点相似
-            similar = False
-            for dp in distinct_points:
-                distance = np.linalg.norm(np.array(point) - np.array(dp))
-                if distance <= threshold:
-                    similar = True
-                    break
-
-            if not similar:
-                distinct_points.append(point)
-
-    # 合并过于接近的点
-    merged_points = []
-    for point in distinct_points:
-        if not merged_points:
-            merged_points.append([point])
-        else:
-            # 检查是否可以合并到现有组
-            merged = False
-            for group in merged_points:
-                group_center = np.mean(group, axis=0)
-                distance = np.linalg.norm(np.array(point) - group_center)
-                if distance <= threshold:
-                    group.append(point)
-                    merged = True
-                    break
-
-            if not merged:
-                merged_points.append([point])
-
-    # 计算最终的代表点
-    final_points = []
-    for group in merged_points:
-        group_array = np.array(group)
-        center = np.mean(group_array, axis=0)
-        center_rounded = tuple(np.round(center).astype(int))
-        final_points.append(center_rounded)
-
-    # 按Y坐标排序
-    final_points.sort(key=lambda p: p[1])
-
-    return final_points
+from ADBTransport import ADBShellSession, ADBSocketTransport
+from BootOrchestrator import get_boot_orchestrator
+from DeviceRegistry import get_device_registry
+from OCRProcessor import OCRProcessor, VLMEncoding
+from ImageMatcher import ImageMatcher, MatchCache
+from InputBatch import InputBatch
+from MatchExecutor import match_executor
+from ScreenCapture import Frame, ScreenCaptureLoop
+from ScreenClassifier import ScreenClassifier
+from TemplateRegistry import template_registry
+from WaitStrategy import WaitStrategy, NewFrameWait
 
 
 class ADBController:
-    def __init__(self, device_id: int, mmm_path: str = r'C:\Program Files\Netease\MuMu\nx_main\MuMuManager.exe'):
+    # 前台应用缓存的有效期(秒)，正常由任务管理器的监控线程定期刷新
+    FOREGROUND_TTL = 15.0
+
+    def __init__(self, device_id: int, mmm_path: str = r'C:\Program Files\Netease\MuMu\nx_main\MuMuManager.exe',
+                 use_shell_session: bool = True, use_socket_transport: bool = True):
         self.device_id = device_id
         self.str_device_id = str(self.device_id)
         self.device_name = None
         self.mmm_path = [mmm_path]
+        # 设备列表查询由同一MuMuManager的所有控制器共用
+        self.device_registry = get_device_registry(mmm_path)
+        # 输入命令通过常驻shell会话发送，避免每次点击都启动一个MuMuManager进程
+        self.use_shell_session = use_shell_session
+        self.shell_session: Optional[ADBShellSession] = None
+        self._session_lock = threading.Lock()
+        # 可直连模拟器adbd时，shell/exec-out命令不再经过MuMuManager.exe
+        self.use_socket_transport = use_socket_transport
+        self.transport: Optional[ADBSocketTransport] = None
+        # 连接时选定的截图方式，之后一直使用，失败时才重新探测
+        self.screenshot_method: Optional[str] = None
+        # 可选的后台连续截图，识别、OCR共用同一截图流
+        self.capture_loop: Optional[ScreenCaptureLoop] = None
+        self.last_input_time = 0.0
+        self._frame_counter = itertools.count(1)
+        # 按帧内容缓存的匹配结果，LRU淘汰
+        self.match_cache = MatchCache()
+        # 缓存的前台应用包名和查询时间
+        self._foreground_app: Optional[str] = None
+        self._foreground_time = 0.0
+        self._foreground_lock = threading.Lock()
         self._check_and_select_device()
-
-    def get_all_devices_info(self):
-        devices = {}
         try:
-            # 获取设备列表
+            self._probe_screenshot_method()
+        except Exception as e:
+            print(f"截图方式探测失败，将在首次截图时重试: {e}")
 
-            mmm_info = self.mmm_path + ['info', '-v', 'all']
-            result = subprocess.run(mmm_info, capture_output=True, text=True, encoding='utf-8')
-            if result.returncode == 0:
-                pass
-            else:
-                mmm_info = self.mmm_path + ['setting', '-v', 'all', '-a']
-                result = subprocess.run(mmm_info, capture_output=True, text=True, check=True, encoding='utf-8')
-            lines = result.stdout
-            lines = json.loads(lines)
-
-            for key, value in lines.items():
-                name = value['name'] if 'name' in value else value.get('player_name', '')
-                tab_name = format(zlib.crc32(name.encode('utf-8')), '08x')
-                state = False
-                if 'is_process_started' in value:
-                    state = value['is_process_started']
-                else:
-                    mmm_info = self.mmm_path + ['adb', '-v', key]
-                    result = subprocess.run(mmm_info, capture_output=True, text=True, encoding='utf-8')
-                    lines = json.loads(result.stdout)
-                    if 'adb_host' in lines:
-                        state = True
-                key = int(key)
-                devices.update(
-                    {
-                        key:
-                            {
-                                'id':   key,
-                                'name': name,
-                                'tab_name': tab_name,
-                                'state': state
-                            }
-                    }
-                )
-
-            if not devices:
-                raise Exception("未检测到连接的ADB设备")
-            else:
-                return devices
-        except subprocess.CalledProcessError:
-            raise Exception("ADB命令执行失败，请检查ADB是否正确安装")
+    def get_all_devices_info(self, max_age: float = None):
+        """
+        获取所有设备信息，来自同一MuMuManager共用的设备信息缓存
+
+        Args:
+            max_age: 可接受的缓存时长(秒)，None为缓存的刷新间隔，0表示重新查询
+        """
+        return self.device_registry.snapshot(max_age)
 
     def _check_and_select_device(self):
         devices = self.get_all_devices_info()
@@ -142,11 +87,46 @@ class ADBController:
 
         if not devices[self.device_id]['state']:
             self._launch_mumu()
+            devices = self.get_all_devices_info()
 
         self.device_name = devices[self.device_id]['name']
 
         print(f"已选择设备: {self.device_name}")
 
+        if self.use_socket_transport:
+            self._connect_transport(devices[self.device_id])
+
+    def _resolve_adb_address(self, device: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+        """解析模拟器adbd的地址和端口，设备信息中没有时查询一次MuMuManager"""
+        host, port = device.get('adb_host'), device.get('adb_port')
+        if not host or not port:
+            try:
+                cmd = self.mmm_path + ['adb', '-v', self.str_device_id]
+                result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', timeout=10)
+                info = json.loads(result.stdout)
+                host = info.get('adb_host', info.get('adb_host_ip'))
+                port = info.get('adb_port')
+            except Exception as e:
+                print(f"获取adb地址失败: {e}")
+                return None
+        if not host or not port:
+            return None
+        return host, int(port)
+
+    def _connect_transport(self, device: Dict[str, Any]):
+        """尝试直连模拟器adbd，不可达时保持使用MuMuManager.exe"""
+        address = self._resolve_adb_address(device)
+        if address is None:
+            return
+        # 连接失败也保留transport：它会在等待期过后自行重试
+        self.transport = ADBSocketTransport(*address)
+        try:
+            self.transport.connect()
+        except Exception as e:
+            print(f"无法直连adbd {address[0]}:{address[1]}，暂时使用MuMuManager转发: {e}")
+            return
+        print(f"已直连adbd: {address[0]}:{address[1]}")
+
     def _shutdown_mumu(self):
         try:
             mmm_stop = self.mmm_path + ['control', '-v', self.str_device_id, 'shutdown']
@@ -155,16 +135,10 @@ class ADBController:
             print(f"设备 {self.str_device_id} 已停止或不存在")
 
     def _launch_mumu(self):
-        started = False
-        try:
-            mmm_launch = self.mmm_path + ['control', '-v', self.str_device_id, 'launch']
-            subprocess.run(mmm_launch, check=True, capture_output=True, text=True)
-            while not started:
-                devices = self.get_all_devices_info()
-                started = devices[self.device_id]['state']
-                time.sleep(1)
-        except subprocess.CalledProcessError:
-            print(f"设备 {self.str_device_id} 已启动或不存在")
+        # 同一MuMuManager的所有控制器共用一个启动器，并发上限和启动间隔对它们共同生效
+        result = get_boot_orchestrator(self.mmm_path[0]).boot([self.device_id])[self.device_id]
+        if not result.ready:
+            print(f"设备 {self.str_device_id} 启动失败: {result.error}")
 
     def _get_adb_command(self, command, include_device=True):
         """构建ADB命令，自动添加设备ID"""
@@ -175,6 +149,113 @@ class ADBController:
             command = self.mmm_path + ['adb', '-v', '0', '-c'] + command
             return command
 
+    def _use_transport(self) -> bool:
+        """adbd直连是否可用，连接失败后的等待期内直接走其他通道"""
+        return self.transport is not None and self.transport.available
+
+    def _run_adb(self, command: List[str], timeout: float = None,
+                 text: bool = False, raw: bool = False) -> subprocess.CompletedProcess:
+        """
+        执行ADB命令，shell/exec-out命令优先通过socket直连adbd
+
+        Args:
+            command: adb参数，如 ['shell', 'wm', 'size']、['exec-out', 'screencap', '-p']
+            timeout: 超时时间(秒)
+            text: 是否以文本形式返回输出
+            raw: command[1]是已拼好的shell脚本(可含管道等)，直连时不再转义
+
+        Returns:
+            subprocess.CompletedProcess，直连时二进制输出为接收缓冲区(bytearray)
+        """
+        if self._use_transport() and command[0] in ('shell', 'exec-out'):
+            if raw:
+                script = ' '.join(command[1:])
+            else:
+                script = ' '.join(shlex.quote(str(arg)) for arg in command[1:])
+            service = 'shell' if command[0] == 'shell' else 'exec'
+            try:
+                returncode, output = self.transport.run_status(service, script, timeout=timeout)
+                if text:
+                    return subprocess.CompletedProcess(command, returncode,
+                                                       output.decode('utf-8', errors='replace'), '')
+                # 直接返回接收缓冲区，原始帧缓冲解析时不再复制
+                return subprocess.CompletedProcess(command, returncode, output, b'')
+            except Exception as e:
+                print(f"adbd直连执行失败，改用MuMuManager转发: {e}")
+
+        cmd = self._get_adb_command(command)
+        return subprocess.run(cmd, capture_output=True, text=text, timeout=timeout)
+
+    def _get_shell_session(self) -> Optional[ADBShellSession]:
+        """获取常驻shell会话，首次调用时启动，启动失败则退回子进程方式"""
+        with self._session_lock:
+            if not self.use_shell_session:
+                return None
+            if self.shell_session is not None and self.shell_session.is_alive():
+                return self.shell_session
+            try:
+                session = ADBShellSession(self._get_adb_command(['shell']))
+                session.start()
+                self.shell_session = session
+                return session
+            except Exception as e:
+                print(f"常驻shell会话不可用，改用子进程方式: {e}")
+                self.use_shell_session = False
+                self.shell_session = None
+                return None
+
+    def _run_input(self, args: Union[List[str], str], timeout: float = 5) -> bool:
+        """
+        执行input类shell命令，依次尝试adbd直连、常驻shell会话和每次启动子进程
+
+        Args:
+            args: shell命令参数，如 ['input', 'tap', '100', '200']，或已拼好的shell脚本(见InputBatch)
+            timeout: 会话中等待命令完成的超时时间(秒)
+
+        Returns:
+            命令是否执行成功
+        """
+        script = args if isinstance(args, str) else ' '.join(shlex.quote(str(arg)) for arg in args)
+        if self._use_transport():
+            try:
+                returncode, _ = self.transport.run_status('shell', script, timeout=timeout)
+                self._mark_input()
+                return returncode == 0
+            except Exception as e:
+                print(f"adbd直连执行失败，改用shell会话: {e}")
+
+        session = self._get_shell_session()
+        if session is not None:
+            try:
+                returncode, _ = session.run(script, timeout=timeout)
+                self._mark_input()
+                return returncode == 0
+            except Exception as e:
+                print(f"shell会话执行失败，改用子进程方式: {e}")
+                self.shell_session = None
+
+        cmd = self._get_adb_command(['shell'] + ([script] if isinstance(args, str) else args))
+        result = subprocess.run(cmd, capture_output=True)
+        self._mark_input()
+        return result.returncode == 0
+
+    def input_batch(self) -> InputBatch:
+        """创建输入批处理，多次输入编成一个脚本一次发送"""
+        return InputBatch(self)
+
+    def _mark_input(self):
+        """记录输入事件：之后的识别需要新帧"""
+        self.last_input_time = time.time()
+
+    def close(self):
+        """释放常驻连接"""
+        self.stop_capture()
+        if self.transport is not None:
+            self.transport.close()
+        if self.shell_session is not None:
+            self.shell_session.close()
+            self.shell_session = None
+
     def tap(self, x, y, random_range: int = 3):
         if random_range >= 0:
             i = random_range
@@ -184,124 +265,160 @@ class ADBController:
             j = random_range
         x = x + random.randint(j, i)
         y = y + random.randint(j, i)
-        cmd = self._get_adb_command(['shell', 'input', 'tap', str(x), str(y)])
-        subprocess.run(cmd)
+        self._run_input(['input', 'tap', str(x), str(y)])
         time.sleep(0.1)
 
-    def screenshot(self):
-        """获取屏幕截图，返回numpy数组格式的图像"""
-        try:
-            # 方法1: 尝试使用exec-out命令，这通常能获得更干净的输出
-            cmd = self._get_adb_command(['exec-out', 'screencap', '-p'])
-            result = subprocess.run(cmd, capture_output=True, timeout=3)
-
-            # 检查命令是否成功执行
-            if result.returncode != 0:
-                raise Exception(f"screencap命令执行失败，错误码: {result.returncode}")
-
-            # 检查输出是否为空
-            if not result.stdout:
-                raise Exception("截图输出为空")
-
-            # 检查输出是否以PNG文件头开始（可选）
-            if result.stdout[:8] != b'\x89PNG\r\n\x1a\n':
-                print("警告: 截图数据可能不是标准PNG格式，尝试修复...")
-                # 尝试寻找PNG文件头
-                png_header = b'\x89PNG\r\n\x1a\n'
-                if png_header in result.stdout:
-                    idx = result.stdout.find(png_header)
-                    result.stdout = result.stdout[idx:]
-                else:
-                    # 如果不是PNG，尝试直接处理原始数据
-                    return self._screenshot_raw()
-
-            # 尝试使用BytesIO打开图像
-            try:
-                image = Image.open(io.BytesIO(result.stdout))
-                # 确保图像被完全加载
-                image.load()
-                return np.array(image)
-            except Exception as e:
-                print(f"PIL打开图像失败，尝试使用原始数据方法: {e}")
-                return self._screenshot_raw()
+    def screenshot(self) -> Frame:
+        """获取屏幕截图，返回Frame(numpy数组，带序号、时间戳和派生图像缓存)"""
+        if self.screenshot_method is None:
+            self._probe_screenshot_method()
 
+        start_time = time.time()
+        try:
+            image = self._screenshot_methods[self.screenshot_method]()
         except subprocess.TimeoutExpired:
             raise Exception("截图命令超时，请检查设备连接")
         except Exception as e:
-            print(f"截图失败: {e}")
-            # 尝试备用方法
-            return self._screenshot_fallback()
+            # 已选定的方式失效时才重新探测一次
+            print(f"截图失败({self.screenshot_method}): {e}，重新选择截图方式")
+            self._probe_screenshot_method()
+            image = self._screenshot_methods[self.screenshot_method]()
+        return Frame(image, next(self._frame_counter), start_time)
+
+    def start_capture(self, buffer_size: int = 4, interval: float = 0.0):
+        """
+        开启后台连续截图
+
+        Args:
+            buffer_size: 环形缓冲区保留的帧数
+            interval: 两次截图之间的最小间隔(秒)
+        """
+        if self.capture_loop is None:
+            self.capture_loop = ScreenCaptureLoop(self.screenshot, buffer_size=buffer_size, interval=interval)
+        self.capture_loop.start()
+
+    def stop_capture(self):
+        """停止后台连续截图"""
+        if self.capture_loop is not None:
+            self.capture_loop.stop()
+            self.capture_loop = None
+
+    def latest_frame(self) -> Optional[Frame]:
+        """连续截图中最新的一帧，未开启时返回None"""
+        if self.capture_loop is None:
+            return None
+        return self.capture_loop.buffer.latest()
+
+    def wait_for_frame(self, after_seq: int = 0, timeout: float = None) -> Optional[Frame]:
+        """等待序号大于after_seq的新帧，未开启连续截图或超时返回None"""
+        if self.capture_loop is None:
+            return None
+        return self.capture_loop.buffer.wait_newer(after_seq, timeout)
+
+    def get_frame(self, timeout: float = 3):
+        """
+        获取一帧用于识别
+
+        开启连续截图时读取共享缓冲区中最后一次输入之后采集的帧，否则直接截图
+        """
+        if self.capture_loop is not None and self.capture_loop.is_running:
+            frame = self.capture_loop.buffer.wait_after(self.last_input_time, timeout)
+            if frame is not None:
+                return frame
+        return self.screenshot()
+
+    @property
+    def _screenshot_methods(self):
+        # 按速度排列：原始帧缓冲 > PNG > 保存到设备后拉取
+        return {
+            'raw': self._screenshot_raw,
+            'png': self._screenshot_png,
+            'pull': self._screenshot_fallback
+        }
+
+    def _probe_screenshot_method(self):
+        """依次尝试各截图方式，选定第一个可用的并在之后一直使用"""
+        for name, method in self._screenshot_methods.items():
+            try:
+                image = method()
+                if image is not None and image.size > 0:
+                    self.screenshot_method = name
+                    print(f"截图方式: {name}")
+                    return
+            except Exception as e:
+                print(f"截图方式 {name} 不可用: {e}")
+        self.screenshot_method = None
+        raise Exception("所有截图方法都失败，请检查设备是否支持screencap命令")
+
+    def _screenshot_png(self):
+        """通过 exec-out screencap -p 获取PNG截图并解码"""
+        result = self._run_adb(['exec-out', 'screencap', '-p'], timeout=3)
+
+        # 检查命令是否成功执行
+        if result.returncode != 0:
+            raise Exception(f"screencap命令执行失败，错误码: {result.returncode}")
+
+        # 检查输出是否为空
+        if not result.stdout:
+            raise Exception("截图输出为空")
+
+        data = result.stdout
+        png_header = b'\x89PNG\r\n\x1a\n'
+        # 检查输出是否以PNG文件头开始
+        if data[:8] != png_header:
+            # 尝试寻找PNG文件头
+            idx = data.find(png_header)
+            if idx < 0:
+                raise Exception("截图数据不是PNG格式")
+            data = data[idx:]
+
+        image = Image.open(io.BytesIO(data))
+        # 确保图像被完全加载
+        image.load()
+        return np.array(image)
 
     def _screenshot_raw(self):
-        """处理原始截图数据的备用方法"""
-        try:
-            # 使用原始的screencap命令（不带-p参数）
-            cmd = self._get_adb_command(['shell', 'screencap'])
-            result = subprocess.run(cmd, capture_output=True, timeout=5)
+        """通过 exec-out screencap 获取原始帧缓冲，跳过设备端PNG压缩和本地解码"""
+        result = self._run_adb(['exec-out', 'screencap'], timeout=3)
 
-            if result.returncode != 0 or not result.stdout:
-                raise Exception("原始截图方法失败")
+        if result.returncode != 0 or not result.stdout:
+            raise Exception("原始截图方法失败")
 
-            # 原始数据可能需要处理行尾符转换
-            # Android的screencap输出使用\r\n作为行尾，需要转换为\n
-            raw_data = result.stdout.replace(b'\r\n', b'\n')
+        return self._parse_raw_screenshot(result.stdout)
 
-            # 尝试解析原始数据
-            # 原始数据格式通常是: [header][pixel data]
-            # 对于某些设备，可能需要更复杂的解析
-            return self._parse_raw_screenshot(raw_data)
+    @staticmethod
+    def _parse_raw_screenshot(raw_data):
+        """
+        解析screencap原始输出
 
-        except Exception as e:
-            print(f"原始截图方法失败: {e}")
-            raise Exception("所有截图方法都失败，请检查设备是否支持screencap命令")
+        数据格式: [宽(4字节)][高(4字节)][像素格式(4字节)][色彩空间(4字节，Android 9+)][像素数据]
 
-    def _parse_raw_screenshot(self, raw_data):
-        """解析原始截图数据"""
-        try:
-            # 尝试寻找常见图像格式的魔术头
-            # PNG
-            png_header = b'\x89PNG\r\n\x1a\n'
-            if raw_data.startswith(png_header):
-                image = Image.open(io.BytesIO(raw_data))
-                return np.array(image)
-
-            # JPEG
-            jpeg_header = b'\xff\xd8\xff'
-            if raw_data.startswith(jpeg_header):
-                image = Image.open(io.BytesIO(raw_data))
-                return np.array(image)
-
-            # 如果以上都不是，尝试作为原始RGB数据解析
-            # 这需要知道设备的分辨率
-            device_info = self.get_device_info()
-            if 'resolution' in device_info:
-                # 从分辨率字符串中提取宽高
-                res_str = device_info['resolution']
-                match = re.search(r'(\d+)x(\d+)', res_str)
-                if match:
-                    width, height = int(match.group(1)), int(match.group(2))
-                    # 假设是RGB888格式（每个像素3字节）
-                    expected_size = width * height * 3
-                    if len(raw_data) >= expected_size:
-                        # 取前expected_size字节作为图像数据
-                        img_data = raw_data[:expected_size]
-                        # 转换为numpy数组并reshape
-                        img_array = np.frombuffer(img_data, dtype=np.uint8)
-                        img_array = img_array.reshape((height, width, 3))
-                        return img_array
-
-            raise Exception("无法解析截图数据")
-        except Exception as e:
-            print(f"解析原始截图数据失败: {e}")
-            raise
+        Returns:
+            直接引用原始数据的numpy视图(不复制)，形状为(高, 宽, 通道数)
+        """
+        if len(raw_data) < 12:
+            raise Exception("原始截图数据过短")
+
+        width, height, pixel_format = struct.unpack_from('<3I', raw_data, 0)
+        # 1: RGBA_8888, 2: RGBX_8888, 3: RGB_888
+        channels = {1: 4, 2: 4, 3: 3}.get(pixel_format)
+        if channels is None:
+            raise Exception(f"不支持的像素格式: {pixel_format}")
+
+        pixel_size = width * height * channels
+        header_size = len(raw_data) - pixel_size
+        if header_size not in (12, 16):
+            raise Exception(f"原始截图数据长度异常: {len(raw_data)}")
+
+        image = np.frombuffer(raw_data, dtype=np.uint8, count=pixel_size, offset=header_size)
+        return image.reshape((height, width, channels))
 
     def _screenshot_fallback(self):
         """使用第三方工具的备用截图方法"""
         try:
             # 方法1: 使用adb截图并保存到设备，然后拉取
             remote_path = '/sdcard/screenshot.png'
-            cmd_save = self._get_adb_command(['shell', 'screencap', '-p', remote_path])
-            subprocess.run(cmd_save, capture_output=True, timeout=5)
+            self._run_adb(['shell', 'screencap', '-p', remote_path], timeout=5)
 
             # 拉取截图
             local_path = 'temp_screenshot.png'
@@ -326,12 +443,16 @@ class ADBController:
             print(f"备用截图方法失败: {e}")
             raise Exception("所有截图方法都失败")
 
-    def get_current_app(self):
-        """获取当前前台应用的包名"""
+    def get_current_app(self, timeout: float = 180):
+        """
+        获取当前前台应用的包名
+
+        Args:
+            timeout: dumpsys window的超时时间(秒)，设备繁忙时该命令可能很慢
+        """
         try:
             # 使用更可靠的方法获取当前应用
-            cmd = self._get_adb_command(['shell', 'dumpsys', 'window', 'windows'])
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=180)
+            result = self._run_adb(['shell', 'dumpsys', 'window', 'windows'], timeout=timeout, text=True)
 
             # 查找当前焦点窗口
             for line in result.stdout.split('\n'):
@@ -349,8 +470,7 @@ class ADBController:
                             return package_name
 
             # 备选方法
-            cmd = self._get_adb_command(['shell', 'dumpsys', 'activity', 'activities'])
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+            result = self._run_adb(['shell', 'dumpsys', 'activity', 'activities'], timeout=5, text=True)
 
             for line in result.stdout.split('\n'):
                 if 'ResumedActivity' in line:
@@ -366,21 +486,74 @@ class ADBController:
             print(f"获取当前应用失败: {e}")
             return None
 
-    def is_app_foreground(self, package_name):
-        """检查指定应用是否在前台"""
-        current_app = self.get_current_app()
+    def query_foreground_app(self) -> Optional[str]:
+        """
+        轻量查询当前前台应用：只取dumpsys activity中的ResumedActivity行，
+        没有该行的系统版本退回get_current_app，同样限时5秒；
+        查询失败时直接返回None，由前台应用缓存过期后重试
+
+        Returns:
+            包名，无法确定时返回None
+        """
+        try:
+            result = self._run_adb(['shell', 'dumpsys activity activities | grep ResumedActivity'],
+                                   timeout=5, text=True, raw=True)
+        except Exception as e:
+            print(f"查询前台应用失败: {e}")
+            return None
+        if result.stdout.strip():
+            match = re.search(r'([a-zA-Z0-9_\.]+)/[a-zA-Z0-9_\.$]+', result.stdout)
+            return match.group(1) if match else None
+        return self.get_current_app(timeout=5)
+
+    def refresh_foreground(self) -> Optional[str]:
+        """查询前台应用并更新缓存"""
+        package_name = self.query_foreground_app()
+        with self._foreground_lock:
+            self._foreground_app = package_name
+            self._foreground_time = time.monotonic()
+        return package_name
+
+    def invalidate_foreground(self):
+        """启动、停止应用后前台应用会变化，作废缓存"""
+        with self._foreground_lock:
+            self._foreground_time = 0.0
+
+    def get_foreground_app(self, max_age: float = None) -> Optional[str]:
+        """
+        获取前台应用包名，缓存未过期时直接返回缓存
+
+        Args:
+            max_age: 可接受的缓存时长(秒)，None为FOREGROUND_TTL，0表示总是重新查询
+        """
+        if max_age is None:
+            max_age = self.FOREGROUND_TTL
+        with self._foreground_lock:
+            if self._foreground_time and time.monotonic() - self._foreground_time <= max_age:
+                return self._foreground_app
+        return self.refresh_foreground()
+
+    def is_app_foreground(self, package_name, max_age: float = 0.0):
+        """
+        检查指定应用是否在前台
+
+        Args:
+            max_age: 可接受的缓存时长(秒)，默认重新查询
+        """
+        current_app = self.get_foreground_app(max_age)
         return current_app == package_name if current_app else False
 
     def launch_app(self, package_name):
         """启动指定应用"""
         devices = self.get_all_devices_info()
         if devices[self.device_id]['state']:
-            cmd = self._get_adb_command(
-                ['shell', 'monkey', '-p', package_name, '-c', 'android.intent.category.LAUNCHER', '1'])
+            result = self._run_adb(
+                ['shell', 'monkey', '-p', package_name, '-c', 'android.intent.category.LAUNCHER', '1'], text=True)
         else:
             cmd = self.mmm_path + ['control', '-v', self.str_device_id, 'launch',
                                    '-pkg', package_name]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        self.invalidate_foreground()
         if result.returncode == 0:
             print(f"已启动应用: {package_name}")
         else:
@@ -388,8 +561,8 @@ class ADBController:
 
     def force_stop_app(self, package_name):
         """强制停止应用"""
-        cmd = self._get_adb_command(['shell', 'am', 'force-stop', package_name])
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run_adb(['shell', 'am', 'force-stop', package_name], text=True)
+        self.invalidate_foreground()
         if result.returncode == 0:
             print(f"已强制停止应用: {package_name}")
         else:
@@ -397,39 +570,34 @@ class ADBController:
 
     def swipe(self, start_x, start_y, end_x, end_y, duration=500):
         """执行滑动操作"""
-        cmd = self._get_adb_command(['shell', 'input', 'swipe',
-                                     str(start_x), str(start_y),
-                                     str(end_x), str(end_y),
-                                     str(duration)])
-        subprocess.run(cmd)
+        self._run_input(['input', 'swipe',
+                         str(start_x), str(start_y),
+                         str(end_x), str(end_y),
+                         str(duration)], timeout=duration / 1000 + 5)
 
         # 滑动后等待0.1秒
         time.sleep(0.1)
 
     def long_press(self, x, y, duration=1000):
         """执行长按操作"""
-        cmd = self._get_adb_command(['shell', 'input', 'swipe',
-                                     str(x), str(y), str(x), str(y),
-                                     str(duration)])
-        subprocess.run(cmd)
+        self._run_input(['input', 'swipe',
+                         str(x), str(y), str(x), str(y),
+                         str(duration)], timeout=duration / 1000 + 5)
 
     def get_device_info(self):
         """获取设备信息"""
         info = {'device_id': self.device_id}
         try:
             # 获取设备型号
-            cmd = self._get_adb_command(['shell', 'getprop', 'ro.product.model'])
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3)
+            result = self._run_adb(['shell', 'getprop', 'ro.product.model'], timeout=3, text=True)
             info['model'] = result.stdout.strip() if result.returncode == 0 else '未知'
 
             # 获取Android版本
-            cmd = self._get_adb_command(['shell', 'getprop', 'ro.build.version.release'])
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3)
+            result = self._run_adb(['shell', 'getprop', 'ro.build.version.release'], timeout=3, text=True)
             info['android_version'] = result.stdout.strip() if result.returncode == 0 else '未知'
 
             # 获取设备分辨率
-            cmd = self._get_adb_command(['shell', 'wm', 'size'])
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3)
+            result = self._run_adb(['shell', 'wm', 'size'], timeout=3, text=True)
             info['resolution'] = result.stdout.strip() if result.returncode == 0 else '未知'
 
             return info
@@ -440,19 +608,17 @@ class ADBController:
     def input_text(self, text):
         """输入文本"""
         # 先确保输入法可用
-        cmd = self._get_adb_command(['shell', 'input', 'text', text])
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        return result.returncode == 0
+        return self._run_input(['input', 'text', text])
 
     def press_key(self, keycode):
         """按下按键"""
-        cmd = self._get_adb_command(['shell', 'input', 'keyevent', str(keycode)])
-        subprocess.run(cmd)
+        self._run_input(['input', 'keyevent', str(keycode)])
 
     def back(self):
         """返回键"""
         cmd = self._get_adb_command(['go_back'])
         subprocess.run(cmd, capture_output=True, text=True, timeout=3)
+        self._mark_input()
 
     def home(self):
         """主页键"""
@@ -466,24 +632,47 @@ class ADBController:
 class MumuGameAutomator:
     """Mumu模拟器游戏自动化控制器"""
 
+    # detect_screen识别的界面及其锚点模板
+    SCREENS = {
+        'world': ['templates/world_search.png', 'templates/intelligence_btn.png'],
+        'town': ['templates/orders.png'],
+        'island': ['templates/island_anchor.png'],
+        'sidebar': ['templates/sidebar_close.png'],
+        'logged_out': ['templates/reconnect.png'],
+        # 回城图标，可能遮挡其他界面的锚点
+        'my_town': ['templates/my_town.png'],
+        'position_share': ['templates/position_share.png'],
+    }
+
     def __init__(self, mumu_device: int = 0, game_package: str = None,
                  mmm_path: str = r'C:\Program Files\Netease\MuMu\nx_main\MuMuManager.exe',
-                 ocr_lang: str = 'eng+chi_sim'):
+                 ocr_lang: str = 'eng+chi_sim', continuous_capture: bool = False,
+                 wait_strategy: WaitStrategy = None):
         """
         初始化Mumu游戏自动化控制器
 
         Args:
             mumu_device: Mumu模拟器序号
             game_package: 游戏包名
+            continuous_capture: 是否开启后台连续截图，识别和OCR共用同一截图流
+            wait_strategy: get_image_pos等等待识别接口的默认轮询策略，
+                           默认开启连续截图时一有新帧就识别，否则指数退避
         """
         self.mmm_path = mmm_path
         self.mumu_device = mumu_device
         self.game_package = game_package
         self.adb = None
-        self.image_matcher = ImageMatcher()
+        self.image_matcher = None
+        # 模板缓存进程内共享，已加载过的模板不会重复读取
+        template_registry.preload()
+        self.screen_classifier = ScreenClassifier(self.SCREENS)
+        self.wait_strategy = wait_strategy or NewFrameWait()
         self.screen_width = 0
         self.screen_height = 0
         self._connect_mumu()
+        self.image_matcher = ImageMatcher(cache=self.adb.match_cache)
+        if continuous_capture:
+            self.adb.start_capture()
 
         self.ocr = OCRProcessor(lang=ocr_lang)
         self.ocr_type = 'tesseract'
@@ -511,19 +700,55 @@ class MumuGameAutomator:
             print(f"获取屏幕信息失败: {e}")
 
     def get_screen_text(self, region: Tuple[int, int, int, int] = None,
-                        numbers: bool = False, preprocess: bool = True, with_qwen3: bool = True) -> str:
+                        numbers: bool = False, preprocess: bool = True, with_qwen3: bool = True,
+                        encoding: VLMEncoding = None) -> str:
 
         value = None
-        screenshot = self.adb.screenshot()
+        screenshot = self.adb.get_frame()
         # return self.ocr.extract_text(screenshot, preprocess=preprocess, region=region)
         if numbers:
             value = self.ocr.extract_numbers(screenshot, preprocess=preprocess,
                                              region=region, with_qwen3=with_qwen3)
         else:
-            value = self.ocr.extract_text(screenshot, preprocess=preprocess, region=region, with_qwen3=with_qwen3)
+            value = self.ocr.extract_text(screenshot, preprocess=preprocess, region=region, with_qwen3=with_qwen3,
+                                          encoding=encoding)
 
         return value
 
+    def read_digits(self, region: Tuple[int, int, int, int], fmt: str = 'number',
+                    min_confidence: float = 0.85, with_qwen3: bool = True) -> List[int]:
+        """
+        读取屏幕上的数字(计时、体力、队列数、坐标等)，本地识别置信度不足时才请求VLM
+
+        Args:
+            region: 只包含一行数字的区域
+            fmt: 'time'、'fraction'、'coordinate'或'number'，见DigitReader.FORMATS
+        """
+        screenshot = self.adb.get_frame()
+        return self.ocr.read_digits(screenshot, region, fmt, min_confidence, with_qwen3=with_qwen3)
+
+    def get_regions_text(self, regions: Dict[str, Tuple[int, int, int, int]], preprocess: bool = True,
+                         with_qwen3: bool = True) -> Dict[str, str]:
+        """
+        在同一帧上识别多个区域的文字，使用VLM时合并为一次请求
+
+        Args:
+            regions: {名称: 区域(x1, y1, x2, y2)}
+        """
+        screenshot = self.adb.get_frame()
+        return self.ocr.extract_regions(screenshot, regions, preprocess=preprocess, with_qwen3=with_qwen3)
+
+    def read_digits_regions(self, regions: Dict[str, Tuple[Tuple[int, int, int, int], str]],
+                            min_confidence: float = 0.85, with_qwen3: bool = True) -> Dict[str, List[int]]:
+        """
+        在同一帧上读取多个区域的数字，本地识别置信度不足的区域合并为一次VLM请求
+
+        Args:
+            regions: {名称: (区域, 格式)}，格式见read_digits
+        """
+        screenshot = self.adb.get_frame()
+        return self.ocr.read_digits_regions(screenshot, regions, min_confidence, with_qwen3=with_qwen3)
+
     def start_game(self):
         """启动游戏"""
         if not self.game_package:
@@ -564,16 +789,14 @@ class MumuGameAutomator:
         return self.start_game()
 
     def get_image_pos(self, template_path: str, timeout: int = 3, threshold: float = 0.8,
-                      offset_x: int = 0, offset_y: int = 0, scale_match: bool = False, scale_range: tuple = (0.5, 2.0)):
+                      offset_x: int = 0, offset_y: int = 0, scale_match: bool = False, scale_range: tuple = (0.5, 2.0),
+                      wait_strategy: WaitStrategy = None):
         # print(f"等待图像: {template_path}")
-        start_time = time.time()
         template = self.image_matcher.load_template(template_path)
 
-        while timeout >= 0 and time.time() - start_time - 0.1 < timeout:
-            time.sleep(1)
-            screenshot = self.adb.screenshot()
-            position = self.image_matcher.find_template(screenshot, template, threshold,
-                                                        scale_match=scale_match, scale_range=scale_range)
+        for screenshot in (wait_strategy or self.wait_strategy).frames(self.adb, timeout):
+            position = self.image_matcher.match(screenshot, template, threshold,
+                                                scale_match=scale_match, scale_range=scale_range)
 
             if position:
                 x, y = position
@@ -591,27 +814,23 @@ class MumuGameAutomator:
         templates = {}
 
         for i, path in paths.items():
-            img = np.array(Image.open(path))
-            if img is None:
-                raise ValueError(f"无法加载模板图片: {path}")
-
             templates.update(
                 {
-                    i: img
+                    i: self.image_matcher.load_template(path)
                 }
             )
         # 此处不送去0.1且要求timeout大于0是为当timeout为0时直接执行不等待
         while timeout > 0 and time.time() - start_time < timeout:
             time.sleep(1)
 
-        screenshot = self.adb.screenshot()
+        screenshot = self.adb.get_frame()
         template_keys = list(templates.keys())
         template_values = list(templates.values())
-        with ThreadPoolExecutor(max_workers=9) as executor:
-            result = list(executor.map(
-                lambda template: self.image_matcher.find_template(screenshot, template, threshold),
-                template_values
-            ))
+        result = match_executor.map(
+            self.mumu_device,
+            lambda template: self.image_matcher.match(screenshot, template, threshold),
+            template_values
+        )
         if result:
             result = dict(zip(template_keys, result))
             return result
@@ -621,32 +840,31 @@ class MumuGameAutomator:
 
     # 同时查找一个图片的多个位置
     def get_images_pos(self, template_path: str, timeout: int = 10,
-                       threshold: float = 0.8, position_threshold: int = 8):
+                       threshold: float = 0.8, position_threshold: int = 8, wait_strategy: WaitStrategy = None):
         # print(f"等待图像: {template_path}")
-        start_time = time.time()
         template = self.image_matcher.load_template(template_path)
 
-        # 此处减去0.1是为了当timeout为0时，也能执行一次
-        while timeout >= 0 and time.time() - start_time - 0.1 < timeout:
-            screenshot = self.adb.screenshot()
-            positions = self.image_matcher.find_all_templates(screenshot, template, threshold)
+        # timeout为0时也会识别一次
+        for screenshot in (wait_strategy or self.wait_strategy).frames(self.adb, timeout):
+            matches = self.image_matcher.find_all_templates(screenshot, template, threshold,
+                                                             min_distance=position_threshold)
 
-            if positions:
-                positions = find_distinct_points(positions, threshold=position_threshold)
-                return positions
-
-            time.sleep(1)
+            if matches:
+                # 保持按Y坐标排序的返回顺序
+                return sorted(((x, y) for x, y, _ in matches), key=lambda p: p[1])
 
         # print(f"超时: 未找到图像 {template_path}")
         return []
 
     def wait_and_click(self, template_path: str, timeout: int = 3, hold: bool = False, hold_time: int = 3,
                        threshold: float = 0.8, offset_x: int = 0, offset_y: int = 0,
-                       scale_match: bool = False, scale_range: tuple = (0.5, 2.0)) -> bool:
+                       scale_match: bool = False, scale_range: tuple = (0.5, 2.0),
+                       wait_strategy: WaitStrategy = None) -> bool:
 
         position = self.get_image_pos(template_path=template_path, timeout=timeout, threshold=threshold,
                                       offset_x=offset_x, offset_y=offset_y,
-                                      scale_match=scale_match, scale_range=scale_range)
+                                      scale_match=scale_match, scale_range=scale_range,
+                                      wait_strategy=wait_strategy)
 
         if position:
             x, y = position
@@ -685,9 +903,9 @@ class MumuGameAutomator:
             return False
 
     def wait_for_image(self, template_path: str, timeout: int = 30,
-                       threshold: float = 0.8) -> bool:
+                       threshold: float = 0.8, wait_strategy: WaitStrategy = None) -> bool:
         position = self.get_image_pos(template_path=template_path, threshold=threshold,
-                                      timeout=timeout)
+                                      timeout=timeout, wait_strategy=wait_strategy)
         if position:
             return True
         else:
@@ -724,7 +942,7 @@ class MumuGameAutomator:
             timestamp = time.strftime("%Y%m%d_%H%M%S")
             filename = f"screenshot_{timestamp}.png"
 
-        screenshot = self.adb.screenshot()
+        screenshot = self.adb.get_frame()
         self.image_matcher.save_screenshot(screenshot, filename)
         print(f"截图已保存: {filename}")
         return filename
@@ -741,30 +959,114 @@ class MumuGameAutomator:
         Returns:
             状态名或None
         """
-        screenshot = self.adb.screenshot()
+        screenshot = self.adb.get_frame()
 
         for state_name, template_path in state_templates.items():
             template = self.image_matcher.load_template(template_path)
-            position = self.image_matcher.find_template(screenshot, template, threshold)
+            position = self.image_matcher.match(screenshot, template, threshold)
 
             if position:
                 return state_name
 
         return None
 
+    def wait_until_stable(self, roi: Tuple[int, int, int, int] = None, max_wait: float = 2.0,
+                          threshold: float = 2.0, stable_frames: int = 1, interval: float = 0.05) -> bool:
+        """
+        等待画面停止变化，用于替代点击、滑动后的固定等待
+
+        比较相邻两帧1/4缩小灰度图的平均像素差
+
+        Args:
+            roi: 只比较该区域(x1, y1, x2, y2)，None为全屏；大地图本身有动画，应指定区域
+            max_wait: 最长等待时间(秒)
+            threshold: 平均像素差(0-255)低于该值视为没有变化
+            stable_frames: 连续几次没有变化才算静止
+            interval: 两次取帧的间隔(秒)，开启连续截图时一有新帧就比较
+
+        Returns:
+            画面是否在max_wait内静止
+        """
+        level = 2
+        previous, stable = None, 0
+        strategy = NewFrameWait(initial=interval, max_interval=interval)
+        for frame in strategy.frames(self.adb, max_wait):
+            patch = self.image_matcher.pyramid(frame, level)
+            if roi is not None:
+                x1, y1, x2, y2 = roi
+                patch = patch[y1 >> level:y2 >> level, x1 >> level:x2 >> level]
+            if previous is not None:
+                stable = stable + 1 if cv2.absdiff(patch, previous).mean() < threshold else 0
+                if stable >= stable_frames:
+                    return True
+            previous = patch
+        return False
+
+    def detect_screen(self) -> Optional[str]:
+        """
+        识别当前所在界面
+
+        Returns:
+            SCREENS中的界面名，无法确定时返回None
+        """
+        return self.screen_classifier.classify(self.adb.get_frame())
+
+    def detect_screens(self) -> List[str]:
+        """
+        识别当前截图上同时出现的所有界面，如城镇上打开的侧边栏
+
+        Returns:
+            SCREENS中的界面名列表，没有识别到时为空
+        """
+        return self.screen_classifier.classify_all(self.adb.get_frame())
+
     def get_device_info(self):
         devices = self.adb.get_all_devices_info()
         return devices[self.mumu_device]
 
     # TaskManager要调用的参数
     def is_ready(self):
-        return self.adb.is_app_foreground('com.gof.china')
+        """游戏是否在前台，读取缓存的前台状态，缓存过期时才查询设备"""
+        return self.adb.is_app_foreground('com.gof.china', max_age=self.adb.FOREGROUND_TTL)
 
-    def get_status(self):
-        if self.is_ready():
-            return {'is_running': True}
+    def refresh_status(self):
+        """刷新缓存的前台状态，由监控线程定期调用"""
+        self.adb.refresh_foreground()
 
-    def execute_sequence(self, sequence: List[Dict[str, Any]]):
+    def get_status(self):
+        return {'is_running': self.is_ready()}
+
+    # 可以编入输入批处理的动作类型
+    # back不在其中：ADBController.back用MuMuManager的go_back，与设备上的keyevent 4行为不同
+    BATCH_ACTIONS = ('tap', 'swipe', 'wait', 'home', 'random_tap', 'random_swipe')
+
+    def _compile_batch(self, actions: List[Dict[str, Any]]) -> InputBatch:
+        """把连续的基本动作编译成一个输入批处理，动作间隔变为设备上的等待"""
+        batch = self.adb.input_batch()
+        for action in actions:
+            action_type = action['type']
+            interval = action.get('interval', 1)
+            if action_type == 'tap':
+                batch.tap(action['x'], action['y'], delay=interval)
+            elif action_type == 'swipe':
+                batch.swipe(action['start_x'], action['start_y'], action['end_x'], action['end_y'],
+                            action.get('duration', 500), delay=interval)
+            elif action_type == 'wait':
+                batch.sleep(action.get('duration', 1) + interval)
+            elif action_type == 'home':
+                batch.key(3, delay=interval)
+            elif action_type == 'random_tap':
+                batch.tap(random.randint(action['x1'], action['x2']), random.randint(action['y1'], action['y2']),
+                          random_range=0, delay=interval)
+            elif action_type == 'random_swipe':
+                batch.swipe(random.randint(action['start_x1'], action['start_x2']),
+                            random.randint(action['start_y1'], action['start_y2']),
+                            random.randint(action['end_x1'], action['end_x2']),
+                            random.randint(action['end_y1'], action['end_y2']),
+                            action.get('duration', 500), delay=interval)
+        return batch
+
+    def execute_sequence(self, sequence: List[Dict[str, Any]], batch_inputs: bool = False):
         """
         执行自动化序列
 
@@ -778,10 +1080,32 @@ class MumuGameAutomator:
                 - screenshot: 截图
                 - back: 返回
                 - home: 主页
+            batch_inputs: 连续的点击、滑动、主页键、等待等基本动作编成一个脚本一次发送(见BATCH_ACTIONS)，
+                          动作间隔变为设备上的等待，默认逐个执行
         """
-        for i, action in enumerate(sequence):
+        i = 0
+        while i < len(sequence):
+            run = []
+            if batch_inputs:
+                while i + len(run) < len(sequence) and sequence[i + len(run)].get('type') in self.BATCH_ACTIONS:
+                    run.append(sequence[i + len(run)])
+            if len(run) > 1:
+                print(f"执行动作 {i + 1}-{i + len(run)}/{len(sequence)}: 批量输入")
+                i += len(run)
+                try:
+                    self._compile_batch(run).send()
+                except Exception as e:
+                    print(f"执行动作失败: {e}")
+                    if all(action.get('continue_on_error', False) for action in run):
+                        continue
+                    else:
+                        break
+                continue
+
+            action = sequence[i]
+            i += 1
             action_type = action.get('type', '')
-            print(f"执行动作 {i + 1}/{len(sequence)}: {action_type}")
+            print(f"执行动作 {i}/{len(sequence)}: {action_type}")
 
             try:
                 if action_type == 'tap':
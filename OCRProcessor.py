@@ -2,10 +2,22 @@ import numpy as np
 import cv2
 import re
 import base64
-import requests
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from PIL import Image
 from io import BytesIO
 
+from AppPaths import user_data_dir
+from DigitReader import DigitReader, digit_reader
+from ScreenCapture import Frame
+from VLMClient import vlm_client
+
 
 from typing import Tuple, List, Dict, Optional, Union
 
@@ -18,25 +30,277 @@ except ImportError:
     print("警告: pytesseract 未安装，OCR功能将不可用")
 
 
+@dataclass(frozen=True)
+class VLMEncoding:
+    """发给VLM的图像的编码方式"""
+    # 转为灰度图
+    grayscale: bool = False
+    # 缩小到文字行高约为该像素数，None时不缩放；只缩小不放大
+    text_height: Optional[int] = None
+    # 'PNG'、'JPEG'或'WEBP'
+    format: str = 'PNG'
+    # JPEG/WEBP的质量，1~100
+    quality: int = 85
+
+    def __str__(self):
+        parts = ['gray' if self.grayscale else 'rgb', f'h{self.text_height}' if self.text_height else 'h-',
+                 self.format if self.format == 'PNG' else f'{self.format}{self.quality}']
+        return '-'.join(parts)
+
+    @staticmethod
+    def estimate_text_height(gray: np.ndarray) -> Optional[int]:
+        """
+        估计图像中文字的行高
+
+        二值化后取大小接近单个字符的连通域，以其高度的中位数为行高；
+        汉字的笔画可能分成多个连通域，估计值偏小，缩放时偏保守
+
+        Returns:
+            行高(像素)，找不到文字时返回None
+        """
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if np.count_nonzero(binary) > binary.size / 2:
+            binary = 255 - binary
+        _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        glyphs = (heights >= 8) & (heights <= 200) & (widths <= heights * 3) & (areas >= 10)
+        if not glyphs.any():
+            return None
+        return int(np.median(heights[glyphs]))
+
+    def prepare(self, image: np.ndarray) -> np.ndarray:
+        """按设置转换颜色并缩放"""
+        image = np.asarray(image)
+        if image.ndim == 3:
+            if self.grayscale:
+                code = cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+                image = cv2.cvtColor(image, code)
+            elif image.shape[2] == 4:
+                image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
+        if self.text_height:
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            height = self.estimate_text_height(gray)
+            if height and height > self.text_height:
+                scale = self.text_height / height
+                size = (max(int(image.shape[1] * scale), 1), max(int(image.shape[0] * scale), 1))
+                image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return image
+
+    def encode(self, image: np.ndarray) -> bytes:
+        """转换并编码为图片文件的字节"""
+        buff = BytesIO()
+        params = {} if self.format == 'PNG' else {'quality': self.quality}
+        Image.fromarray(self.prepare(image)).save(buff, format=self.format, **params)
+        return buff.getvalue()
+
+
+# 默认编码：无损PNG，与改动前一致
+DEFAULT_ENCODING = VLMEncoding()
+# 紧凑编码：只在计时区域上验证过(见benchmark.py encoding)，整屏截图的识别准确率未验证
+COMPACT_ENCODING = VLMEncoding(grayscale=True, text_height=20, format='JPEG', quality=85)
+
+
+class OCRCache:
+    """
+    OCR结果缓存
+
+    键为裁剪后区域像素的哈希加上识别引擎、提示词和预处理参数，像素完全相同时直接返回上次的文字。
+    内存中按LRU淘汰；可选的磁盘层(sqlite)在重启后仍然有效。识别失败的空结果不缓存
+    """
+
+    def __init__(self, size: int = 256, path: str = None, max_disk_entries: int = 10000):
+        """
+        初始化缓存
+
+        Args:
+            size: 内存中保留的结果数
+            path: 磁盘缓存文件路径，None时只使用内存
+            max_disk_entries: 磁盘缓存保留的结果数
+        """
+        self.size = size
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._puts = 0
+        if path is not None:
+            self.open_disk(path)
+
+    def open_disk(self, path: str):
+        """启用磁盘缓存，文件无法打开时只使用内存"""
+        with self._lock:
+            try:
+                db = sqlite3.connect(path, check_same_thread=False)
+                db.execute('CREATE TABLE IF NOT EXISTS ocr (key TEXT PRIMARY KEY, text TEXT, time REAL)')
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"OCR磁盘缓存不可用，只使用内存缓存 {path}: {e}")
+                return
+            self._db = db
+
+    @staticmethod
+    def key(image: np.ndarray, engine: str, prompt: str = '', preprocess: bool = False) -> str:
+        """
+        生成缓存键
+
+        Args:
+            image: 裁剪后的识别区域
+            engine: 识别引擎及其参数，如 'qwen3-vl'、'tesseract:eng+chi_sim:'
+            prompt: VLM提示词
+            preprocess: 是否预处理
+        """
+        prompt_digest = hashlib.blake2b(prompt.encode('utf-8'), digest_size=8).hexdigest()
+        return f'{OCRCache.digest(image)}:{engine}:{prompt_digest}:{int(preprocess)}'
+
+    @staticmethod
+    def digest(image: np.ndarray) -> str:
+        """图像内容哈希，截图帧使用帧上缓存的哈希"""
+        shape = 'x'.join(str(size) for size in image.shape)
+        if isinstance(image, Frame):
+            return f'{shape}:{image.hash}'
+        return f'{shape}:{hashlib.blake2b(np.ascontiguousarray(image).data, digest_size=16).hexdigest()}'
+
+    def get(self, key: str) -> Tuple[bool, Optional[str]]:
+        """
+        查询缓存，内存未命中时查询磁盘
+
+        Returns:
+            (是否命中, 缓存的文字)
+        """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return True, self._results[key]
+            if self._db is not None:
+                row = self._db.execute('SELECT text FROM ocr WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return True, row[0]
+            self.misses += 1
+            return False, None
+
+    def _remember(self, key: str, text: str):
+        # 调用时已持有self._lock
+        self._results[key] = text
+        self._results.move_to_end(key)
+        while len(self._results) > self.size:
+            self._results.popitem(last=False)
+
+    def put(self, key: str, text: str):
+        if not text:
+            return
+        with self._lock:
+            self._remember(key, text)
+            if self._db is None:
+                return
+            self._db.execute('INSERT OR REPLACE INTO ocr VALUES (?, ?, ?)', (key, text, time.time()))
+            self._puts += 1
+            # 定期删除超出上限的最早结果
+            if self._puts % 100 == 0:
+                self._db.execute('DELETE FROM ocr WHERE key NOT IN '
+                                 '(SELECT key FROM ocr ORDER BY time DESC LIMIT ?)', (self.max_disk_entries,))
+            self._db.commit()
+
+    def clear(self):
+        """清空内存和磁盘缓存"""
+        with self._lock:
+            self._results.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM ocr')
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'hit_rate': self.hits / total if total else 0.0}
+
+
+_ocr_cache: Optional[OCRCache] = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OCRCache:
+    """
+    进程内共享的OCR结果缓存，不同设备上同一区域的相同像素也能命中
+
+    磁盘层在用户数据目录中，重启后仍然有效；首次使用时才创建目录和缓存文件，导入模块时不写磁盘
+    """
+    global _ocr_cache
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            _ocr_cache = OCRCache(path=os.path.join(user_data_dir('ocr'), 'ocr_cache.db'))
+        return _ocr_cache
+
+
 class OCRProcessor:
     """OCR处理器类"""
 
-    def __init__(self, lang: str = 'eng+chi_sim', config: str = ''):
+    QWEN3_PROMPT = """请详细描述这张图片中的文字内容。
+        要求：
+        1. 列出所有可见文字
+        2. 保持原顺序
+        3. 不要解释、不要推理、不要思考
+        4. 文字之间用换行分隔
+        
+        请以清晰、有条理的方式输出，直接描述文字内容。"""
+
+    # 多个区域拼成一张图一次识别时的提示词
+    REGIONS_PROMPT = """这张图片由{count}个区域从上到下拼接而成，区域之间用灰色横线分隔，每个区域左侧黑底白字的数字是区域编号。
+        要求：
+        1. 分别识别每个区域中的所有可见文字，保持原顺序，多行用换行分隔
+        2. 不要识别区域编号本身
+        3. 不要解释、不要推理、不要思考
+        4. 只输出一个JSON对象，键为区域编号，值为该区域的文字，没有文字时为空字符串，例如：{example}"""
+    # 拼接图中区域编号的宽度、最小高度和分隔线高度
+    LABEL_WIDTH = 48
+    MIN_REGION_HEIGHT = 32
+    SEPARATOR_HEIGHT = 6
+    # 保留的编码结果数
+    ENCODED_CACHE_SIZE = 16
+    # read_digits回退到VLM时按格式使用的编码，只包含验证过的格式
+    DIGIT_ENCODINGS = {'time': COMPACT_ENCODING}
+
+    def __init__(self, lang: str = 'eng+chi_sim', config: str = '', cache: OCRCache = None,
+                 encoding: VLMEncoding = DEFAULT_ENCODING):
         """
         初始化OCR处理器
 
         Args:
             lang: 语言代码，如 'eng' (英文), 'chi_sim' (简体中文), 'eng+chi_sim' (中英混合)
             config: Tesseract配置参数
+            cache: OCR结果缓存，默认在首次查询时取进程内共享的缓存(见get_ocr_cache)
+            encoding: 发给VLM的图像的默认编码方式
         """
         self.lang = lang
         self.config = config
+        self._cache = cache
+        self.encoding = encoding
+        # 同一图像按同一方式只编码一次: {(图像哈希, 编码方式): base64字符串}
+        self._encoded = OrderedDict()
+        self._encoded_lock = threading.Lock()
         self.available = TESSERACT_AVAILABLE
 
         if not self.available:
             print("警告: Tesseract OCR不可用，请安装: pip install pytesseract")
             print("同时需要安装Tesseract引擎: https://github.com/UB-Mannheim/tesseract/wiki")
 
+    @property
+    def cache(self) -> OCRCache:
+        """OCR结果缓存"""
+        if self._cache is None:
+            self._cache = get_ocr_cache()
+        return self._cache
+
     def preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """
         预处理图像以提高OCR识别率
@@ -73,7 +337,8 @@ class OCRProcessor:
 
     def extract_text(self, image: np.ndarray,
                      preprocess: bool = True,
-                     region: Tuple[int, int, int, int] = None, with_qwen3: bool = True) -> str:
+                     region: Tuple[int, int, int, int] = None, with_qwen3: bool = True,
+                     encoding: VLMEncoding = None) -> str:
         """
         从图像中提取文本
 
@@ -82,6 +347,7 @@ class OCRProcessor:
             preprocess: 是否进行预处理
             region: 区域(x1, y1, x2, y2)，如果为None则处理整张图片
             with_qwen3: 是否使用Qwen3模型
+            encoding: 发给Qwen3模型的图像编码方式，None时使用self.encoding
 
         Returns:
             识别的文本
@@ -95,15 +361,16 @@ class OCRProcessor:
                 x1, y1, x2, y2 = region
                 image = image[y1:y2, x1:x2]
 
+            # 相同像素、相同识别参数的结果直接使用缓存
+            encoding = encoding or self.encoding
+            cache_key = self._cache_key(image, preprocess, with_qwen3, encoding)
+            hit, text = self.cache.get(cache_key)
+            if hit:
+                return text
+
             if with_qwen3:
-                image_data = Image.fromarray(image)
-                buff = BytesIO()
-                image_data.save(buff, format='PNG')
-                image_data2 = buff.getvalue()
-
-                # Encode the image as base64
-                image_base64 = base64.b64encode(image_data2).decode('utf-8')
-                result = self.extract_text_qwen3(image_base64)
+                result = self.extract_text_qwen3(self.encode_image(image, encoding))
+                self.cache.put(cache_key, result)
                 return result
 
             # 预处理图像
@@ -123,48 +390,181 @@ class OCRProcessor:
                 config=self.config
             )
 
-            return text.strip()
+            text = text.strip()
+            self.cache.put(cache_key, text)
+            return text
 
         except Exception as e:
             print(f"OCR识别失败: {e}")
             return ""
 
+    def _cache_key(self, image: np.ndarray, preprocess: bool, with_qwen3: bool, encoding: VLMEncoding) -> str:
+        if with_qwen3:
+            # VLM不使用预处理，但编码方式影响识别结果
+            return self.cache.key(image, f'{vlm_client.model}:{encoding}', self.QWEN3_PROMPT)
+        return self.cache.key(image, f'tesseract:{self.lang}:{self.config}', '', preprocess)
+
+    def encode_image(self, image: np.ndarray, encoding: VLMEncoding = None) -> str:
+        """
+        将图像编码为base64字符串，用于VLM请求
+
+        同一图像按同一方式编码的结果会缓存，识别失败重试或换提示词时不再重复编码
+
+        Args:
+            image: 输入图像
+            encoding: 编码方式，None时使用self.encoding
+        """
+        encoding = encoding or self.encoding
+        key = (OCRCache.digest(image), encoding)
+        with self._encoded_lock:
+            if key in self._encoded:
+                self._encoded.move_to_end(key)
+                return self._encoded[key]
+
+        encoded = base64.b64encode(encoding.encode(image)).decode('utf-8')
+        with self._encoded_lock:
+            self._encoded[key] = encoded
+            while len(self._encoded) > self.ENCODED_CACHE_SIZE:
+                self._encoded.popitem(last=False)
+        return encoded
+
     @staticmethod
     def extract_text_qwen3(image_base64) -> str:
-        prompt = """请详细描述这张图片中的文字内容。
-        要求：
-        1. 列出所有可见文字
-        2. 保持原顺序
-        3. 不要解释、不要推理、不要思考
-        4. 文字之间用换行分隔
-        
-        请以清晰、有条理的方式输出，直接描述文字内容。"""
+        prompt = OCRProcessor.QWEN3_PROMPT
 
-        payload = {
-            "model": "qwen3-vl",
-            "prompt": prompt,
-            "images": [image_base64],
-            "stream": False,
-            # "options": {
-            #    "temperature": 0.2,  # 降低随机性，更确定性
-            #    "num_predict": 5000,
-            #    "stop": ["<|im_end|>", "<|endoftext|>"]
-            # }
-        }
-
-        # Make the API request
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json=payload
-        )
+        # options = {
+        #    "temperature": 0.2,  # 降低随机性，更确定性
+        #    "num_predict": 5000,
+        #    "stop": ["<|im_end|>", "<|endoftext|>"]
+        # }
 
-        # Parse the response
-        if response.status_code == 200:
-            result = response.json()
-            # print(result)
-            return result['response']
-        else:
-            return ''
+        # 共享客户端负责连接复用、超时、重试和熔断，失败时返回空字符串
+        return vlm_client.generate(prompt, [image_base64], prompt_type='ocr_text')
+
+    def compose_regions(self, crops: List[np.ndarray]) -> np.ndarray:
+        """
+        将多个区域上下拼接成一张图，每个区域左侧标注从1开始的编号，区域之间用灰色横线分隔
+
+        Args:
+            crops: 裁剪出的区域图像
+
+        Returns:
+            RGB拼接图
+        """
+        rows = []
+        for crop in crops:
+            if crop.ndim == 2:
+                crop = cv2.cvtColor(crop, cv2.COLOR_GRAY2RGB)
+            elif crop.shape[2] == 4:
+                crop = cv2.cvtColor(crop, cv2.COLOR_RGBA2RGB)
+            rows.append(crop)
+        width = max(crop.shape[1] for crop in rows) + self.LABEL_WIDTH
+
+        parts = []
+        for index, crop in enumerate(rows, start=1):
+            height = max(crop.shape[0], self.MIN_REGION_HEIGHT)
+            row = np.full((height, width, 3), 128, np.uint8)
+            row[:, :self.LABEL_WIDTH] = 0
+            cv2.putText(row, str(index), (8, height // 2 + 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
+                        (255, 255, 255), 2)
+            top = (height - crop.shape[0]) // 2
+            row[top:top + crop.shape[0], self.LABEL_WIDTH:self.LABEL_WIDTH + crop.shape[1]] = crop
+            if parts:
+                parts.append(np.full((self.SEPARATOR_HEIGHT, width, 3), 128, np.uint8))
+            parts.append(row)
+        return np.vstack(parts)
+
+    @staticmethod
+    def parse_regions_response(text: str) -> Optional[Dict[int, str]]:
+        """
+        解析批量识别的输出
+
+        Returns:
+            {区域编号: 文字}，输出中没有合法的JSON对象时返回None
+        """
+        match = re.search(r'\{.*\}', text, re.S)
+        if match is None:
+            return None
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        results = {}
+        for key, value in data.items():
+            try:
+                index = int(key)
+            except ValueError:
+                continue
+            if isinstance(value, list):
+                value = '\n'.join(str(line) for line in value)
+            results[index] = '' if value is None else str(value).strip()
+        return results
+
+    def extract_regions(self, image: np.ndarray, regions: Dict[str, Tuple[int, int, int, int]],
+                        preprocess: bool = True, with_qwen3: bool = True,
+                        encoding: VLMEncoding = None) -> Dict[str, str]:
+        """
+        识别同一张图像上的多个区域
+
+        使用Qwen3模型时，未命中缓存的区域拼成一张图，用一次请求识别；
+        模型输出无法解析时逐个区域单独识别。每个区域的结果与extract_text共用缓存
+
+        Args:
+            image: 输入图像
+            regions: {名称: 区域(x1, y1, x2, y2)}
+            preprocess: 是否进行预处理(仅tesseract)
+            with_qwen3: 是否使用Qwen3模型
+            encoding: 发给Qwen3模型的图像编码方式，None时使用self.encoding
+
+        Returns:
+            {名称: 识别的文本}
+        """
+        if not self.available:
+            return {name: "" for name in regions}
+
+        encoding = encoding or self.encoding
+
+        results = {}
+        pending = {}
+        for name, (x1, y1, x2, y2) in regions.items():
+            crop = image[y1:y2, x1:x2]
+            cache_key = self._cache_key(crop, preprocess, with_qwen3, encoding)
+            hit, text = self.cache.get(cache_key)
+            if hit:
+                results[name] = text
+            else:
+                pending[name] = (crop, cache_key)
+
+        if with_qwen3 and len(pending) > 1:
+            names = list(pending)
+            example = json.dumps({str(i): '...' for i in range(1, len(names) + 1)}, ensure_ascii=False)
+            prompt = self.REGIONS_PROMPT.format(count=len(names), example=example)
+            try:
+                composite = self.compose_regions([pending[name][0] for name in names])
+                response = vlm_client.generate(prompt, [self.encode_image(composite, encoding)], prompt_type='ocr_regions')
+            except Exception as e:
+                print(f"批量OCR识别失败: {e}")
+                response = ''
+            if not response:
+                # 请求失败或已熔断，逐个重试只会更慢
+                results.update({name: "" for name in names})
+                pending.clear()
+            else:
+                parsed = self.parse_regions_response(response) or {}
+                for index, name in enumerate(names, start=1):
+                    if index in parsed:
+                        results[name] = parsed[index]
+                        self.cache.put(pending.pop(name)[1], parsed[index])
+                if pending:
+                    print(f"批量OCR输出无法解析，逐个识别: {list(pending)}")
+
+        for name, (crop, _) in pending.items():
+            results[name] = self.extract_text(crop, preprocess=preprocess, with_qwen3=with_qwen3,
+                                              encoding=encoding)
+        return {name: results[name] for name in regions}
 
     def extract_text_with_confidence(self, image: np.ndarray,
                                      preprocess: bool = True,
@@ -274,7 +674,11 @@ class OCRProcessor:
             提取到的数字列表
         """
         text = self.extract_text(image, preprocess=preprocess, region=region, with_qwen3=with_qwen3)
+        return self.parse_numbers(text)
 
+    @staticmethod
+    def parse_numbers(text: str) -> List[Union[int, float]]:
+        """从文本中提取所有数字"""
         # 使用正则表达式提取所有数字
         numbers = []
         for match in re.finditer(r'[-+]?\d*\.?\d+', text):
@@ -289,6 +693,78 @@ class OCRProcessor:
 
         return numbers
 
+    def read_digits(self, image: np.ndarray, region: Tuple[int, int, int, int] = None, fmt: str = 'number',
+                    min_confidence: float = 0.85, preprocess: bool = False,
+                    with_qwen3: bool = True) -> List[Union[int, float]]:
+        """
+        识别游戏内固定字体的数字，先用本地字符模板识别，置信度不足时再用OCR
+
+        Args:
+            image: 输入图像
+            region: 区域(x1, y1, x2, y2)，应只包含一行数字
+            fmt: 文本格式，见DigitReader.FORMATS: 'time'(时:分:秒)、'fraction'(a/b)、'coordinate'(x,y)、'number'
+            min_confidence: 本地识别结果的最低置信度
+            preprocess: 回退到OCR时是否预处理
+            with_qwen3: 回退到OCR时是否使用Qwen3模型，使用时用其结果补充字符模板库
+
+        Returns:
+            数字列表，time格式为[时, 分, 秒]
+        """
+        if region is not None:
+            x1, y1, x2, y2 = region
+            image = image[y1:y2, x1:x2]
+
+        reading = digit_reader.read(image, fmt)
+        if reading.values is not None and reading.confidence >= min_confidence:
+            return reading.values
+
+        text = self.extract_text(image, preprocess=preprocess, with_qwen3=with_qwen3,
+                                 encoding=self.DIGIT_ENCODINGS.get(fmt))
+        return self._digits_from_text(image, text, fmt, with_qwen3)
+
+    def _digits_from_text(self, image: np.ndarray, text: str, fmt: str, with_qwen3: bool) -> List[Union[int, float]]:
+        """从OCR结果中按格式解析数字，VLM的结果同时用于补充字符模板库"""
+        found = DigitReader.find(text, fmt)
+        if found is not None:
+            if with_qwen3:
+                digit_reader.learn(image, found)
+            values = DigitReader.parse(found, fmt)
+            if values is not None:
+                return values
+        return self.parse_numbers(text)
+
+    def read_digits_regions(self, image: np.ndarray, regions: Dict[str, Tuple[Tuple[int, int, int, int], str]],
+                            min_confidence: float = 0.85, preprocess: bool = False,
+                            with_qwen3: bool = True) -> Dict[str, List[Union[int, float]]]:
+        """
+        识别同一张图像上多个区域的数字，本地识别置信度不足的区域合并为一次OCR
+
+        Args:
+            image: 输入图像
+            regions: {名称: (区域(x1, y1, x2, y2), 格式)}，格式见read_digits
+            min_confidence: 本地识别结果的最低置信度
+            preprocess: 回退到OCR时是否预处理
+            with_qwen3: 回退到OCR时是否使用Qwen3模型
+
+        Returns:
+            {名称: 数字列表}
+        """
+        results = {}
+        fallback = {}
+        for name, (region, fmt) in regions.items():
+            x1, y1, x2, y2 = region
+            reading = digit_reader.read(image[y1:y2, x1:x2], fmt)
+            if reading.values is not None and reading.confidence >= min_confidence:
+                results[name] = reading.values
+            else:
+                fallback[name] = region
+
+        texts = self.extract_regions(image, fallback, preprocess=preprocess, with_qwen3=with_qwen3)
+        for name, text in texts.items():
+            (x1, y1, x2, y2), fmt = regions[name]
+            results[name] = self._digits_from_text(image[y1:y2, x1:x2], text, fmt, with_qwen3)
+        return {name: results[name] for name in regions}
+
     def save_ocr_debug_image(self, image: np.ndarray,
                              output_path: str = "ocr_debug.png",
                              region: Tuple[int, int, int, int] = None,
@@ -0,0 +1,181 @@
+import hashlib
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+import cv2
+import numpy as np
+
+
+class Frame(np.ndarray):
+    """
+    截图帧：numpy数组，额外携带序号和采集时间戳
+
+    灰度图、缩小的金字塔层级和内容哈希在首次使用时计算并缓存，
+    同一帧上的多次模板匹配只需计算一次
+    """
+
+    def __new__(cls, image: np.ndarray, seq: int = 0, timestamp: float = None):
+        frame = np.asarray(image).view(cls)
+        frame.seq = seq
+        frame.timestamp = time.time() if timestamp is None else timestamp
+        return frame
+
+    def __array_finalize__(self, obj):
+        self.seq = getattr(obj, 'seq', 0)
+        self.timestamp = getattr(obj, 'timestamp', 0.0)
+        # 切片等视图内容不同，不继承缓存
+        self._cache = {}
+        self._cache_lock = threading.RLock()
+
+    def _cached(self, key, compute: Callable):
+        value = self._cache.get(key)
+        if value is None:
+            with self._cache_lock:
+                value = self._cache.get(key)
+                if value is None:
+                    value = compute()
+                    self._cache[key] = value
+        return value
+
+    @property
+    def gray(self) -> np.ndarray:
+        """灰度图"""
+        def compute():
+            image = self.view(np.ndarray)
+            if image.ndim == 2:
+                return image
+            code = cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            return cv2.cvtColor(image, code)
+
+        return self._cached('gray', compute)
+
+    def pyramid(self, level: int) -> np.ndarray:
+        """
+        灰度图金字塔
+
+        Args:
+            level: 层级，0为原始灰度图，每升一级宽高缩小一半
+
+        Returns:
+            缩小后的灰度图
+        """
+        if level <= 0:
+            return self.gray
+
+        def compute():
+            upper = self.pyramid(level - 1)
+            size = (upper.shape[1] // 2, upper.shape[0] // 2)
+            return cv2.resize(upper, size, interpolation=cv2.INTER_AREA)
+
+        return self._cached(('pyramid', level), compute)
+
+    @property
+    def hash(self) -> str:
+        """帧内容哈希"""
+        return self._cached('hash', lambda: hashlib.blake2b(np.ascontiguousarray(self).data,
+                                                            digest_size=16).hexdigest())
+
+
+class FrameRingBuffer:
+    """保存最近N帧的环形缓冲区，可等待比指定序号更新的帧"""
+
+    def __init__(self, size: int = 4):
+        self._frames = deque(maxlen=size)
+        self._condition = threading.Condition()
+        self._seq = 0
+
+    def push(self, image: np.ndarray, timestamp: float = None) -> Frame:
+        """放入一帧并唤醒等待者，已是Frame的沿用其序号和时间戳，否则分配新序号"""
+        with self._condition:
+            if isinstance(image, Frame):
+                frame = image
+            else:
+                self._seq += 1
+                frame = Frame(image, self._seq, timestamp)
+            self._frames.append(frame)
+            self._condition.notify_all()
+        return frame
+
+    def latest(self) -> Optional[Frame]:
+        """最新的一帧，缓冲区为空时返回None"""
+        with self._condition:
+            return self._frames[-1] if self._frames else None
+
+    def frames(self) -> List[Frame]:
+        """缓冲区中的所有帧，按时间从旧到新"""
+        with self._condition:
+            return list(self._frames)
+
+    def _wait(self, predicate: Callable[[Frame], bool], timeout: float = None) -> Optional[Frame]:
+        with self._condition:
+            ready = self._condition.wait_for(lambda: self._frames and predicate(self._frames[-1]), timeout)
+            return self._frames[-1] if ready else None
+
+    def wait_newer(self, seq: int, timeout: float = None) -> Optional[Frame]:
+        """
+        等待序号大于seq的帧
+
+        Args:
+            seq: 已处理过的帧序号
+            timeout: 超时时间(秒)，为None时一直等待
+
+        Returns:
+            最新的帧，超时返回None
+        """
+        return self._wait(lambda frame: frame.seq > seq, timeout)
+
+    def wait_after(self, timestamp: float, timeout: float = None) -> Optional[Frame]:
+        """等待在timestamp之后开始采集的帧，超时返回None"""
+        return self._wait(lambda frame: frame.timestamp >= timestamp, timeout)
+
+
+class ScreenCaptureLoop:
+    """后台连续截图线程，把每一帧放入共享的环形缓冲区"""
+
+    def __init__(self, capture: Callable[[], np.ndarray], buffer_size: int = 4, interval: float = 0.0):
+        """
+        初始化连续截图
+
+        Args:
+            capture: 截图函数
+            buffer_size: 环形缓冲区保留的帧数
+            interval: 两次截图之间的最小间隔(秒)，0表示尽可能快
+        """
+        self.capture = capture
+        self.interval = interval
+        self.buffer = FrameRingBuffer(buffer_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='ScreenCapture', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        self._stop_event.set()
+        if wait and self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            # 以开始截图的时间作为帧时间戳，保证帧内容不早于该时刻
+            start_time = time.time()
+            try:
+                self.buffer.push(self.capture(), start_time)
+            except Exception as e:
+                print(f"连续截图失败: {e}")
+                self._stop_event.wait(1)
+                continue
+            remaining = self.interval - (time.time() - start_time)
+            if remaining > 0:
+                self._stop_event.wait(remaining)
@@ -0,0 +1,135 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ImageMatcher import ImageMatcher
+from TemplateRegistry import Template
+
+
+class ScreenClassifier:
+    """
+    界面识别：一次判断当前截图是哪个已知界面
+
+    每个界面由一个或多个锚点模板定义。加载时为所有锚点建好指纹索引(缩小的灰度模板)，
+    识别时先在缩小的截图上只比对各锚点已知位置附近的小块
+    (模板的搜索区域，显式指定或由历史匹配学习得到)，给所有界面打分；
+    再按得分从高到低用全分辨率模板匹配确认，返回第一个通过确认的界面
+    """
+
+    # 粗比对使用的金字塔层级，2为1/4
+    FINGERPRINT_LEVEL = 2
+
+    def __init__(self, screens: Dict[str, List[str]], threshold: float = 0.8, coarse_threshold: float = 0.6):
+        """
+        初始化界面识别
+
+        Args:
+            screens: 界面名到锚点模板路径列表的映射，所有锚点都匹配才算该界面
+            threshold: 全分辨率确认时的匹配阈值
+            coarse_threshold: 粗比对得分低于该值的界面不参与确认
+        """
+        self.screens = screens
+        self.threshold = threshold
+        self.coarse_threshold = coarse_threshold
+        # 指纹索引：多个界面共用的锚点只存一份
+        self._templates: List[Template] = []
+        self._fingerprints: List[Tuple[int, np.ndarray]] = []
+        self._screen_anchors: Dict[str, List[int]] = {}
+        self.reload()
+
+    def reload(self):
+        """
+        重新加载锚点模板并重建指纹索引，模板文件更新后调用
+
+        锚点模板无法加载的界面不参与识别
+        """
+        templates, fingerprints, positions, screen_anchors = [], [], {}, {}
+        for name, paths in self.screens.items():
+            try:
+                loaded = {path: ImageMatcher.load_template(path) for path in paths if path not in positions}
+            except OSError as e:
+                print(f"界面 {name} 的锚点模板无法加载，不参与识别: {e}")
+                continue
+            anchors = []
+            for path in paths:
+                if path not in positions:
+                    template = loaded[path]
+                    level = self.FINGERPRINT_LEVEL
+                    while level > 0 and min(template.gray.shape[:2]) >> level < ImageMatcher.PYRAMID_MIN_SIZE:
+                        level -= 1
+                    positions[path] = len(templates)
+                    templates.append(template)
+                    fingerprints.append((level, template.pyramid(level)))
+                anchors.append(positions[path])
+            screen_anchors[name] = anchors
+        self._templates, self._fingerprints, self._screen_anchors = templates, fingerprints, screen_anchors
+
+    def _coarse_score(self, screenshot: np.ndarray, index: int) -> float:
+        """在缩小的截图上比对索引中的锚点，有已知位置时只比对该位置附近"""
+        template = self._templates[index]
+        level, fingerprint = self._fingerprints[index]
+        small = ImageMatcher.pyramid(screenshot, level)
+
+        roi = template.search_roi(screenshot.shape)
+        if roi is not None:
+            x1, y1, x2, y2 = roi
+            window = small[y1 >> level:(y2 >> level) + 1, x1 >> level:(x2 >> level) + 1]
+            if window.shape[0] >= fingerprint.shape[0] and window.shape[1] >= fingerprint.shape[1]:
+                small = window
+        if small.shape[0] < fingerprint.shape[0] or small.shape[1] < fingerprint.shape[1]:
+            return -1.0
+        return float(cv2.matchTemplate(small, fingerprint, cv2.TM_CCOEFF_NORMED).max())
+
+    def scores(self, screenshot: np.ndarray) -> List[Tuple[str, float]]:
+        """
+        所有界面的粗比对得分
+
+        Returns:
+            按得分从高到低排列的[(界面名, 得分)]，界面得分取其锚点中的最低分
+        """
+        anchor_scores = [self._coarse_score(screenshot, index) for index in range(len(self._templates))]
+        ranked = [(name, min(anchor_scores[index] for index in anchors))
+                  for name, anchors in self._screen_anchors.items()]
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked
+
+    def _verified(self, screenshot: np.ndarray) -> Iterator[str]:
+        """按粗比对得分从高到低逐个确认界面，依次产出通过确认的界面名"""
+        # 共用的锚点在一次识别中只确认一次
+        verified: Dict[int, bool] = {}
+        for name, score in self.scores(screenshot):
+            if score < self.coarse_threshold:
+                break
+            for index in self._screen_anchors[name]:
+                if index not in verified:
+                    verified[index] = ImageMatcher.find_template(
+                        screenshot, self._templates[index], self.threshold) is not None
+                if not verified[index]:
+                    break
+            else:
+                yield name
+
+    def classify(self, screenshot: np.ndarray) -> Optional[str]:
+        """
+        识别当前界面
+
+        Args:
+            screenshot: 屏幕截图，传入Frame时复用其缓存的灰度图和金字塔
+
+        Returns:
+            界面名，无法确定时返回None
+        """
+        return next(self._verified(screenshot), None)
+
+    def classify_all(self, screenshot: np.ndarray) -> List[str]:
+        """
+        识别截图上同时出现的所有界面，如城镇上打开的侧边栏
+
+        Args:
+            screenshot: 屏幕截图，传入Frame时复用其缓存的灰度图和金字塔
+
+        Returns:
+            所有通过确认的界面名，按粗比对得分从高到低排列
+        """
+        return list(self._verified(screenshot))
@@ -135,7 +135,7 @@ class WinterLess:
         if update_coordinate:
             self.automator.adb.tap(pos2[0], pos2[1])
             self.automator.wait_for_image('templates/island_enter.png')
-            coordinate = self.automator.get_screen_text((257, 1220, 449, 1302), numbers=True)
+            coordinate = self.automator.read_digits((257, 1220, 449, 1302), 'coordinate')
             self.back_to_world()
             self.coordinate = coordinate
         return True
@@ -148,37 +148,28 @@ class WinterLess:
 
     @loop_timeout(timeout_seconds=900)
     def back_to_world(self, timeout_check):
-        world_icons = {
-            0: 'templates/sidebar_close.png',
-            1: 'templates/reconnect.png',
-            2: 'templates/orders.png',
-            3: 'templates/island_anchor.png',
-            4: 'templates/world_search.png',
-            5: 'templates/intelligence_btn.png',
-            6: 'templates/my_town.png',
-            7: 'templates/position_share.png'
-        }
         current_time = time.time()
         while True:
             if timeout_check():
                 break
-            games_status = self.automator.multiple_images_pos(world_icons)
+            # 一次识别出截图上所有的界面，下面按优先级处理
+            screens = self.automator.detect_screens()
 
             # 关闭左侧列表信息（因为会遮挡队列信息）
-            if games_status[0] is not None:
+            if 'sidebar' in screens:
                 self.automator.adb.tap(695, 818)
                 return True
 
             # 如果存在位置分享图标，则点击返回
-            if games_status[7] is not None:
+            if 'position_share' in screens:
                 self.automator.adb.back()
                 return True
 
-            if games_status[4] is not None and games_status[5] is not None:
+            if 'world' in screens:
                 return True
 
             # 如果账号已登出
-            if games_status[1] is not None:
+            if 'logged_out' in screens:
                 # 10分钟后再做操作
                 time_left = int(time.time() - current_time)
                 if time_left > 600:
@@ -192,22 +183,23 @@ class WinterLess:
                 continue
 
             # 如果在城镇，则点击野外按钮
-            if games_status[2] is not None:
+            if 'town' in screens:
                 self.automator.adb.tap(978, 1826)
                 continue
 
             # 如果在晨曦岛，点击退出
-            if games_status[3] is not None:
+            if 'island' in screens:
                 self.automator.adb.tap(66, 43)
                 time.sleep(0.5)
                 continue
 
             # 处理回城图标遮挡目标的情况，比较少见，所以放最后。
-            pos = games_status[6]
-            if pos is not None:
-                self.automator.adb.tap(pos[0], pos[1])
-                time.sleep(0.5)
-                continue
+            if 'my_town' in screens:
+                pos = self.automator.get_image_pos('templates/my_town.png', timeout=0)
+                if pos:
+                    self.automator.adb.tap(pos[0], pos[1])
+                    time.sleep(0.5)
+                    continue
             self.automator.adb.back()
             time.sleep(0.1)
 
@@ -258,9 +250,12 @@ class WinterLess:
                 self.island_visit(x, y)
             break
 
-        # 点击联盟互助
-        while time.time() - start_time < 1.9:
-            self.automator.adb.tap(853, 1650, random_range=1)
+        # 点击联盟互助，剩余时间内的连续点击一次发送
+        batch = self.automator.adb.input_batch()
+        # 每次点击按0.1秒间隔加设备上约0.1秒的命令耗时估算
+        for _ in range(int((1.9 - (time.time() - start_time)) / 0.2)):
+            batch.tap(853, 1650, random_range=1, delay=0.1)
+        batch.send()
         return result
 
     def under_attack(self, x, y):
@@ -283,16 +278,21 @@ class WinterLess:
                 continue
 
             x, y = value
-            time_left = self.get_seconds(region=(x + 100, y + 10, x + 800, y + 50))
+            # 剩余时间和目标坐标在同一帧上一起读取，需要VLM时只请求一次
+            regions = {'time_left': ((x + 100, y + 10, x + 800, y + 50), 'time')}
+            if key != 3:
+                regions['coordinate'] = ((800, y - 22, 1200, y + 22), 'coordinate')
+            values = self.automator.read_digits_regions(regions)
+            time_left = self.to_seconds(values['time_left'])
 
             if key == 0 or key == 2:
-                coordinate = self.automator.get_screen_text((800, y - 22, 1200, y + 22), numbers=True)
+                coordinate = values['coordinate']
                 if coordinate == self.coordinate and time_left < 15:
                     self.enable_shield()
                 break
             if key == 1:
                 print('marching', value)
-                coordinate = self.automator.get_screen_text((800, y - 22, 1200, y + 22), numbers=True)
+                coordinate = values['coordinate']
                 if coordinate == self.coordinate:
                     print('downtown under attached')
                 self.back_to_world()
@@ -356,7 +356,8 @@ class WinterLess:
             if self.automator.wait_for_image('templates/travel_supply.png', timeout=1):
                 rolling = False
             self.automator.adb.swipe(337, 900, 337, 490)
-            time.sleep(1)
+            # 等侧边栏列表停止滚动
+            self.automator.wait_until_stable(roi=(0, 340, 660, 1320), max_wait=1)
             if should_break():
                 return False
 
@@ -469,8 +470,7 @@ class WinterLess:
         # (200, 281, 364, 351)为行军信息区域，尽量保持队伍信息区域干净，否则影响效果
         # 确认是否有队列
         while True:
-            value = self.automator.get_screen_text((200, 281, 364, 351), preprocess=False,
-                                                   numbers=True, with_qwen3=True)
+            value = self.automator.read_digits((200, 281, 364, 351), 'fraction')
             if len(value) == 2:
                 current, max_queue = value
                 if 7 > max_queue > current:
@@ -679,7 +679,7 @@ class WinterLess:
 
             self.automator.wait_and_click('templates/world_search.png', timeout=1)
             self.automator.adb.swipe(100, 1350, 900, 1350, 500)
-            time.sleep(0.1)
+            self.automator.wait_until_stable(roi=(0, 1200, 1080, 1500), max_wait=1)
 
             alliance_status = self.automator.multiple_images_pos(alliance_search_path)
             for key, value in alliance_status.items():
@@ -731,8 +731,8 @@ class WinterLess:
             self.automator.wait_and_click('templates/world_search.png', timeout=3)
             self.automator.adb.swipe(900, 1350, 100, 1350, 500)
 
-            # 滑动后必须等待，否则会找不到或者采矿不正确
-            time.sleep(0.2)
+            # 滑动后必须等待停稳，否则会找不到或者采矿不正确
+            self.automator.wait_until_stable(roi=(0, 1200, 1080, 1500), max_wait=1)
 
             # 如果矿不存在则不进行开采
             self.automator.adb.tap(x, y)
@@ -824,13 +824,12 @@ class WinterLess:
             name = training_type[key % 3]
             if (self.automator.wait_for_image('templates/orders.png', timeout=2) and
                     not self.automator.wait_for_image(f'templates/{name}_training.png', timeout=1)):
-                # 点击兵营两次
-                self.automator.adb.tap(540, 860)
-                time.sleep(0.2)
-                self.automator.adb.tap(540, 860)
-                time.sleep(0.2)
-                self.automator.adb.tap(540, 860)
-                time.sleep(0.2)
+                # 点击兵营三次
+                self.automator.adb.input_batch() \
+                    .tap(540, 860, delay=0.2) \
+                    .tap(540, 860, delay=0.2) \
+                    .tap(540, 860, delay=0.2) \
+                    .send()
                 # 点击训练按钮
                 self.automator.wait_and_click("templates/training.png", timeout=1)
                 # 判定是否进入训练界面
@@ -1134,14 +1133,20 @@ class WinterLess:
             return "盟矿放置成功。"
 
     def get_seconds(self, region: Tuple[int, int, int, int] = None, preprocess: bool = True, with_qwen3: bool = True):
-        time_left = 0
+        if with_qwen3:
+            text = self.automator.read_digits(region, 'time')
+        else:
+            text = self.automator.get_screen_text(region, numbers=True, preprocess=preprocess, with_qwen3=False)
+        return self.to_seconds(text)
+
+    @staticmethod
+    def to_seconds(values: List) -> int:
+        """将[时, 分, 秒]转换为秒数，格式不对时返回0"""
         try:
-            text = self.automator.get_screen_text(region, numbers=True, preprocess=preprocess, with_qwen3=with_qwen3)
-            h, m, s = text
-            time_left = h * 3600 + m * 60 + s
+            h, m, s = values
         except ValueError:
-            pass
-        return time_left
+            return 0
+        return h * 3600 + m * 60 + s
 
     def calculate_wait_time(self, wait_type: int = 0, extra_seconds: int = 0):
         wait_path = {
@@ -1184,8 +1189,7 @@ class WinterLess:
 
                 self.automator.wait_and_click('templates/intelligence_btn.png')
                 self.automator.wait_for_image('templates/intelligence_anchor.png', timeout=2)
-                strength = self.automator.get_screen_text((900, 30, 1000, 90), preprocess=False,
-                                                          numbers=True, with_qwen3=True)
+                strength = self.automator.read_digits((900, 30, 1000, 90), 'number')
                 if strength:
                     strength = int(strength[0])
                 if strength < stop_value:
@@ -1571,5 +1575,8 @@ class WinterLess:
     def is_ready(self):
         return self.automator.is_ready()
 
+    def refresh_status(self):
+        self.automator.refresh_status()
+
     def get_status(self):
         return self.automator.get_status()
@@ -8,7 +8,8 @@ import tkinter as tk
 from datetime import datetime
 from tkinter import ttk, messagebox, scrolledtext, filedialog
 
-from MumuManager import MumuGameAutomator, ADBController
+from DeviceRegistry import get_device_registry
+from MumuManager import MumuGameAutomator
 from TaskList import WinterLess
 from TaskQueueManager import GameTaskManager, ScheduleType
 
@@ -1063,8 +1064,8 @@ class TaskManagerGUI(tk.Tk):
 
         try:
             # 调用分析函数（这里用模拟函数代替）
-            adb = ADBController(0, self.mmm_path)
-            result_dict = adb.get_all_devices_info()
+            # 只需要设备列表，不必连接设备
+            result_dict = get_device_registry(self.mmm_path).snapshot()
 
             # 清空现有的标签页
             for tab in self.notebook.tabs():
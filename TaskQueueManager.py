@@ -605,7 +605,7 @@ class GameTaskManager:
         if not task.enabled:
             return True, "任务未启用"
 
-        # 检查游戏状态（在检查运行任务之前）
+        # 检查游戏状态（在检查运行任务之前），只读取监控线程刷新的缓存状态
         if task.requires_game and not self.automator.is_ready():
             return True, "游戏未就绪"
 
@@ -939,6 +939,8 @@ class GameTaskManager:
         """监控游戏状态"""
         while not self.stop_event.is_set():
             try:
+                # 刷新缓存的前台状态，任务调度只读缓存
+                self.automator.refresh_status()
                 # 获取游戏状态
                 status = self.automator.get_status()
 
@@ -0,0 +1,250 @@
+import glob
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class Template(np.ndarray):
+    """
+    模板图像：numpy数组(原始彩色图)，附带预先转换好的灰度图、掩码和文件信息
+
+    可以直接当作普通数组传给ImageMatcher，匹配时不再重复转换灰度。
+    还可以携带搜索区域：显式指定的roi，或由最近几次匹配位置外扩margin学习得到
+    """
+
+    # 学习得到的搜索区域向外扩展的像素数
+    ROI_MARGIN = 40
+    # 学习搜索区域时只取最近几次匹配的位置，早先的位置逐渐淘汰，区域不会只增不减
+    ROI_HISTORY = 8
+
+    def __new__(cls, image: np.ndarray, path: str = '', mtime: float = 0.0):
+        template = np.asarray(image).view(cls)
+        template.path = path
+        template.name = os.path.splitext(os.path.basename(path))[0]
+        template.mtime = mtime
+        if image.ndim == 3:
+            template.color = np.ascontiguousarray(image[..., :3])
+            code = cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            template.gray = cv2.cvtColor(image, code)
+        else:
+            template.color = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+            template.gray = np.asarray(image)
+        # 只有存在透明像素时才需要掩码
+        template.mask = None
+        if image.ndim == 3 and image.shape[2] == 4 and (image[..., 3] < 255).any():
+            template.mask = np.ascontiguousarray(image[..., 3])
+        template.roi = None
+        template.match_box = None
+        template.recent_matches = deque(maxlen=cls.ROI_HISTORY)
+        # 共享线程池中多台设备可能同时匹配同一模板
+        template._match_lock = threading.Lock()
+        template.last_scale = None
+        template.scale_hits = 0
+        template.scale_lookups = 0
+        return template
+
+    def __array_finalize__(self, obj):
+        # 切片等视图的内容与原模板不同，不沿用预处理结果
+        self.path = getattr(obj, 'path', '')
+        self.name = getattr(obj, 'name', '')
+        self.mtime = getattr(obj, 'mtime', 0.0)
+        self.color = None
+        self.gray = None
+        self.mask = None
+        self.roi = None
+        self.match_box = None
+        self.recent_matches = deque(maxlen=self.ROI_HISTORY)
+        self._match_lock = threading.Lock()
+        self.last_scale = None
+        self.scale_hits = 0
+        self.scale_lookups = 0
+        self._pyramids = {}
+
+    @property
+    def wh(self) -> Tuple[int, int]:
+        """模板宽高(w, h)，size仍是ndarray的元素个数"""
+        return self.shape[1], self.shape[0]
+
+    def pyramid(self, level: int) -> Optional[np.ndarray]:
+        """
+        灰度模板的金字塔层级，与Frame.pyramid的缩小方式一致
+
+        Args:
+            level: 层级，0为原始灰度图，每升一级宽高缩小一半
+
+        Returns:
+            缩小后的灰度图
+        """
+        if level <= 0 or self.gray is None:
+            return self.gray
+        image = self._pyramids.get(level)
+        if image is None:
+            upper = self.pyramid(level - 1)
+            size = (upper.shape[1] // 2, upper.shape[0] // 2)
+            image = cv2.resize(upper, size, interpolation=cv2.INTER_AREA)
+            self._pyramids[level] = image
+        return image
+
+    def search_roi(self, screen_shape: Tuple[int, ...]) -> Optional[Tuple[int, int, int, int]]:
+        """
+        优先搜索的区域
+
+        Args:
+            screen_shape: 截图的shape，用于裁剪区域
+
+        Returns:
+            (x1, y1, x2, y2)，没有显式区域也没有历史匹配时返回None
+        """
+        if self.roi is not None:
+            x1, y1, x2, y2 = self.roi
+        elif self.match_box is not None:
+            x1, y1, x2, y2 = self.match_box
+            x1 -= self.ROI_MARGIN
+            y1 -= self.ROI_MARGIN
+            x2 += self.ROI_MARGIN
+            y2 += self.ROI_MARGIN
+        else:
+            return None
+
+        height, width = screen_shape[:2]
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, width), min(y2, height)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def record_match(self, x: int, y: int, w: int, h: int):
+        """记录一次匹配的位置(左上角坐标和宽高)，学习到的区域为最近几次匹配位置的并集"""
+        with self._match_lock:
+            self.recent_matches.append((x, y, x + w, y + h))
+            boxes = np.array(self.recent_matches)
+            self.match_box = (int(boxes[:, 0].min()), int(boxes[:, 1].min()),
+                              int(boxes[:, 2].max()), int(boxes[:, 3].max()))
+
+    def clear_matches(self):
+        """忘掉学习到的区域"""
+        with self._match_lock:
+            self.recent_matches.clear()
+            self.match_box = None
+
+    def record_scale_lookup(self, hit: bool):
+        """记录一次成功的缩放匹配是否落在上次成功的尺度或其相邻尺度上"""
+        self.scale_lookups += 1
+        if hit:
+            self.scale_hits += 1
+
+
+class TemplateRegistry:
+    """进程内共享的模板缓存，每个模板文件只读取一次，文件修改时间变化后重新加载"""
+
+    def __init__(self):
+        self._templates: Dict[str, Template] = {}
+        self._rois: Dict[str, Tuple[int, int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def get(self, path: str) -> Template:
+        """
+        获取模板
+
+        Args:
+            path: 模板图片路径
+
+        Returns:
+            Template对象
+        """
+        key = self._key(path)
+        mtime = os.stat(path).st_mtime
+        with self._lock:
+            template = self._templates.get(key)
+        if template is not None and template.mtime == mtime:
+            return template
+
+        new_template = Template(np.array(Image.open(path)), path, mtime)
+        with self._lock:
+            new_template.roi = self._rois.get(key)
+            self._templates[key] = new_template
+        return new_template
+
+    def set_roi(self, path: str, roi: Optional[Tuple[int, int, int, int]]):
+        """
+        为模板指定搜索区域
+
+        Args:
+            path: 模板图片路径
+            roi: (x1, y1, x2, y2)全屏坐标，None表示取消
+        """
+        key = self._key(path)
+        with self._lock:
+            if roi is None:
+                self._rois.pop(key, None)
+            else:
+                self._rois[key] = tuple(roi)
+            template = self._templates.get(key)
+            if template is not None:
+                template.roi = self._rois.get(key)
+
+    def preload(self, directory: str = 'templates', pattern: str = '**/*.png',
+                exclude: Tuple[str, ...] = ('digits',)) -> int:
+        """
+        预先加载目录下的所有模板
+
+        Args:
+            directory: 模板目录
+            pattern: 文件匹配模式
+            exclude: 不加载的子目录，如DigitReader的字符模板库
+
+        Returns:
+            加载的模板数量
+        """
+        paths = [path for path in glob.glob(os.path.join(directory, pattern), recursive=True)
+                 if os.path.relpath(path, directory).split(os.sep)[0] not in exclude]
+        for path in paths:
+            try:
+                self.get(path)
+            except Exception as e:
+                print(f"加载模板失败 {path}: {e}")
+        return len(paths)
+
+    def invalidate(self, path: Optional[str] = None):
+        """丢弃指定模板的缓存，path为None时清空全部"""
+        with self._lock:
+            if path is None:
+                self._templates.clear()
+            else:
+                self._templates.pop(self._key(path), None)
+
+    def scale_cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        各模板缩放匹配的尺度缓存命中情况
+
+        Returns:
+            {模板路径: {'scale': 上次成功尺度, 'hits': 命中次数, 'lookups': 有缓存尺度时的成功匹配次数,
+                       'hit_rate': 命中率}}
+        """
+        with self._lock:
+            templates = list(self._templates.values())
+        return {
+            template.path: {
+                'scale': template.last_scale,
+                'hits': template.scale_hits,
+                'lookups': template.scale_lookups,
+                'hit_rate': template.scale_hits / template.scale_lookups,
+            }
+            for template in templates if template.scale_lookups
+        }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._templates)
+
+
+template_registry = TemplateRegistry()
@@ -0,0 +1,203 @@
+import bisect
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class VLMClient:
+    """
+    进程内共享的Ollama视觉模型客户端
+
+    使用常驻的requests.Session连接池，每次请求都有连接和读取超时；
+    失败时有限次重试，重试间隔指数增长并加随机抖动；
+    连续失败达到阈值后熔断一段时间，期间直接返回空结果，不再等待超时；
+    按提示词类型统计耗时直方图
+    """
+
+    # 耗时直方图的桶上界(秒)
+    LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, float('inf'))
+    # 计算分位数时保留的最近样本数
+    RECENT_SAMPLES = 1000
+
+    def __init__(self, url: str = 'http://localhost:11434/api/generate', model: str = 'qwen3-vl',
+                 connect_timeout: float = 3.0, read_timeout: float = 60.0, max_retries: int = 2,
+                 backoff: float = 0.5, max_backoff: float = 4.0, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, pool_size: int = 8):
+        """
+        初始化客户端
+
+        Args:
+            url: Ollama generate接口地址
+            model: 模型名
+            connect_timeout: 建立连接的超时时间(秒)
+            read_timeout: 等待响应的超时时间(秒)
+            max_retries: 失败后的最多重试次数
+            backoff: 第一次重试前的等待时间(秒)，之后每次翻倍
+            max_backoff: 重试等待时间上限(秒)
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断持续时间(秒)，之后放行一个试探请求
+            pool_size: 连接池大小
+        """
+        self.url = url
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        # 熔断到期后只放行一个试探请求
+        self._probing = False
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _allow_request(self) -> bool:
+        with self._lock:
+            if self._consecutive_failures < self.failure_threshold:
+                return True
+            if time.monotonic() < self._open_until or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def _record_result(self, success: bool):
+        with self._lock:
+            self._probing = False
+            if success:
+                self._consecutive_failures = 0
+                return
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.reset_timeout
+                print(f"VLM连续失败{self._consecutive_failures}次，熔断{self.reset_timeout:g}秒")
+
+    @property
+    def is_open(self) -> bool:
+        """是否处于熔断状态"""
+        with self._lock:
+            return self._consecutive_failures >= self.failure_threshold and time.monotonic() < self._open_until
+
+    def _record_latency(self, prompt_type: str, elapsed: Optional[float]):
+        """记录一次调用的耗时，elapsed为None表示失败"""
+        with self._lock:
+            stats = self._stats.setdefault(prompt_type, {
+                'count': 0, 'failures': 0, 'total': 0.0,
+                'buckets': [0] * len(self.LATENCY_BUCKETS),
+                'recent': deque(maxlen=self.RECENT_SAMPLES),
+            })
+            if elapsed is None:
+                stats['failures'] += 1
+                return
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['buckets'][bisect.bisect_left(self.LATENCY_BUCKETS, elapsed)] += 1
+            stats['recent'].append(elapsed)
+
+    def _retry_delay(self, attempt: int) -> float:
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        return delay * random.uniform(0.5, 1.5)
+
+    def generate(self, prompt: str, images: List[str] = None, options: Dict[str, Any] = None,
+                 prompt_type: str = 'default', headers: Dict[str, str] = None, retry_empty: bool = False) -> str:
+        """
+        调用视觉模型
+
+        Args:
+            prompt: 提示词
+            images: base64编码的图片
+            options: Ollama的options参数，如temperature
+            prompt_type: 提示词类型，用于分别统计耗时
+            headers: 额外的请求头
+            retry_empty: 模型返回空文本时是否也重试
+
+        Returns:
+            模型输出的文本，失败、超时或熔断时返回空字符串
+        """
+        if not self._allow_request():
+            print("VLM已熔断，跳过请求")
+            return ''
+
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "images": images or [],
+            "stream": False,
+        }
+        if options:
+            payload["options"] = options
+
+        start = time.perf_counter()
+        result = ''
+        success = False
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self._retry_delay(attempt - 1))
+            try:
+                response = self.session.post(self.url, json=payload, headers=headers,
+                                             timeout=(self.connect_timeout, self.read_timeout))
+            except requests.RequestException as e:
+                print(f"VLM请求失败({attempt + 1}/{self.max_retries + 1}): {e}")
+                continue
+
+            if response.status_code == 200:
+                try:
+                    result = response.json().get('response', '')
+                except ValueError as e:
+                    print(f"VLM响应解析失败({attempt + 1}/{self.max_retries + 1}): {e}")
+                    continue
+                success = True
+                if result or not retry_empty:
+                    break
+            elif response.status_code == 429 or response.status_code >= 500:
+                print(f"VLM请求失败({attempt + 1}/{self.max_retries + 1}): HTTP {response.status_code}")
+            else:
+                # 请求本身有问题，重试也不会成功
+                print(f"VLM请求失败: HTTP {response.status_code}")
+                break
+
+        self._record_result(success)
+        self._record_latency(prompt_type, time.perf_counter() - start if success else None)
+        return result
+
+    def latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各提示词类型的耗时统计
+
+        Returns:
+            {提示词类型: {'count': 成功次数, 'failures': 失败次数, 'mean', 'p50', 'p95': 秒,
+                        'histogram': {桶上界: 次数}}}
+        """
+        with self._lock:
+            result = {}
+            for prompt_type, stats in self._stats.items():
+                recent = np.array(stats['recent']) if stats['recent'] else None
+                result[prompt_type] = {
+                    'count': stats['count'],
+                    'failures': stats['failures'],
+                    'mean': stats['total'] / stats['count'] if stats['count'] else None,
+                    'p50': float(np.percentile(recent, 50)) if recent is not None else None,
+                    'p95': float(np.percentile(recent, 95)) if recent is not None else None,
+                    'histogram': dict(zip(self.LATENCY_BUCKETS, stats['buckets'])),
+                }
+            return result
+
+    def close(self):
+        self.session.close()
+
+
+vlm_client = VLMClient()
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Iterator, Optional
+
+import numpy as np
+
+
+class WaitStrategy(ABC):
+    """
+    等待策略：决定轮询识别时每次取帧之间等多久
+
+    frames()立即取第一帧，之后按策略等待再取帧，所有等待都截止到timeout，
+    最后一次取帧不晚于截止时间
+    """
+
+    @abstractmethod
+    def intervals(self) -> Iterator[float]:
+        """依次产生每两次取帧之间的等待时间(秒)"""
+
+    def next_frame(self, adb, last_frame: np.ndarray, wait: float, remaining: float) -> Optional[np.ndarray]:
+        """
+        等待后取下一帧
+
+        Args:
+            adb: ADBController
+            last_frame: 上一帧
+            wait: 本次按策略应等待的时间，已截断到不超过remaining
+            remaining: 距截止时间的剩余秒数
+
+        Returns:
+            新的一帧，截止前取不到时返回None
+        """
+        time.sleep(wait)
+        return adb.get_frame()
+
+    def frames(self, adb, timeout: float) -> Iterator[np.ndarray]:
+        """
+        在timeout秒内依次产生用于识别的帧
+
+        Args:
+            adb: ADBController
+            timeout: 超时时间(秒)，0表示只取一帧，小于0时不取帧
+        """
+        if timeout < 0:
+            return
+        deadline = time.monotonic() + timeout
+        frame = adb.get_frame()
+        yield frame
+        for interval in self.intervals():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            frame = self.next_frame(adb, frame, min(interval, remaining), remaining)
+            if frame is None:
+                return
+            yield frame
+
+    async def aframes(self, adb, timeout: float) -> AsyncIterator[np.ndarray]:
+        """
+        frames()的asyncio版本，等待期间不阻塞事件循环
+
+        Args:
+            adb: AsyncADBController
+            timeout: 超时时间(秒)，0表示只取一帧，小于0时不取帧
+        """
+        if timeout < 0:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        yield await adb.get_frame()
+        for interval in self.intervals():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(interval, remaining))
+            yield await adb.get_frame()
+
+
+class ImmediateProbe(WaitStrategy):
+    """立即取第一帧，之后固定间隔轮询"""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+
+    def intervals(self) -> Iterator[float]:
+        while True:
+            yield self.interval
+
+
+class ExponentialBackoff(WaitStrategy):
+    """立即取第一帧，之后等待时间按倍数增长，不超过上限"""
+
+    def __init__(self, initial: float = 0.1, factor: float = 2.0, max_interval: float = 1.0):
+        """
+        Args:
+            initial: 第一次等待时间(秒)
+            factor: 每次等待时间的增长倍数
+            max_interval: 等待时间上限(秒)
+        """
+        self.initial = initial
+        self.factor = factor
+        self.max_interval = max_interval
+
+    def intervals(self) -> Iterator[float]:
+        interval = self.initial
+        while True:
+            yield interval
+            interval = min(interval * self.factor, self.max_interval)
+
+
+class NewFrameWait(ExponentialBackoff):
+    """
+    连续截图开启时，一有新帧就识别，不额外等待
+
+    未开启连续截图时退化为指数退避
+    """
+
+    def next_frame(self, adb, last_frame: np.ndarray, wait: float, remaining: float) -> Optional[np.ndarray]:
+        if adb.capture_loop is None or not adb.capture_loop.is_running:
+            return super().next_frame(adb, last_frame, wait, remaining)
+        return adb.wait_for_frame(after_seq=getattr(last_frame, 'seq', 0), timeout=remaining)
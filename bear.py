@@ -1,11 +1,11 @@
 import argparse
 import time
-from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from PIL import Image
 
 from ImageMatcher import ImageMatcher
+from MatchExecutor import match_executor
 from MumuManager import ADBController
+from WaitStrategy import NewFrameWait
 
 target_players = [
     ['辣椒', '暧昧', '木瓜', '三千梨花树', '节能', '土豆嫂牛肉', 'xy520', '可乐',
@@ -28,9 +28,11 @@ class BearHunting:
         self.device_id = device_id
         self.threshold = threshold
 
-        self.image_matcher = ImageMatcher()
         self.adb = ADBController(device_id=self.device_id,
                                  mmm_path=r'D:\Program Files\Netease\MuMu\nx_main\MuMuManager.exe')
+        self.image_matcher = ImageMatcher(cache=self.adb.match_cache)
+        # 保持原来每0.2秒识别一次的节奏，开启连续截图时改为一有新帧就识别
+        self.wait_strategy = NewFrameWait(initial=0.2, max_interval=0.2)
 
         self.troops = {}
         self.templates = {}
@@ -41,21 +43,14 @@ class BearHunting:
         if troop_paths:
             self.troops = self.load_templates(troop_paths)
 
-        # 每次循环都创建
-        self.executor = ThreadPoolExecutor(max_workers=20)
-
     @staticmethod
     def load_templates(paths: dict) -> dict:
         """加载模板图片"""
         templates = {}
         for i, path in paths.items():
-            img = np.array(Image.open(path))
-            if img is None:
-                raise ValueError(f"无法加载模板图片: {path}")
-
             templates.update(
                 {
-                    i: img
+                    i: ImageMatcher.load_template(path)
                 }
             )
         return templates
@@ -66,18 +61,19 @@ class BearHunting:
         template_keys = list(self.templates.keys())
         template_values = list(self.templates.values())
 
-        screenshot = self.adb.screenshot()
-        result = list(self.executor.map(
-            lambda template: self.image_matcher.find_template(screenshot, template, threshold),
+        screenshot = self.adb.get_frame()
+        result = match_executor.map(
+            self.device_id,
+            lambda template: self.image_matcher.match(screenshot, template, threshold),
             template_values
-        ))
+        )
 
         result = dict(zip(template_keys, result))
         return result
 
     def _get_image_pos(self, template: np.ndarray, screenshot: np.ndarray, threshold: float = 0.8,
                        offset_x: int = 0, offset_y: int = 0):
-        position = self.image_matcher.find_template(screenshot, template, threshold)
+        position = self.image_matcher.match(screenshot, template, threshold)
         if position:
             x, y = position
             x += offset_x
@@ -89,14 +85,11 @@ class BearHunting:
                       threshold: float = 0.8, offset_x: int = 0, offset_y: int = 0):
         # print(f"等待图像: {template_path}")
         template = self.image_matcher.load_template(template_path)
-        start_time = time.time()
-        while time.time() - start_time - 0.1 < timeout:
-            screenshot = self.adb.screenshot()
+        for screenshot in self.wait_strategy.frames(self.adb, timeout):
             result = self._get_image_pos(template=template, screenshot=screenshot, threshold=threshold,
                                          offset_x=offset_x, offset_y=offset_y)
             if result:
                 return result
-            time.sleep(0.2)
         return False
 
     def wait_and_click(self, template_path: str, timeout: int = 3,
@@ -123,7 +116,7 @@ class BearHunting:
         '''
         是否成功派兵的判定
         '''
-        screenshot = self.adb.screenshot()
+        screenshot = self.adb.get_frame()
         if (self._get_image_pos(template=self.troops['ratio'], screenshot=screenshot) and
                 self._get_image_pos(template=self.troops['buff'], screenshot=screenshot)):
             self.adb.back()
@@ -157,7 +150,7 @@ class BearHunting:
         2. 由于屏幕滚动，没点中+号，但是也进入了玩家队伍界面，这是需要判定是否有小+号，有则点击，没有则界面返回，退出函数
         3. 队伍已满或者已加入编队，不做任何操作
         '''
-        screenshot = self.adb.screenshot()
+        screenshot = self.adb.get_frame()
         # 如果界面能选队伍，直接选好队伍出发
         if self._get_image_pos(template=self.troops[1], screenshot=screenshot):
             self.troop_depart(target=target, troop_id=troop_id)
@@ -184,7 +177,7 @@ class BearHunting:
         
         这里逻辑可能有问题，因为派后后就进入了派兵函数(troop_depart)，派兵成功应该由派兵函数判定
         '''
-        screenshot = self.adb.screenshot()
+        screenshot = self.adb.get_frame()
         if (self._get_image_pos(template=self.troops['ratio'], screenshot=screenshot) and
                 self._get_image_pos(template=self.troops['buff'], screenshot=screenshot)):
             self.adb.back()
@@ -234,8 +227,8 @@ class BearHunting:
             0: 'templates/bear.png',
             1: 'templates/reconnect.png'
         }
+        games_status = self.load_templates(world_icons)
         while True:
-            games_status = self.load_templates(world_icons)
             if games_status[0] is not None:
                 return games_status[0]
 
@@ -0,0 +1,592 @@
+import argparse
+import asyncio
+import base64
+import glob
+import io
+import json
+import re
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import requests
+from PIL import Image
+
+from ADBTransport import ADBSocketTransport, AsyncADBSocketTransport
+from AsyncMumuManager import AsyncADBController
+from DigitReader import DigitReader
+from ImageMatcher import ImageMatcher
+from MumuManager import ADBController
+from OCRProcessor import OCRCache, OCRProcessor, VLMEncoding
+from ScreenCapture import Frame
+from ScreenClassifier import ScreenClassifier
+from TemplateRegistry import template_registry
+from VLMClient import VLMClient, vlm_client
+from tests.fakes import FakeADBDaemon, FakeOllama
+
+# tests/中的截图上能匹配到的模板，以及几个匹配不到的常用模板
+MATCH_TEMPLATES = [
+    'templates/arena_win.png', 'templates/arena_battle_record.png', 'templates/arena_btn.png',
+    'templates/refresh_arena.png', 'templates/escape.png', 'templates/close_popup2.png',
+    'templates/queue_beast.png', 'templates/fight2.png',
+    'templates/world_search.png', 'templates/intelligence_btn.png', 'templates/bear.png',
+]
+
+
+def print_latency(name: str, samples: list):
+    """打印耗时统计(毫秒)"""
+    samples = np.array(samples) * 1000
+    print(f'{name:<24} 次数: {len(samples):<5} 平均: {samples.mean():8.2f}ms  '
+          f'p50: {np.percentile(samples, 50):8.2f}ms  p95: {np.percentile(samples, 95):8.2f}ms  '
+          f'最大: {samples.max():8.2f}ms')
+
+
+def bench_input_latency(device_id: int, mmm_path: str, count: int = 50):
+    """
+    分别统计adbd直连、常驻shell会话、每次启动子进程三种方式的单次输入延迟
+
+    各方式直接调用对应通道，不经过_run_input的自动选择；
+    使用 keyevent 0 (KEYCODE_UNKNOWN)，不会对游戏界面产生影响
+    """
+    adb = ADBController(device_id=device_id, mmm_path=mmm_path)
+    args = ['input', 'keyevent', '0']
+    script = ' '.join(args)
+
+    def measure(name, send):
+        samples = []
+        for _ in range(count):
+            start = time.perf_counter()
+            send()
+            samples.append(time.perf_counter() - start)
+        print_latency(name, samples)
+
+    cmd = adb._get_adb_command(['shell'] + args)
+    measure('子进程方式', lambda: subprocess.run(cmd, capture_output=True))
+
+    session = adb._get_shell_session()
+    if session is None:
+        print('常驻shell会话不可用，跳过')
+    else:
+        measure('常驻shell会话', lambda: session.run(script))
+
+    if adb.transport is None or not adb.transport.available:
+        print('adbd直连不可用，跳过')
+    else:
+        measure('adbd直连', lambda: adb.transport.run_status('shell', script))
+    adb.close()
+
+
+def bench_fake_adbd(count: int = 200, png_path: str = 'tests/301.png'):
+    """用本地模拟adbd验证socket直连传输，并统计单次命令与截图传输的延迟"""
+    with open(png_path, 'rb') as f:
+        png = f.read()
+    server = FakeADBDaemon(screencap_png=png)
+    transport = ADBSocketTransport('127.0.0.1', server.port)
+    transport.connect()
+
+    assert transport.shell('echo hello') == b'hello\n'
+    assert transport.exec_out('screencap -p') == png
+    raw_image = ADBController._parse_raw_screenshot(transport.exec_out('screencap'))
+    assert np.array_equal(raw_image, np.array(Image.open(png_path).convert('RGBA')))
+
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        transport.shell('input keyevent 0')
+        samples.append(time.perf_counter() - start)
+    print_latency('socket shell命令', samples)
+
+    samples = []
+    for _ in range(max(count // 10, 1)):
+        start = time.perf_counter()
+        np.array(Image.open(io.BytesIO(transport.exec_out('screencap -p'))))
+        samples.append(time.perf_counter() - start)
+    print_latency('截图(PNG传输+解码)', samples)
+
+    samples = []
+    for _ in range(max(count // 10, 1)):
+        start = time.perf_counter()
+        ADBController._parse_raw_screenshot(transport.exec_out('screencap'))
+        samples.append(time.perf_counter() - start)
+    print_latency('截图(原始帧缓冲)', samples)
+
+    transport.close()
+    server.shutdown()
+
+
+def bench_async_devices(devices: int = 10, count: int = 20, latency: float = 0.05,
+                        png_path: str = 'tests/301.png'):
+    """
+    用多个本地模拟adbd比较同步逐台驱动与一个事件循环并发驱动多台设备的吞吐
+
+    每台设备循环执行 截图(原始帧缓冲) + 点击，latency模拟设备上每条命令的耗时
+    """
+    with open(png_path, 'rb') as f:
+        png = f.read()
+    servers = [FakeADBDaemon(screencap_png=png, latency=latency) for _ in range(devices)]
+
+    transports = [ADBSocketTransport('127.0.0.1', server.port) for server in servers]
+    start = time.perf_counter()
+    for transport in transports:
+        for _ in range(count):
+            ADBController._parse_raw_screenshot(transport.exec_out('screencap'))
+            transport.shell('input tap 540 960')
+    elapsed = time.perf_counter() - start
+    print(f'{"同步逐台":<24} 设备: {devices}  每台: {count}轮  总耗时: {elapsed:6.2f}s  '
+          f'吞吐: {devices * count / elapsed:7.1f}轮/s')
+    for transport in transports:
+        transport.close()
+
+    async def drive(adb: AsyncADBController):
+        for _ in range(count):
+            await adb.screenshot()
+            await adb._run_input(['input', 'tap', '540', '960'])
+
+    async def run_all():
+        controllers = []
+        for i, server in enumerate(servers):
+            adb = AsyncADBController(i)
+            adb.transport = AsyncADBSocketTransport('127.0.0.1', server.port)
+            adb.screenshot_method = 'raw'
+            controllers.append(adb)
+        start = time.perf_counter()
+        await asyncio.gather(*(drive(adb) for adb in controllers))
+        elapsed = time.perf_counter() - start
+        for adb in controllers:
+            adb.close()
+        return elapsed
+
+    elapsed = asyncio.run(run_all())
+    print(f'{"单事件循环并发":<24} 设备: {devices}  每台: {count}轮  总耗时: {elapsed:6.2f}s  '
+          f'吞吐: {devices * count / elapsed:7.1f}轮/s')
+    for server in servers:
+        server.shutdown()
+
+
+def bench_vlm_client(count: int = 100):
+    """用本地模拟Ollama验证共享VLM客户端的连接复用、超时和熔断"""
+    server = FakeOllama()
+    payload = {'model': 'qwen3-vl', 'prompt': 'ocr', 'images': [], 'stream': False}
+
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        requests.post(server.url, json=payload)
+        samples.append(time.perf_counter() - start)
+    print_latency('requests.post(每次新连接)', samples)
+
+    client = VLMClient(url=server.url, read_timeout=1.0, max_retries=1, backoff=0.1,
+                       failure_threshold=3, reset_timeout=60)
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.generate('ocr', prompt_type='ocr_text')
+        samples.append(time.perf_counter() - start)
+    print_latency('VLMClient(连接复用)', samples)
+
+    server.mode = 'hang'
+    start = time.perf_counter()
+    result = client.generate('ocr', prompt_type='ocr_text')
+    print(f'{"服务卡死时单次调用":<24} 返回: {result!r}  耗时: {time.perf_counter() - start:.2f}s '
+          f'(读取超时{client.read_timeout:g}s x {client.max_retries + 1}次 + 重试间隔)')
+
+    server.mode = 'error'
+    samples = []
+    for _ in range(6):
+        start = time.perf_counter()
+        client.generate('ocr', prompt_type='ocr_text')
+        samples.append(time.perf_counter() - start)
+    print(f'{"服务报错时连续调用":<24} 耗时: {", ".join(f"{s * 1000:.0f}ms" for s in samples)}  '
+          f'熔断: {client.is_open}')
+
+    stats = client.latency_stats()['ocr_text']
+    print(f'{"耗时统计(ocr_text)":<24} 成功: {stats["count"]}  失败: {stats["failures"]}  '
+          f'p50: {stats["p50"] * 1000:.2f}ms  p95: {stats["p95"] * 1000:.2f}ms')
+    client.close()
+    server.shutdown()
+
+
+def bench_ocr_cache(repeat: int = 3, latency: float = 1.0):
+    """
+    OCR结果缓存的效果
+
+    模拟Ollama每次耗时latency秒，对tests/中几张截图的同一区域各识别repeat次；
+    再用新的缓存对象打开同一个磁盘缓存文件，模拟重启后的首次识别
+    """
+    server = FakeOllama(latency)
+    vlm_client.url = server.url
+    x1, y1, x2, y2 = DIGIT_REGION
+    images = [np.array(Image.open(f'tests/{name}.png')) for name in DIGIT_SAMPLES]
+    path = f'{tempfile.mkdtemp()}/ocr_cache.db'
+
+    cache = OCRCache(path=path)
+    processor = OCRProcessor(cache=cache)
+    misses, hits = [], []
+    for image in images:
+        for i in range(repeat):
+            start = time.perf_counter()
+            processor.extract_text(image, region=(x1, y1, x2, y2))
+            (hits if i else misses).append(time.perf_counter() - start)
+    print_latency('未命中(调用VLM)', misses)
+    print_latency('内存命中', hits)
+
+    processor = OCRProcessor(cache=OCRCache(path=path))
+    samples = []
+    for image in images:
+        start = time.perf_counter()
+        processor.extract_text(image, region=(x1, y1, x2, y2))
+        samples.append(time.perf_counter() - start)
+    print_latency('重启后磁盘命中', samples)
+    print(f'{"":<24} 首轮缓存统计: {cache.stats()}  重启后: {processor.cache.stats()}')
+    server.shutdown()
+
+
+def bench_ocr_regions(latency: float = 1.0):
+    """
+    多区域批量识别与逐个识别对比
+
+    模拟Ollama每次请求耗时latency秒，对tests/中的截图各识别三个区域
+    """
+    server = FakeOllama(latency)
+    vlm_client.url = server.url
+
+    def reply(payload):
+        count = len(re.findall(r'"\d+"', payload['prompt']))
+        if count == 0:
+            return '01:25:56'
+        return json.dumps({str(i): '01:25:56' for i in range(1, count + 1)})
+    server.reply = reply
+
+    x1, y1, x2, y2 = DIGIT_REGION
+    regions = {'timer': DIGIT_REGION, 'left': (x1 - 150, y1, x1, y2), 'below': (x1, y2, x2, y2 + 40)}
+    images = [np.array(Image.open(f'tests/{name}.png')) for name in list(DIGIT_SAMPLES)[:5]]
+
+    processor = OCRProcessor(cache=OCRCache(size=0))
+    samples = []
+    for image in images:
+        start = time.perf_counter()
+        for region in regions.values():
+            processor.extract_text(image, region=region)
+        samples.append(time.perf_counter() - start)
+    print_latency(f'逐个识别({len(regions)}个区域)', samples)
+
+    samples = []
+    for image in images:
+        start = time.perf_counter()
+        results = processor.extract_regions(image, regions)
+        samples.append(time.perf_counter() - start)
+    print_latency(f'批量识别({len(regions)}个区域)', samples)
+    print(f'{"":<24} 结果: {results}  '
+          f'拼接图: {processor.compose_regions([image[b:d, a:c] for a, b, c, d in regions.values()]).shape}')
+    server.shutdown()
+
+
+# encoding子命令比较的编码方式
+ENCODINGS = [
+    VLMEncoding(),
+    VLMEncoding(grayscale=True),
+    VLMEncoding(grayscale=True, text_height=20),
+    VLMEncoding(grayscale=True, text_height=20, format='JPEG', quality=85),
+    VLMEncoding(grayscale=True, text_height=20, format='WEBP', quality=80),
+    VLMEncoding(grayscale=True, text_height=14, format='JPEG', quality=70),
+    VLMEncoding(format='JPEG', quality=85),
+]
+
+
+def bench_encoding(url: str = None):
+    """
+    VLM图像编码方式的请求大小、耗时和识别准确率
+
+    对DIGIT_SAMPLES中的整屏截图和计时区域按各种方式编码。未指定url时用本地模拟Ollama测端到端耗时，
+    准确率用本地数字识别(随代码提供的模板库，取自无损截图)读取解码后的计时区域近似，只看文字是否正确；指定url时请求真实的Ollama，
+    以模型输出中是否包含正确的计时文字为准
+    """
+    server = None
+    if url is None:
+        server = FakeOllama()
+        url = server.url
+    client = VLMClient(url=url, max_retries=0)
+    x1, y1, x2, y2 = DIGIT_REGION
+    frames = {name: np.array(Image.open(f'tests/{name}.png')) for name in DIGIT_SAMPLES}
+
+    reader = DigitReader()
+
+    print(f'{"编码方式":<28}{"区域":<6}{"平均字节":>10}{"编码耗时":>10}{"端到端耗时":>12}{"准确率":>8}')
+    for encoding in ENCODINGS:
+        for target in ('整屏', '计时'):
+            sizes, encode_times, total_times, correct = [], [], [], 0
+            for name, text in DIGIT_SAMPLES.items():
+                image = frames[name] if target == '整屏' else frames[name][y1:y2, x1:x2]
+                start = time.perf_counter()
+                data = base64.b64encode(encoding.encode(image)).decode('utf-8')
+                encode_times.append(time.perf_counter() - start)
+                sizes.append(len(data))
+                response = client.generate(OCRProcessor.QWEN3_PROMPT, [data], prompt_type=str(encoding))
+                total_times.append(time.perf_counter() - start)
+
+                if server is None:
+                    correct += text in re.sub(r'\s+', '', response)
+                elif target == '计时':
+                    decoded = np.array(Image.open(io.BytesIO(base64.b64decode(data))))
+                    correct += reader.read(decoded, 'time').text == text
+            accuracy = f'{correct / len(DIGIT_SAMPLES):.0%}' if server is None or target == '计时' else '-'
+            print(f'{str(encoding):<28}{target:<6}{np.mean(sizes):>10.0f}'
+                  f'{np.mean(encode_times) * 1000:>8.1f}ms{np.mean(total_times) * 1000:>10.1f}ms{accuracy:>8}')
+    client.close()
+    if server is not None:
+        server.shutdown()
+
+
+def load_test_screenshots(step: int = 1) -> list:
+    """读取tests/中的截图，每step张取一张"""
+    paths = sorted(glob.glob('tests/*.png'))[::step]
+    return [np.array(Image.open(path)) for path in paths]
+
+
+def bench_pyramid(levels: list, step: int = 4, tolerance: int = 2, threshold: float = 0.8):
+    """
+    在tests/截图上比较金字塔匹配与全分辨率穷举匹配的结果和耗时
+
+    每张截图每种方式都新建Frame，灰度图和金字塔的计算计入耗时；
+    每次匹配前清除模板学到的搜索区域，只比较匹配本身
+    """
+    screenshots = load_test_screenshots(step)
+    templates = [template_registry.get(path) for path in MATCH_TEMPLATES]
+    print(f'截图: {len(screenshots)}张  模板: {len(templates)}个')
+
+    def run(level):
+        results, samples = [], []
+        for seq, image in enumerate(screenshots):
+            frame = Frame(image, seq)
+            start = time.perf_counter()
+            for template in templates:
+                template.clear_matches()
+                results.append(ImageMatcher.find_template(frame, template, threshold, pyramid_level=level))
+            samples.append(time.perf_counter() - start)
+        return results, samples
+
+    baseline, samples = run(0)
+    print_latency('穷举匹配(每帧)', samples)
+    for level in levels:
+        results, samples = run(level)
+        print_latency(f'金字塔1/{1 << level}(每帧)', samples)
+        same = missed = extra = 0
+        max_offset = 0
+        for expected, actual in zip(baseline, results):
+            if expected is None or actual is None:
+                same += expected is None and actual is None
+                missed += expected is not None and actual is None
+                extra += expected is None and actual is not None
+                continue
+            offset = max(abs(expected[0] - actual[0]), abs(expected[1] - actual[1]))
+            max_offset = max(max_offset, offset)
+            same += offset <= tolerance
+        print(f'{"":<24} 一致: {same}/{len(baseline)}  漏检: {missed}  多检: {extra}  最大偏差: {max_offset}px')
+
+
+def bench_scale_cache(step: int = 8, threshold: float = 0.8):
+    """
+    在tests/截图上比较缩放匹配每次完整扫描尺度与优先尝试上次成功尺度两种方式，
+    并输出各模板的尺度缓存命中率
+    """
+    screenshots = load_test_screenshots(step)
+    templates = [template_registry.get(path) for path in MATCH_TEMPLATES]
+    print(f'截图: {len(screenshots)}张  模板: {len(templates)}个')
+
+    def run(learn):
+        results, samples = [], []
+        for template in templates:
+            template.last_scale = None
+            template.scale_hits = template.scale_lookups = 0
+        for seq, image in enumerate(screenshots):
+            frame = Frame(image, seq)
+            start = time.perf_counter()
+            for template in templates:
+                template.clear_matches()
+                if not learn:
+                    template.last_scale = None
+                results.append(ImageMatcher.find_template(frame, template, threshold, scale_match=True))
+            samples.append(time.perf_counter() - start)
+        return results, samples
+
+    baseline, samples = run(learn=False)
+    print_latency('完整尺度扫描(每帧)', samples)
+    results, samples = run(learn=True)
+    print_latency('尺度缓存(每帧)', samples)
+    print(f'{"":<24} 结果一致: {sum(a == b for a, b in zip(baseline, results))}/{len(baseline)}')
+    for path, stats in template_registry.scale_cache_stats().items():
+        print(f'{path:<40} 尺度: {stats["scale"]:.3f}  命中: {stats["hits"]}/{stats["lookups"]}  '
+              f'命中率: {stats["hit_rate"]:.0%}')
+
+
+# tests/截图中出现的界面，用于界面识别基准
+BENCH_SCREENS = {
+    'world': ['templates/world_search.png', 'templates/intelligence_btn.png'],
+    'town': ['templates/orders.png'],
+    'sidebar': ['templates/sidebar_close.png'],
+    'arena': ['templates/refresh_arena.png', 'templates/close_popup2.png'],
+    'arena_result': ['templates/arena_win.png', 'templates/arena_battle_record.png'],
+    'logged_out': ['templates/reconnect.png'],
+}
+
+
+def bench_detect_screen(step: int = 2, threshold: float = 0.8):
+    """
+    比较界面识别与逐个模板全屏匹配两种方式的单次耗时和结果
+
+    界面识别先跑一遍学习锚点位置，再统计第二遍的耗时
+    """
+    screenshots = load_test_screenshots(step)
+    print(f'截图: {len(screenshots)}张  界面: {len(BENCH_SCREENS)}个')
+
+    # 逐个模板全屏匹配，相当于每个界面调用一次multiple_images_pos
+    templates = {name: [np.asarray(template_registry.get(path)) for path in paths]
+                 for name, paths in BENCH_SCREENS.items()}
+    baseline, samples = [], []
+    for seq, image in enumerate(screenshots):
+        frame = Frame(image, seq)
+        start = time.perf_counter()
+        matched = {name: all(ImageMatcher.find_template(frame, template, threshold) for template in anchors)
+                   for name, anchors in templates.items()}
+        baseline.append(next((name for name, ok in matched.items() if ok), None))
+        samples.append(time.perf_counter() - start)
+    print_latency('逐个模板全屏匹配', samples)
+
+    classifier = ScreenClassifier(BENCH_SCREENS, threshold)
+    for label in ('界面识别(首次)', '界面识别'):
+        results, samples = [], []
+        for seq, image in enumerate(screenshots):
+            frame = Frame(image, seq)
+            start = time.perf_counter()
+            results.append(classifier.classify(frame))
+            samples.append(time.perf_counter() - start)
+        print_latency(label, samples)
+    same = sum(a == b for a, b in zip(baseline, results))
+    print(f'{"":<24} 结果一致: {same}/{len(baseline)}  识别到界面: {sum(r is not None for r in results)}')
+
+
+# tests/中带倒计时的截图及其文字，区域为倒计时所在位置
+DIGIT_REGION = (236, 262, 390, 302)
+DIGIT_SAMPLES = {
+    671: '01:25:56', 672: '01:25:56', 673: '01:25:55', 674: '01:25:55', 675: '01:25:54',
+    676: '01:25:53', 677: '01:25:53', 678: '01:25:52', 679: '01:25:51', 680: '01:25:51',
+}
+# 同一区域没有数字的截图
+DIGIT_NEGATIVES = [668, 669, 670, 681, 682, 683]
+# 不在模板库取样截图(653、672、675、676)中的数字: (截图, 区域, 格式, 文字)
+ARENA_TIMER_REGION = (605, 1690, 790, 1740)
+DIGIT_HELD_OUT = [
+    *[(name, DIGIT_REGION, 'time', DIGIT_SAMPLES[name]) for name in (671, 673, 674, 677, 678, 679, 680)],
+    (654, ARENA_TIMER_REGION, 'time', '00:36:07'), (655, ARENA_TIMER_REGION, 'time', '00:36:06'),
+    (656, ARENA_TIMER_REGION, 'time', '00:36:05'), (658, ARENA_TIMER_REGION, 'time', '00:36:04'),
+    (660, ARENA_TIMER_REGION, 'time', '00:36:03'), (661, ARENA_TIMER_REGION, 'time', '00:36:02'),
+    (663, ARENA_TIMER_REGION, 'time', '00:36:01'),
+    (628, (575, 320, 778, 365), 'number', '17,103,787'),
+    (628, (276, 520, 352, 560), 'number', '209'), (628, (276, 1108, 352, 1148), 'number', '213'),
+    (628, (276, 1304, 352, 1344), 'number', '207'),
+]
+
+
+def bench_digits(min_confidence: float = 0.85):
+    """
+    本地数字识别的准确率、置信度和耗时
+
+    使用随代码提供的模板库，只识别不在模板库取样截图中的样本(包含7、8、9)；
+    结果分为本地采用(正确/错误)和回退到VLM，错误却被采用的结果最危险。
+    没有数字的截图应得到低置信度，从而回退到VLM
+    """
+    reader = DigitReader()
+    print(f'模板样本: {len(reader)}个')
+
+    samples, accepted, wrong, correct_text, confidences = [], 0, 0, 0, []
+    for name, (x1, y1, x2, y2), fmt, text in DIGIT_HELD_OUT:
+        image = np.array(Image.open(f'tests/{name}.png'))[y1:y2, x1:x2]
+        start = time.perf_counter()
+        reading = reader.read(image, fmt)
+        samples.append(time.perf_counter() - start)
+        correct_text += reading.text == text
+        if reading.confidence >= min_confidence:
+            accepted += reading.text == text
+            wrong += reading.text != text
+        confidences.append(reading.confidence)
+    print_latency('本地数字识别', samples)
+    print(f'{"":<24} 文字正确: {correct_text}/{len(DIGIT_HELD_OUT)}  本地采用且正确: {accepted}  '
+          f'本地采用但错误: {wrong}  最低置信度: {min(confidences):.3f}')
+
+    x1, y1, x2, y2 = DIGIT_REGION
+    fallback = sum(reader.read(np.array(Image.open(f'tests/{name}.png'))[y1:y2, x1:x2], 'time').confidence
+                   < min_confidence for name in DIGIT_NEGATIVES)
+    print(f'{"":<24} 无数字截图回退到VLM: {fallback}/{len(DIGIT_NEGATIVES)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='性能基准测试')
+    parser.add_argument('--mmm-path', default=r'C:\Program Files\Netease\MuMu\nx_main\MuMuManager.exe',
+                        help='MuMuManager.exe路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sub = subparsers.add_parser('input', help='输入命令延迟')
+    sub.add_argument('deviceid', type=int, help='Mumu模拟器的编号')
+    sub.add_argument('--count', type=int, default=50)
+
+    sub = subparsers.add_parser('adbd', help='本地模拟adbd验证socket直连')
+    sub.add_argument('--count', type=int, default=200)
+
+    sub = subparsers.add_parser('async', help='单事件循环并发驱动多个本地模拟adbd')
+    sub.add_argument('--devices', type=int, default=10)
+    sub.add_argument('--count', type=int, default=20, help='每台设备的轮数')
+    sub.add_argument('--latency', type=float, default=0.05, help='模拟的设备命令耗时(秒)')
+
+    sub = subparsers.add_parser('vlm', help='本地模拟Ollama验证VLM客户端')
+    sub.add_argument('--count', type=int, default=100)
+
+    sub = subparsers.add_parser('ocr-cache', help='OCR结果缓存')
+    sub.add_argument('--repeat', type=int, default=3, help='同一区域识别的次数')
+    sub.add_argument('--latency', type=float, default=1.0, help='模拟的VLM耗时(秒)')
+
+    sub = subparsers.add_parser('ocr-regions', help='多区域批量OCR')
+    sub.add_argument('--latency', type=float, default=1.0, help='模拟的VLM耗时(秒)')
+
+    sub = subparsers.add_parser('encoding', help='VLM图像编码方式对比')
+    sub.add_argument('--url', help='真实Ollama的generate接口地址，不指定时使用本地模拟')
+
+    sub = subparsers.add_parser('digits', help='本地数字识别')
+
+    sub = subparsers.add_parser('pyramid', help='金字塔匹配与穷举匹配对比')
+    sub.add_argument('--levels', type=int, nargs='+', default=[1, 2])
+    sub.add_argument('--step', type=int, default=4, help='每隔几张截图取一张')
+
+    sub = subparsers.add_parser('scale', help='缩放匹配的尺度缓存')
+    sub.add_argument('--step', type=int, default=8, help='每隔几张截图取一张')
+
+    sub = subparsers.add_parser('screen', help='界面识别耗时')
+    sub.add_argument('--step', type=int, default=2, help='每隔几张截图取一张')
+
+    args = parser.parse_args()
+    if args.command == 'input':
+        bench_input_latency(args.deviceid, args.mmm_path, args.count)
+    elif args.command == 'adbd':
+        bench_fake_adbd(args.count)
+    elif args.command == 'async':
+        bench_async_devices(args.devices, args.count, args.latency)
+    elif args.command == 'vlm':
+        bench_vlm_client(args.count)
+    elif args.command == 'ocr-cache':
+        bench_ocr_cache(args.repeat, args.latency)
+    elif args.command == 'ocr-regions':
+        bench_ocr_regions(args.latency)
+    elif args.command == 'encoding':
+        bench_encoding(args.url)
+    elif args.command == 'digits':
+        bench_digits()
+    elif args.command == 'pyramid':
+        bench_pyramid(args.levels, args.step)
+    elif args.command == 'scale':
+        bench_scale_cache(args.step)
+    elif args.command == 'screen':
+        bench_detect_screen(args.step)
+
+
+if __name__ == '__main__':
+    main()
@@ -60,8 +60,7 @@ class IntelligenceDeal:
 
         if i_type == 1 or i_type == 0:
             # 判断当前是否有队列
-            value = self.automator.get_screen_text((200, 281, 364, 351), preprocess=False,
-                                                   numbers=True, with_qwen3=True)
+            value = self.automator.read_digits((200, 281, 364, 351), 'fraction')
             if len(value) == 2:
                 current, max_queue = value
                 if current > max_queue:
@@ -87,8 +86,7 @@ class IntelligenceDeal:
                 if pos:
                     x, y = pos
                     current_time = time.time()
-                    time_left = self.automator.get_screen_text((100, y + 10, 300, y + 45),
-                                                               preprocess=False, numbers=True, with_qwen3=True)
+                    time_left = self.automator.read_digits((100, y + 10, 300, y + 45), 'time')
                     wait_h, wait_m, wait_s = time_left
                     wait_time = current_time + (wait_m * 60 + wait_s) * 2 + 5
             else:
@@ -114,8 +112,7 @@ class IntelligenceDeal:
     def process_intelligence(self, should_break):
         self.automator.wait_and_click('templates/intelligence_btn.png', threshold=0.99)
 
-        strength = self.automator.get_screen_text((900, 30, 1000, 90), preprocess=False,
-                                                  numbers=True, with_qwen3=True)
+        strength = self.automator.read_digits((900, 30, 1000, 90), 'number')
 
         if strength:
             strength = strength[0]
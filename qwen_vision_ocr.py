@@ -1,11 +1,12 @@
 import json
 import re
 import base64
-import requests
 from io import BytesIO
 from PIL import Image
 from typing import Dict, Any
 
+from VLMClient import vlm_client
+
 
 def recognize_text_in_image(image_path: str, api_key: str) -> Dict[str, Any]:
     # Read the image file
@@ -52,31 +53,14 @@ def recognize_text_in_image(image_path: str, api_key: str) -> Dict[str, Any]:
     3. 不要解释、不要推理、不要思考
     4. 文字之间用换行分隔"""
 
-    payload = {
-        "model": "qwen3-vl",
-        "prompt": prompt,
-        "images": [image_base64],
-        "stream": False,
-        "options": {
-            "temperature": 0.1,  # 降低随机性，更确定性
-            "num_predict": 1000  # 停止词
-        }
+    options = {
+        "temperature": 0.1,  # 降低随机性，更确定性
+        "num_predict": 1000  # 停止词
     }
 
     # Make the API request
-    response = requests.post(
-        # "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
-        "http://localhost:11434/api/generate",
-        headers=headers,
-        json=payload
-    )
-
-    # Parse the response
-    if response.status_code == 200:
-        result = response.json()
-        return result['response']
-    else:
-        return
+    # "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
+    return vlm_client.generate(prompt, [image_base64], options=options, prompt_type='ocr_file', headers=headers)
 
 
 def format_arena(text: str):
@@ -163,32 +147,12 @@ def extra_text_qwen3(image):
     3. 不要解释、不要推理、不要思考
     4. 文字之间用换行分隔"""
 
-    payload = {
-        "model": "qwen3-vl",
-        "prompt": prompt,
-        "images": [image_base64],
-        "stream": False,
-        "options": {
-            "temperature": 0.1,  # 降低随机性，更确定性
-            "num_predict": 1000  # 停止词
-        }
+    options = {
+        "temperature": 0.1,  # 降低随机性，更确定性
+        "num_predict": 1000  # 停止词
     }
-    result = ''
-    for _ in range(3):
-        # Make the API request
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json=payload
-        )
-
-        # Parse the response
-        if response.status_code == 200:
-            result = response.json()
-            result = result['response']
-            if result != '':
-                break
-
-    return result
+    # 模型偶尔返回空文本，空结果也重试
+    return vlm_client.generate(prompt, [image_base64], options=options, prompt_type='ocr_lines', retry_empty=True)
 
 
 
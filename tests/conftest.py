@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# 模块按仓库根目录的相对路径读取templates/和tests/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+# 测试中学习的数据不写入本机用户目录
+os.environ['WJDR_DATA_DIR'] = tempfile.mkdtemp(prefix='wjdr-test-')
@@ -0,0 +1,154 @@
+# 测试和benchmark.py共用的本地模拟服务：模拟adbd和Ollama，不需要模拟器和模型
+import http.server
+import io
+import json
+import shlex
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ADBTransport import (pack_adb_message, read_adb_message, EXIT_MARKER, EXIT_STATUS_COMMAND,
+                          A_CNXN, A_OPEN, A_OKAY, A_CLSE, A_WRTE, A_VERSION, MAX_PAYLOAD)
+
+
+class FakeADBDaemon(socketserver.ThreadingTCPServer):
+    """本地模拟adbd，用于在没有模拟器的情况下验证socket直连传输"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, screencap_png: bytes = b'', latency: float = 0.0):
+        """
+        Args:
+            screencap_png: screencap返回的PNG截图
+            latency: 模拟设备上每条命令的执行耗时(秒)
+        """
+        self.screencap_png = screencap_png
+        self.latency = latency
+        self.services: List[str] = []
+        self.screencap_raw = b''
+        if screencap_png:
+            image = np.array(Image.open(io.BytesIO(screencap_png)).convert('RGBA'))
+            height, width = image.shape[:2]
+            # 模拟Android 9+的16字节头: 宽、高、像素格式(RGBA_8888)、色彩空间
+            self.screencap_raw = struct.pack('<4I', width, height, 1, 0) + image.tobytes()
+        super().__init__(('127.0.0.1', 0), _FakeADBHandler)
+        self.port = self.server_address[1]
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def respond(self, service: str) -> bytes:
+        self.services.append(service)
+        if self.latency:
+            time.sleep(self.latency)
+        _, _, script = service.partition(':')
+        want_status = script.endswith('; ' + EXIT_STATUS_COMMAND)
+        if want_status:
+            script = script[:-len('; ' + EXIT_STATUS_COMMAND)]
+        # 只模拟用到的几条命令，以'; '分隔的多条命令依次执行，返回码取最后一条
+        output, returncode = b'', 0
+        for command in script.split('; '):
+            result, returncode = self.run_command(shlex.split(command))
+            output += result
+        if want_status:
+            output += f'{EXIT_MARKER}{returncode}'.encode('ascii')
+        return output
+
+    def run_command(self, args: List[str]) -> Tuple[bytes, int]:
+        """模拟设备上执行一条命令，返回(输出, 返回码)"""
+        if not args:
+            return b'', 0
+        if args[0] == 'echo':
+            return ' '.join(args[1:]).encode('utf-8') + b'\n', 0
+        if args == ['screencap', '-p']:
+            return self.screencap_png, 0
+        if args == ['screencap']:
+            return self.screencap_raw, 0
+        if args[0] in ('input', 'sleep', 'true'):
+            return b'', 0
+        if args[0] == 'false':
+            return b'', 1
+        return f'/system/bin/sh: {args[0]}: not found\n'.encode('utf-8'), 127
+
+
+class _FakeADBHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        remote_id = 0
+        try:
+            while True:
+                command, arg0, arg1, data = read_adb_message(sock)
+                if command == A_CNXN:
+                    sock.sendall(pack_adb_message(A_CNXN, A_VERSION, MAX_PAYLOAD, b'device::fake\0'))
+                elif command == A_OPEN:
+                    remote_id += 1
+                    local_id = arg0
+                    output = self.server.respond(data.rstrip(b'\0').decode('utf-8'))
+                    sock.sendall(pack_adb_message(A_OKAY, remote_id, local_id))
+                    for i in range(0, len(output), MAX_PAYLOAD):
+                        sock.sendall(pack_adb_message(A_WRTE, remote_id, local_id, output[i:i + MAX_PAYLOAD],
+                                                       checksum=False))
+                        read_adb_message(sock)
+                    sock.sendall(pack_adb_message(A_CLSE, remote_id, local_id))
+                    read_adb_message(sock)
+        except ConnectionError:
+            pass
+
+
+class FakeOllama(http.server.ThreadingHTTPServer):
+    """本地模拟Ollama的generate接口，可模拟耗时、卡死和服务端错误"""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        # 'ok': 正常返回, 'hang': 不返回, 'error': 返回error_status
+        self.mode = 'ok'
+        self.error_status = 500
+        # 之后的前几次请求按'error'处理，用于模拟偶发错误
+        self.fail_next = 0
+        # 根据请求内容生成模型输出
+        self.reply = lambda payload: '01:25:56'
+        # 收到的请求
+        self.payloads = []
+        super().__init__(('127.0.0.1', 0), _FakeOllamaHandler)
+        self.url = f'http://127.0.0.1:{self.server_address[1]}/api/generate'
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class _FakeOllamaHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # 与Ollama一致关闭Nagle，否则长连接上响应头和响应体分两次发送会被延迟确认拖慢
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        self.server.payloads.append(payload)
+        if self.server.mode == 'hang':
+            time.sleep(3600)
+        time.sleep(self.server.latency)
+        error = self.server.mode == 'error'
+        if self.server.fail_next > 0:
+            self.server.fail_next -= 1
+            error = True
+        if error:
+            body, status = b'{}', self.server.error_status
+        else:
+            body, status = json.dumps({'response': self.server.reply(payload)}).encode('utf-8'), 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,172 @@
+import asyncio
+import shlex
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ADBTransport import (ADBShellSession, ADBSocketTransport, AsyncADBSocketTransport,
+                          EXIT_MARKER, split_exit_status)
+from AsyncMumuManager import AsyncADBController
+from MumuManager import ADBController
+from tests.fakes import FakeADBDaemon
+
+PNG_PATH = 'tests/301.png'
+
+
+@pytest.fixture
+def png():
+    with open(PNG_PATH, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def server(png):
+    server = FakeADBDaemon(screencap_png=png)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_shell_and_exec_out(server, png):
+    # 握手(CNXN)后每条命令一个流：OPEN → OKAY → WRTE... → CLSE
+    transport = ADBSocketTransport('127.0.0.1', server.port)
+    transport.connect()
+    assert transport.shell('echo hello') == b'hello\n'
+    # 超过MAX_PAYLOAD的输出分多个WRTE发送
+    assert transport.exec_out('screencap -p') == png
+    raw_image = ADBController._parse_raw_screenshot(transport.exec_out('screencap'))
+    assert np.array_equal(raw_image, np.array(Image.open(PNG_PATH).convert('RGBA')))
+    transport.close()
+
+
+def test_connection_reused(server):
+    transport = ADBSocketTransport('127.0.0.1', server.port)
+    transport.connect()
+    for _ in range(3):
+        transport.shell('echo hi')
+    assert len(transport._idle) == 1
+    transport.close()
+
+
+def test_run_status(server):
+    transport = ADBSocketTransport('127.0.0.1', server.port)
+    assert transport.run_status('shell', 'echo ok') == (0, b'ok\n')
+    assert transport.run_status('shell', 'false')[0] == 1
+    assert transport.run_status('shell', 'no_such_command')[0] == 127
+    transport.close()
+
+
+def test_split_exit_status():
+    assert split_exit_status(bytearray(b'out\n' + EXIT_MARKER.encode() + b'3')) == (3, b'out\n')
+    # 命令被中断时没有返回码
+    assert split_exit_status(bytearray(b'out\n')) == (-1, b'out\n')
+
+
+def test_backoff_after_failed_connect(server):
+    port = server.port
+    server.shutdown()
+    server.server_close()
+    transport = ADBSocketTransport('127.0.0.1', port, timeout=1, retry_interval=60)
+    assert transport.available
+    with pytest.raises(OSError):
+        transport.connect()
+    assert not transport.available
+    # 等待期内不再尝试连接
+    with pytest.raises(ConnectionError, match='暂不可用'):
+        transport.shell('echo hi')
+
+    # 等待期过后重新尝试连接
+    transport._down_until = 0.0
+    assert transport.available
+    with pytest.raises(ConnectionRefusedError):
+        transport.shell('echo hi')
+    assert not transport.available
+
+
+def test_async_transport(server, png):
+    async def run():
+        transport = AsyncADBSocketTransport('127.0.0.1', server.port)
+        await transport.connect()
+        assert await transport.shell('echo hello') == b'hello\n'
+        assert await transport.exec_out('screencap -p') == png
+        assert (await transport.run_status('shell', 'false'))[0] == 1
+        transport.close()
+
+    asyncio.run(run())
+
+
+def test_async_controller_quotes_and_checks_status(server):
+    async def run():
+        adb = AsyncADBController(0)
+        adb.transport = AsyncADBSocketTransport('127.0.0.1', server.port)
+        # 含空格的参数作为一个参数传给设备
+        assert await adb.run_adb(['shell', 'echo', 'a  b']) == b'a  b\n'
+        assert server.services[-1].startswith('shell:echo ' + shlex.quote('a  b') + ';')
+        # 命令失败时抛出异常，不再经MuMuManager重复执行
+        with pytest.raises(Exception, match='返回码: 1'):
+            await adb.run_adb(['shell', 'false'])
+        assert await adb._run_input(['input', 'tap', '1', '2'])
+        assert not await adb._run_input('false')
+        # 原始帧缓冲直接引用接收缓冲区，不复制
+        output = await adb.run_adb(['exec-out', 'screencap'])
+        assert isinstance(output, bytearray)
+        assert np.shares_memory(ADBController._parse_raw_screenshot(output), np.frombuffer(output, np.uint8))
+        adb.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='需要sh')
+def test_shell_session_completion_marker():
+    session = ADBShellSession(['sh'])
+    session.start()
+    try:
+        assert session.run('echo hello') == (0, 'hello')
+        # 输出中没有换行结尾时完成标记仍能被识别
+        assert session.run('printf abc') == (0, 'abc')
+        assert session.run('false')[0] == 1
+        assert session.run_args(['echo', 'a  b']) == (0, 'a  b')
+        with pytest.raises(TimeoutError):
+            session.run('sleep 5', timeout=0.2)
+        assert not session.is_alive()
+    finally:
+        session.close()
+
+
+def test_input_batch_on_async_controller(server):
+    async def run():
+        adb = AsyncADBController(0)
+        adb.transport = AsyncADBSocketTransport('127.0.0.1', server.port)
+        batch = adb.input_batch().tap(10, 20, random_range=0).key(4)
+        # 同步的send会得到一个未等待的协程，直接报错
+        with pytest.raises(TypeError, match='asend'):
+            batch.send()
+        assert await batch.asend()
+        assert server.services[-1].startswith('shell:input tap 10 20; input keyevent 4;')
+        assert len(batch) == 0
+        adb.close()
+
+    asyncio.run(run())
+
+
+def test_async_back_uses_go_back(server):
+    async def run():
+        adb = AsyncADBController(0)
+        adb.transport = AsyncADBSocketTransport('127.0.0.1', server.port)
+        commands = []
+
+        async def fake_exec(cmd, timeout=None):
+            commands.append(cmd)
+            return 0, b''
+
+        adb._exec = fake_exec
+        await adb.back()
+        # 与同步的ADBController.back相同，不走设备上的input keyevent 4
+        assert commands == [adb._get_adb_command(['go_back'])]
+        assert not any(service.startswith('shell:input') for service in server.services)
+        assert adb.last_input_time > 0
+        adb.close()
+
+    asyncio.run(run())
@@ -0,0 +1,66 @@
+import subprocess
+import sys
+import threading
+import time
+
+from BootOrchestrator import BootOrchestrator, get_boot_orchestrator
+
+
+class FakeOrchestrator(BootOrchestrator):
+    """启动命令换成立即退出的子进程，实例在启动后boot_time秒就绪"""
+
+    def __init__(self, device_count: int, boot_time: float, **kwargs):
+        super().__init__('fake-mmm', poll_interval=0.01, **kwargs)
+        self.boot_time = boot_time
+        self.launch_times = {}
+        self.processes = []
+        self.max_booting = 0
+        self.registry = self
+        self.device_count = device_count
+
+    def snapshot(self, max_age=None):
+        now = time.monotonic()
+        return {device_id: {'state': device_id in self.launch_times and
+                            now - self.launch_times[device_id] >= self.boot_time}
+                for device_id in range(self.device_count)}
+
+    def _launch(self, device_id):
+        self.launch_times[device_id] = time.monotonic()
+        self.max_booting = max(self.max_booting, len(self._booting) + 1)
+        process = subprocess.Popen([sys.executable, '-c', 'pass'], stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, text=True)
+        self.processes.append(process)
+        return process
+
+
+def test_limits_apply_across_callers():
+    orchestrator = FakeOrchestrator(4, boot_time=0.1, max_concurrent=2, stagger=0.05)
+    results = {}
+
+    def boot(device_id):
+        results.update(orchestrator.boot([device_id]))
+
+    # 各控制器在自己的线程中分别启动自己的实例
+    threads = [threading.Thread(target=boot, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert all(result.ready for result in results.values())
+    assert orchestrator.max_booting <= 2
+    launches = sorted(orchestrator.launch_times.values())
+    # 记录时间比启动器判断间隔时稍晚，留一点误差
+    assert all(b - a >= 0.045 for a, b in zip(launches, launches[1:]))
+    assert not orchestrator._booting
+    # 启动命令进程都已回收，仍在运行的由后台线程等待退出
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not all(process.returncode is not None and process.stderr.closed
+                                                  for process in orchestrator.processes):
+        time.sleep(0.05)
+    assert all(process.returncode is not None and process.stderr.closed for process in orchestrator.processes)
+
+
+def test_shared_per_path():
+    assert get_boot_orchestrator('a.exe') is get_boot_orchestrator('a.exe')
+    assert get_boot_orchestrator('a.exe') is not get_boot_orchestrator('b.exe')
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from DeviceRegistry import DeviceRegistry
+
+
+class FakeRegistry(DeviceRegistry):
+    """查询不启动MuMuManager，可以卡在查询中途，记录查询次数"""
+
+    def __init__(self, **kwargs):
+        super().__init__('fake-mmm', **kwargs)
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.error = None
+
+    def _query(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {0: {'id': 0, 'name': 'MuMu', 'state': True}}
+
+
+def test_concurrent_refreshes_share_one_query():
+    registry = FakeRegistry()
+    registry.release.clear()
+    results = []
+
+    def refresh():
+        results.append(registry.refresh())
+
+    threads = [threading.Thread(target=refresh) for _ in range(8)]
+    threads[0].start()
+    assert registry.started.wait(5)
+    # 第一个查询进行中到达的刷新请求都等待它的结果
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.2)
+    registry.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert registry.calls == 1 and registry.query_count == 1
+    assert len(results) == 8 and all(result == results[0] for result in results)
+    # 每个调用方拿到各自的副本
+    results[0][0]['state'] = False
+    assert results[1][0]['state'] is True
+
+
+def test_snapshot_reads_cache_until_max_age():
+    registry = FakeRegistry(refresh_interval=60)
+    registry.snapshot()
+    registry.snapshot()
+    assert registry.calls == 1
+    registry.snapshot(max_age=0)
+    assert registry.calls == 2
+
+
+def test_failed_query_raised_to_every_waiter_and_retried():
+    registry = FakeRegistry()
+    registry.release.clear()
+    registry.error = RuntimeError('MuMuManager无响应')
+    errors = []
+
+    def refresh():
+        try:
+            registry.refresh()
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=refresh) for _ in range(3)]
+    threads[0].start()
+    assert registry.started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.2)
+    registry.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 3 and registry.calls == 1
+
+    # 失败不留下进行中的查询，下次刷新重新查询
+    registry.error = None
+    assert registry.refresh()[0]['name'] == 'MuMu'
+    assert registry.calls == 2
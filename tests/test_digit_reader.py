@@ -0,0 +1,95 @@
+import glob
+import os
+import shutil
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from DigitReader import DigitReader
+from TemplateRegistry import TemplateRegistry
+
+MIN_CONFIDENCE = 0.85
+TIMER_REGION = (236, 262, 390, 302)
+ARENA_TIMER_REGION = (605, 1690, 790, 1740)
+
+# 不在模板库取样截图(653、672、675、676)中的样本: (截图, 区域, 格式, 文字)
+HELD_OUT = [
+    (671, TIMER_REGION, 'time', '01:25:56'), (673, TIMER_REGION, 'time', '01:25:55'),
+    (674, TIMER_REGION, 'time', '01:25:55'), (677, TIMER_REGION, 'time', '01:25:53'),
+    (678, TIMER_REGION, 'time', '01:25:52'), (679, TIMER_REGION, 'time', '01:25:51'),
+    (680, TIMER_REGION, 'time', '01:25:51'),
+    (654, ARENA_TIMER_REGION, 'time', '00:36:07'), (655, ARENA_TIMER_REGION, 'time', '00:36:06'),
+    (656, ARENA_TIMER_REGION, 'time', '00:36:05'), (658, ARENA_TIMER_REGION, 'time', '00:36:04'),
+    (660, ARENA_TIMER_REGION, 'time', '00:36:03'), (661, ARENA_TIMER_REGION, 'time', '00:36:02'),
+    (663, ARENA_TIMER_REGION, 'time', '00:36:01'),
+    (628, (575, 320, 778, 365), 'number', '17,103,787'),
+    (628, (276, 520, 352, 560), 'number', '209'),
+    (628, (276, 1108, 352, 1148), 'number', '213'),
+    (628, (276, 1304, 352, 1344), 'number', '207'),
+]
+# 计时区域没有数字的截图
+NEGATIVES = [668, 669, 670, 681, 682, 683]
+
+
+def crop(name, region):
+    x1, y1, x2, y2 = region
+    return np.array(Image.open(f'tests/{name}.png'))[y1:y2, x1:x2]
+
+
+@pytest.fixture(scope='module')
+def reader():
+    return DigitReader()
+
+
+def test_bank_covers_all_formats(reader):
+    for fmt in DigitReader.ALPHABETS:
+        assert reader.covers(fmt)
+
+
+@pytest.mark.parametrize('name, region, fmt, text', HELD_OUT)
+def test_held_out_samples(reader, name, region, fmt, text):
+    reading = reader.read(crop(name, region), fmt)
+    assert reading.text == text
+    if fmt == 'time':
+        assert reading.confidence >= MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize('name', NEGATIVES)
+def test_negatives_fall_back(reader, name):
+    assert reader.read(crop(name, TIMER_REGION), 'time').confidence < MIN_CONFIDENCE
+
+
+def test_missing_glyphs_give_zero_confidence(tmp_path):
+    # 只有0~6和冒号的模板库不能识别7
+    for name in ['0', '1', '2', '3', '4', '5', '6', 'colon']:
+        shutil.copytree(os.path.join('templates/digits', name), tmp_path / name)
+    reader = DigitReader(str(tmp_path))
+    assert not reader.covers('time')
+    reading = reader.read(crop(654, ARENA_TIMER_REGION), 'time')
+    assert reading.confidence == 0.0
+
+
+def test_learn_requires_independent_reads(tmp_path):
+    bank, learned = tmp_path / 'bank', tmp_path / 'learned'
+    bank.mkdir()
+    reader = DigitReader(str(bank), learned_dir=str(learned))
+
+    # 同一张图像重复学习不算确认
+    assert reader.learn(crop(671, TIMER_REGION), '01:25:56') == 0
+    assert reader.learn(crop(671, TIMER_REGION), '01:25:56') == 0
+    assert len(reader) == 0
+    # 保存第一个确认的样本时才创建目录
+    assert not learned.exists()
+
+    assert reader.learn(crop(673, TIMER_REGION), '01:25:55') > 0
+    assert glob.glob(str(learned / '*' / '*.png'))
+    assert not os.listdir(bank)
+
+
+def test_preload_skips_digit_bank():
+    registry = TemplateRegistry()
+    count = registry.preload()
+    all_templates = glob.glob('templates/**/*.png', recursive=True)
+    digit_templates = glob.glob('templates/digits/**/*.png', recursive=True)
+    assert count == len(all_templates) - len(digit_templates)
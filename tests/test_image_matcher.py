@@ -0,0 +1,193 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from ImageMatcher import ImageMatcher, MatchCache
+from ScreenCapture import Frame
+from TemplateRegistry import Template, template_registry
+
+
+def test_match_cache_keys_on_content():
+    matcher = ImageMatcher(cache=MatchCache())
+    template = template_registry.get('templates/arena_win.png')
+    image = np.array(Image.open('tests/301.png'))
+
+    frame = Frame(image)
+    assert matcher.match(frame, template) is not None
+    # 序号相同(都为0)但内容不同的帧和裁剪出的视图不能命中上一帧的结果
+    assert matcher.match(Frame(np.zeros_like(image)), template) is None
+    assert matcher.match(frame[:500], template) is None
+    assert matcher.cache.stats()['hits'] == 0
+
+    # 内容相同的新帧可以命中
+    assert matcher.match(Frame(image.copy(), seq=5), template) is not None
+    assert matcher.cache.stats()['hits'] == 1
+
+
+def test_template_keeps_ndarray_size():
+    template = template_registry.get('templates/arena_win.png')
+    height, width = template.shape[:2]
+    assert template.wh == (width, height)
+    assert template.size == np.asarray(template).size
+
+
+def test_pyramid_matches_exhaustive():
+    image = np.array(Image.open('tests/301.png'))
+    for path in ('templates/arena_win.png', 'templates/arena_battle_record.png', 'templates/reconnect.png'):
+        template = template_registry.get(path)
+        expected = ImageMatcher.find_template(Frame(image), np.asarray(template), pyramid_level=0)
+        for level in (1, 2):
+            template.clear_matches()
+            assert ImageMatcher.find_template(Frame(image), template, pyramid_level=level) == expected
+
+
+def _synthetic_screen():
+    """目标在(300, 500)，相似但较模糊的图案在(100, 100)"""
+    rng = np.random.default_rng(0)
+    pattern = cv2.GaussianBlur(rng.integers(0, 255, (40, 60), dtype=np.uint8), (5, 5), 0)
+    screen = np.full((800, 600), 128, np.uint8)
+    screen[500:540, 300:360] = pattern
+    noisy = np.clip(pattern.astype(float) + rng.normal(0, 12, pattern.shape), 0, 255).astype(np.uint8)
+    screen[100:140, 100:160] = noisy
+    return screen, Template(pattern)
+
+
+def test_roi_hit_below_margin_is_confirmed_globally():
+    screen, template = _synthetic_screen()
+    # 学习到的区域在相似图案处：区域内勉强过阈值，应改用全屏最佳位置
+    template.record_match(100, 100, 60, 40)
+    assert ImageMatcher.find_template(screen, template, 0.8, pyramid_level=0) == (330, 520)
+    # 得分足够高的区域内结果直接采用
+    template.clear_matches()
+    template.record_match(300, 500, 60, 40)
+    assert ImageMatcher.find_template(screen, template, 0.8, pyramid_level=0) == (330, 520)
+
+
+def test_learned_roi_forgets_old_matches():
+    template = Template(np.zeros((10, 10), np.uint8))
+    template.record_match(0, 0, 10, 10)
+    for _ in range(Template.ROI_HISTORY):
+        template.record_match(500, 500, 10, 10)
+    assert template.match_box == (500, 500, 510, 510)
+
+
+@pytest.mark.parametrize('threshold', [0.8, 0.95, 0.99])
+def test_confident_roi_hit_skips_full_frame(monkeypatch, threshold):
+    frame = Frame(np.array(Image.open('tests/653.png')))
+    template = template_registry.get('templates/arena_btn.png')
+    template.clear_matches()
+    expected = ImageMatcher.find_template(frame, template, threshold)
+    assert expected is not None
+
+    searched = []
+    match_template = cv2.matchTemplate
+    monkeypatch.setattr(cv2, 'matchTemplate', lambda image, *args: searched.append(image.shape) or
+                        match_template(image, *args))
+    assert ImageMatcher.find_template(frame, template, threshold) == expected
+    # 学到的区域内得分足够高时，不再搜索全屏(及其金字塔层)
+    full_frame = {frame.gray.shape, frame.pyramid(1).shape, frame.pyramid(2).shape}
+    assert searched and not full_frame & set(searched)
+    template.clear_matches()
+
+
+def test_record_match_thread_safe():
+    template = Template(np.zeros((10, 10), np.uint8))
+
+    def record(offset):
+        for i in range(2000):
+            template.record_match(offset + i % 50, offset, 10, 10)
+
+    threads = [threading.Thread(target=record, args=(offset,)) for offset in (0, 100, 200, 300)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    boxes = np.array(template.recent_matches)
+    assert template.match_box == (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+
+
+def test_suppress_overlaps_iou_cutoff():
+    # 10x10的框水平偏移5像素时交并比为50/150
+    xs, ys = np.array([0, 5]), np.array([0, 0])
+    assert list(ImageMatcher._suppress_overlaps(xs, ys, 10, 10, 0.3)) == [0]
+    assert list(ImageMatcher._suppress_overlaps(xs, ys, 10, 10, 0.34)) == [0, 1]
+    # 对角偏移5像素时交并比为25/175
+    assert list(ImageMatcher._suppress_overlaps(xs, np.array([0, 5]), 10, 10, 0.3)) == [0, 1]
+
+
+def test_suppressed_box_does_not_suppress_others():
+    # 1与0重叠被抑制；2只与被抑制的1重叠，保留
+    xs, ys = np.array([0, 4, 8, 30]), np.zeros(4, dtype=int)
+    assert list(ImageMatcher._suppress_overlaps(xs, ys, 10, 10, 0.3)) == [0, 2, 3]
+
+
+def test_find_all_templates_ordered_by_score():
+    rng = np.random.default_rng(0)
+    screenshot = rng.integers(0, 256, (200, 300), dtype=np.uint8)
+    template = screenshot[20:40, 20:40].copy()
+    # 另外两处贴上加了不同噪声的模板，得分依次降低
+    screenshot[100:120, 200:220] = np.clip(template + rng.normal(0, 20, template.shape), 0, 255)
+    screenshot[150:170, 50:70] = np.clip(template + rng.normal(0, 50, template.shape), 0, 255)
+    matches = ImageMatcher.find_all_templates(screenshot, template, threshold=0.5)
+    assert [(x, y) for x, y, _ in matches] == [(30, 30), (210, 110), (60, 160)]
+    scores = [score for _, _, score in matches]
+    assert scores == sorted(scores, reverse=True)
+
+
+
+def test_find_all_templates_suppresses_overlapping_peaks():
+    rng = np.random.default_rng(1)
+    screenshot = rng.integers(0, 256, (200, 300), dtype=np.uint8)
+    # 以6像素为周期的模板在26像素宽的区域内有两个完全匹配的位置，相距6像素
+    pattern = rng.integers(0, 256, (20, 6), dtype=np.uint8)
+    template = np.tile(pattern, (1, 4))[:, :20]
+    screenshot[60:80, 120:146] = np.tile(pattern, (1, 5))[:, :26]
+    # 两个峰值都超过邻域半径，交并比为280/520，只保留得分高的
+    matches = ImageMatcher.find_all_templates(screenshot, template, threshold=0.9, min_distance=2)
+    assert len(matches) == 1
+    both = ImageMatcher.find_all_templates(screenshot, template, threshold=0.9, min_distance=2, overlap=0.6)
+    assert sorted((x, y) for x, y, _ in both) == [(130, 70), (136, 70)]
+    assert matches[0] == both[0]
+
+
+def test_scale_order_prefers_last_scale():
+    template = Template(np.zeros((10, 10), np.uint8))
+    full = [float(s) for s in np.linspace(0.5, 2.0, ImageMatcher.SCALE_STEPS)]
+    assert ImageMatcher._scale_order(template, (0.5, 2.0)) == (full, [])
+
+    template.last_scale = 1.21
+    scales, preferred = ImageMatcher._scale_order(template, (0.5, 2.0))
+    index = int(np.argmin([abs(s - 1.21) for s in full]))
+    # 最接近的尺度和两侧相邻尺度优先，其余保持原顺序
+    assert preferred == [full[index], full[index - 1], full[index + 1]]
+    assert scales == preferred + [s for s in full if s not in preferred]
+
+
+def test_learned_scale_tried_first(monkeypatch):
+    image = np.array(Image.open('tests/653.png'))
+    screenshot = cv2.resize(image, None, fx=1.2, fy=1.2, interpolation=cv2.INTER_AREA)
+    # 独立的模板实例，不受其他测试学到的尺度和区域影响
+    template = Template(np.array(Image.open('templates/arena_btn.png')), 'arena_btn.png')
+    resize = cv2.resize
+    tried = []
+
+    def counting_resize(src, *args, **kwargs):
+        if src is template.gray:
+            tried.append(kwargs.get('fx'))
+        return resize(src, *args, **kwargs)
+
+    monkeypatch.setattr(cv2, 'resize', counting_resize)
+    first = ImageMatcher.find_template(screenshot, template, 0.9, scale_match=True)
+    assert first is not None and len(tried) > 10
+    assert template.last_scale == tried[-1] and abs(template.last_scale - 1.2) < 0.05
+    assert template.scale_lookups == 0
+
+    tried.clear()
+    template.clear_matches()
+    # 第二次从上次成功的尺度开始，一次就命中
+    assert ImageMatcher.find_template(screenshot, template, 0.9, scale_match=True) == first
+    assert len(tried) == 1
+    assert (template.scale_hits, template.scale_lookups) == (1, 1)
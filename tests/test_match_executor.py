@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from MatchExecutor import MatchExecutor
+
+
+def test_map_keeps_order_and_raises():
+    executor = MatchExecutor(max_workers=2)
+    assert executor.map('a', lambda x: x * x, range(10)) == [x * x for x in range(10)]
+    with pytest.raises(ZeroDivisionError):
+        executor.map('a', lambda x: 1 / x, [1, 0])
+    executor.shutdown()
+
+
+def test_reentrant_map_runs_inline():
+    executor = MatchExecutor(max_workers=2, max_queued=2)
+
+    def outer(i):
+        # 任务中再调用map：所有工作线程都在这里等待时，排队的内层任务永远不会执行
+        inner = executor.map('a', lambda x: (x, threading.get_ident()), range(4))
+        assert all(ident == threading.get_ident() for _, ident in inner)
+        return i, [x for x, _ in inner]
+
+    result = []
+    thread = threading.Thread(target=lambda: result.extend(executor.map('a', outer, range(4))), daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), "嵌套map死锁"
+    assert result == [(i, [0, 1, 2, 3]) for i in range(4)]
+    executor.shutdown()
+
+
+def block_worker(executor):
+    """让唯一的工作线程卡在一个任务上，返回放行用的Event"""
+    started, release = threading.Event(), threading.Event()
+    executor.submit('blocker', lambda: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    return release
+
+
+def test_round_robin_between_devices():
+    executor = MatchExecutor(max_workers=1)
+    release = block_worker(executor)
+    order = []
+    # a提交的任务是b的三倍，b不必等a的任务全部执行完
+    futures = [executor.submit('a', order.append, 'a') for _ in range(6)]
+    futures += [executor.submit('b', order.append, 'b') for _ in range(2)]
+    assert executor.pending() == {'a': 6, 'b': 2}
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert order == ['a', 'b', 'a', 'b', 'a', 'a', 'a', 'a']
+    executor.shutdown()
+
+
+def test_submit_blocks_when_device_queue_full():
+    executor = MatchExecutor(max_workers=1, max_queued=2)
+    release = block_worker(executor)
+    executor.submit('a', lambda: 1)
+    executor.submit('a', lambda: 2)
+    submitted = threading.Event()
+    thread = threading.Thread(target=lambda: (executor.submit('a', lambda: 3), submitted.set()), daemon=True)
+    thread.start()
+    assert not submitted.wait(0.2), "队列已满时提交应阻塞"
+    # 其他设备的队列不受影响
+    assert executor.submit('b', lambda: 4) is not None
+    assert executor.pending() == {'a': 2, 'b': 1}
+    release.set()
+    assert submitted.wait(5)
+    executor.shutdown()
+
+
+def test_submit_from_worker_runs_inline_even_when_queue_full():
+    executor = MatchExecutor(max_workers=1, max_queued=1)
+    release = block_worker(executor)
+    inner = []
+
+    def outer():
+        # 此时a的队列已满，工作线程中提交的任务不排队也不阻塞
+        pending = executor.pending()
+        future = executor.submit('a', threading.get_ident)
+        inner.append((pending, future.done(), future.result(), threading.get_ident()))
+
+    future = executor.submit('b', outer)
+    queued = executor.submit('a', lambda: None)
+    release.set()
+    future.result(5)
+    queued.result(5)
+    pending, done, ident, worker_ident = inner[0]
+    assert pending == {'a': 1}
+    assert done and ident == worker_ident
+    executor.shutdown()
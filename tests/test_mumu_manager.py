@@ -0,0 +1,212 @@
+import random
+import struct
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from ImageMatcher import ImageMatcher
+from InputBatch import InputBatch
+from MumuManager import ADBController, MumuGameAutomator
+from ScreenCapture import Frame
+
+
+class FakeFrameADB:
+    """按顺序返回给定的画面，取完后一直返回最后一张"""
+
+    capture_loop = None
+
+    def __init__(self, images):
+        self.images = list(images)
+        self.grabs = 0
+
+    def get_frame(self):
+        image = self.images[min(self.grabs, len(self.images) - 1)]
+        self.grabs += 1
+        return Frame(image, seq=self.grabs)
+
+
+def make_automator(adb) -> MumuGameAutomator:
+    """不连接模拟器，只装上测试需要的部件"""
+    automator = MumuGameAutomator.__new__(MumuGameAutomator)
+    automator.adb = adb
+    automator.image_matcher = ImageMatcher()
+    return automator
+
+
+def noise(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+
+
+def raw_screencap(pixels: np.ndarray, pixel_format: int, colorspace: bool) -> bytes:
+    """按screencap的原始格式拼出输出：宽、高、像素格式，Android 9起再加色彩空间"""
+    height, width = pixels.shape[:2]
+    header = struct.pack('<3I', width, height, pixel_format)
+    if colorspace:
+        header += struct.pack('<I', 1)
+    return header + pixels.tobytes()
+
+
+@pytest.mark.parametrize('colorspace', [False, True])
+@pytest.mark.parametrize('pixel_format, channels', [(1, 4), (2, 4), (3, 3)])
+def test_parse_raw_screenshot_headers(pixel_format, channels, colorspace):
+    pixels = np.random.default_rng(0).integers(0, 256, (5, 7, channels), dtype=np.uint8)
+    data = bytearray(raw_screencap(pixels, pixel_format, colorspace))
+    image = ADBController._parse_raw_screenshot(data)
+    assert image.shape == (5, 7, channels)
+    assert np.array_equal(image, pixels)
+    # 直接引用接收缓冲区，不复制
+    assert np.shares_memory(image, np.frombuffer(data, np.uint8))
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'\x00' * 8, '过短'),
+    (struct.pack('<3I', 2, 2, 5) + b'\x00' * 16, '不支持的像素格式'),
+    # 像素数据少了一个字节，或多出不是色彩空间的8字节
+    (struct.pack('<3I', 2, 2, 1) + b'\x00' * 15, '长度异常'),
+    (struct.pack('<3I', 2, 2, 1) + b'\x00' * 24, '长度异常'),
+])
+def test_parse_raw_screenshot_rejects_bad_data(data, message):
+    with pytest.raises(Exception, match=message):
+        ADBController._parse_raw_screenshot(data)
+
+
+def test_wait_until_stable_returns_once_frames_stop_changing():
+    adb = FakeFrameADB([noise(0), noise(1), noise(2), noise(2)])
+    assert make_automator(adb).wait_until_stable(max_wait=5, interval=0.001)
+    # 第3帧与第4帧相同时立即返回，不再多取帧
+    assert adb.grabs == 4
+
+    adb = FakeFrameADB([noise(0), noise(1), noise(1), noise(1)])
+    assert make_automator(adb).wait_until_stable(max_wait=5, stable_frames=2, interval=0.001)
+    assert adb.grabs == 4
+
+
+def test_wait_until_stable_times_out_while_changing():
+    adb = FakeFrameADB([noise(i) for i in range(1000)])
+    assert not make_automator(adb).wait_until_stable(max_wait=0.05, interval=0.001)
+    assert adb.grabs > 2
+
+
+def test_wait_until_stable_only_compares_roi():
+    # 区域外一直变化(大地图动画)，区域内不变
+    images = [noise(i) for i in range(1000)]
+    for image in images:
+        image[:32] = noise(0)[:32]
+    adb = FakeFrameADB(images)
+    assert make_automator(adb).wait_until_stable(roi=(0, 0, 64, 32), max_wait=5, interval=0.001)
+    assert adb.grabs == 2
+
+
+class FakeInputADB:
+    """记录发到设备上的输入"""
+
+    def __init__(self):
+        self.calls = []
+
+    def input_batch(self):
+        return InputBatch(self)
+
+    def _run_input(self, script, timeout=5):
+        self.calls.append(('script', script))
+        return True
+
+    def tap(self, x, y):
+        self.calls.append(('tap', x, y))
+
+    def back(self):
+        self.calls.append(('back',))
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    # 随机坐标取区间中点，脚本内容确定
+    monkeypatch.setattr(random, 'randint', lambda a, b: (a + b) // 2)
+
+
+def test_compile_batch(no_jitter):
+    adb = FakeInputADB()
+    batch = make_automator(adb)._compile_batch([
+        {'type': 'tap', 'x': 10, 'y': 20, 'interval': 0.5},
+        {'type': 'swipe', 'start_x': 1, 'start_y': 2, 'end_x': 3, 'end_y': 4, 'duration': 300, 'interval': 0},
+        {'type': 'wait', 'duration': 1, 'interval': 0.2},
+        {'type': 'home', 'interval': 0},
+        {'type': 'random_tap', 'x1': 0, 'y1': 0, 'x2': 100, 'y2': 50, 'interval': 0},
+    ])
+    # 动作间隔变为设备上的sleep
+    assert batch.script() == ('input tap 10 20; sleep 0.5; input swipe 1 2 3 4 300; sleep 1.2; '
+                              'input keyevent 3; input tap 50 25')
+    assert batch.duration == pytest.approx(0.5 + 0.3 + 1.2)
+
+
+def test_execute_sequence_batches_runs_between_other_actions(no_jitter):
+    adb = FakeInputADB()
+    sequence = [
+        {'type': 'tap', 'x': 10, 'y': 20, 'interval': 0},
+        {'type': 'home', 'interval': 0},
+        # back走MuMuManager的go_back，不能编入批处理
+        {'type': 'back', 'interval': 0},
+        {'type': 'tap', 'x': 30, 'y': 40, 'interval': 0},
+        {'type': 'tap', 'x': 50, 'y': 60, 'interval': 0},
+        # 单个动作不值得编成批处理
+        {'type': 'back', 'interval': 0},
+        {'type': 'tap', 'x': 70, 'y': 80, 'interval': 0},
+    ]
+    make_automator(adb).execute_sequence(sequence, batch_inputs=True)
+    assert adb.calls == [
+        ('script', 'input tap 10 20; input keyevent 3'),
+        ('back',),
+        ('script', 'input tap 30 40; input tap 50 60'),
+        ('back',),
+        ('tap', 70, 80),
+    ]
+
+    # 默认逐个执行
+    adb.calls.clear()
+    make_automator(adb).execute_sequence(sequence[3:5])
+    assert adb.calls == [('tap', 30, 40), ('tap', 50, 60)]
+
+
+@pytest.fixture
+def foreground_adb(monkeypatch):
+    """不连接设备的ADBController，前台查询记录次数并返回游戏包名"""
+    adb = ADBController.__new__(ADBController)
+    adb._foreground_app = None
+    adb._foreground_time = 0.0
+    adb._foreground_lock = threading.Lock()
+    adb.queries = 0
+
+    def query():
+        adb.queries += 1
+        return 'com.gof.china'
+
+    monkeypatch.setattr(adb, 'query_foreground_app', query)
+    return adb
+
+
+def test_is_ready_uses_foreground_cache(foreground_adb):
+    adb = foreground_adb
+    automator = make_automator(adb)
+    assert automator.is_ready() and adb.queries == 1
+    # 有效期内直接读缓存
+    assert automator.is_ready() and automator.get_status() == {'is_running': True}
+    assert adb.queries == 1
+
+    # 缓存过期后重新查询
+    adb._foreground_time = time.monotonic() - adb.FOREGROUND_TTL - 1
+    assert automator.is_ready() and adb.queries == 2
+
+    # 启动、停止应用后作废缓存；监控线程的刷新更新缓存时间
+    adb.invalidate_foreground()
+    assert automator.is_ready() and adb.queries == 3
+    automator.refresh_status()
+    assert automator.is_ready() and adb.queries == 4
+
+
+def test_is_app_foreground_queries_by_default(foreground_adb):
+    adb = foreground_adb
+    adb.refresh_foreground()
+    assert adb.is_app_foreground('com.gof.china') and adb.queries == 2
+    assert not adb.is_app_foreground('other', max_age=adb.FOREGROUND_TTL)
+    assert adb.queries == 2
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+from PIL import Image
+
+from AppPaths import user_data_dir
+from OCRProcessor import OCRCache, OCRProcessor, get_ocr_cache
+from ScreenCapture import Frame
+
+
+def test_shared_cache_is_on_disk():
+    assert get_ocr_cache() is get_ocr_cache()
+    assert OCRProcessor().cache is get_ocr_cache()
+    assert get_ocr_cache()._db is not None
+    assert os.path.exists(os.path.join(user_data_dir('ocr'), 'ocr_cache.db'))
+
+
+def test_import_writes_nothing(tmp_path):
+    # 导入OCR和数字识别模块、创建处理器都不创建用户数据目录和缓存文件
+    env = dict(os.environ, WJDR_DATA_DIR=str(tmp_path / 'data'))
+    subprocess.run([sys.executable, '-c', 'import OCRProcessor, DigitReader; OCRProcessor.OCRProcessor()'],
+                   env=env, check=True, capture_output=True)
+    assert not (tmp_path / 'data').exists()
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    path = str(tmp_path / 'ocr_cache.db')
+    OCRCache(path=path).put('k', 'text')
+    cache = OCRCache(path=path)
+    assert cache.get('k') == (True, 'text')
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_unusable_path_falls_back_to_memory(tmp_path):
+    cache = OCRCache(path=str(tmp_path / 'missing' / 'ocr_cache.db'))
+    assert cache._db is None
+    cache.put('k', 'text')
+    assert cache.get('k') == (True, 'text')
+
+
+def test_key_covers_content_shape_and_parameters():
+    image = np.arange(24, dtype=np.uint8).reshape(4, 6)
+    key = OCRCache.key(image, 'qwen3-vl', 'prompt')
+    assert OCRCache.key(image.copy(), 'qwen3-vl', 'prompt') == key
+    # 像素字节相同但形状不同
+    assert OCRCache.key(image.reshape(6, 4), 'qwen3-vl', 'prompt') != key
+    assert OCRCache.key(image + 1, 'qwen3-vl', 'prompt') != key
+    assert OCRCache.key(image, 'tesseract:eng:', 'prompt') != key
+    assert OCRCache.key(image, 'qwen3-vl', 'other prompt') != key
+    assert OCRCache.key(image, 'qwen3-vl', 'prompt', preprocess=True) != key
+
+
+def test_frame_key_uses_content():
+    image = np.array(Image.open('tests/301.png'))
+    assert OCRCache.digest(Frame(image, seq=1)) == OCRCache.digest(Frame(image.copy(), seq=2))
+    assert OCRCache.digest(Frame(image)[:100]) != OCRCache.digest(Frame(image))
+
+
+def test_memory_lru_eviction():
+    cache = OCRCache(size=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == (True, 'A')
+    cache.put('c', 'C')
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 'A')
+    assert cache.get('c') == (True, 'C')
+    assert cache.stats() == {'hits': 3, 'disk_hits': 0, 'misses': 1, 'hit_rate': 0.75}
+
+
+def test_empty_results_not_cached():
+    cache = OCRCache()
+    cache.put('a', '')
+    assert cache.get('a') == (False, None)
+
+
+def test_disk_entries_trimmed(tmp_path):
+    cache = OCRCache(size=0, path=str(tmp_path / 'ocr_cache.db'), max_disk_entries=5)
+    for i in range(100):
+        cache.put(str(i), str(i))
+    assert cache._db.execute('SELECT COUNT(*) FROM ocr').fetchone()[0] == 5
+    assert cache.get('99') == (True, '99')
+    cache.clear()
+    assert cache.get('99') == (False, None)
@@ -0,0 +1,103 @@
+import base64
+import io
+import json
+import re
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import OCRProcessor as ocr
+from VLMClient import VLMClient
+from tests.fakes import FakeOllama
+
+REGIONS = {'timer': (236, 262, 390, 302), 'left': (86, 262, 236, 302), 'below': (236, 302, 390, 342)}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeOllama()
+    client = VLMClient(url=server.url, read_timeout=2.0, max_retries=0, backoff=0.01)
+    monkeypatch.setattr(ocr, 'vlm_client', client)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def processor():
+    return ocr.OCRProcessor(cache=ocr.OCRCache())
+
+
+@pytest.fixture
+def image():
+    return np.array(Image.open('tests/671.png'))
+
+
+def batch_reply(answers):
+    """批量提示词按编号返回answers中的文字，单区域提示词返回'single'"""
+    def reply(payload):
+        count = len(re.findall(r'"\d+"', payload['prompt']))
+        if count == 0:
+            return 'single'
+        return answers(count)
+    return reply
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('{"1": "01:25:56", "2": "x"}', {1: '01:25:56', 2: 'x'}),
+    ('```json\n{"1": " a ", "2": null}\n```', {1: 'a', 2: ''}),
+    ('识别结果: {"1": ["第一行", "第二行"], "name": "skip"} 完毕', {1: '第一行\n第二行'}),
+    ('{"1": 123}', {1: '123'}),
+    ('没有JSON', None),
+    ('{"1": "a",}', None),
+    ('[1, 2]', None),
+])
+def test_parse_regions_response(text, expected):
+    assert ocr.OCRProcessor.parse_regions_response(text) == expected
+
+
+def test_regions_batched_in_one_request(server, processor, image):
+    server.reply = batch_reply(lambda count: json.dumps({str(i): f'text{i}' for i in range(1, count + 1)}))
+    assert processor.extract_regions(image, REGIONS) == {'timer': 'text1', 'left': 'text2', 'below': 'text3'}
+    assert len(server.payloads) == 1
+    assert len(server.payloads[0]['images']) == 1
+
+    # 批量结果与extract_text共用缓存
+    x1, y1, x2, y2 = REGIONS['left']
+    assert processor.extract_text(image, region=(x1, y1, x2, y2)) == 'text2'
+    assert processor.extract_regions(image, REGIONS)['below'] == 'text3'
+    assert len(server.payloads) == 1
+
+
+def test_unparsable_reply_falls_back_per_region(server, processor, image):
+    server.reply = batch_reply(lambda count: '看不清')
+    assert processor.extract_regions(image, REGIONS) == {name: 'single' for name in REGIONS}
+    assert len(server.payloads) == 1 + len(REGIONS)
+
+
+def test_missing_regions_recognised_individually(server, processor, image):
+    server.reply = batch_reply(lambda count: '{"1": "a", "3": "c"}')
+    assert processor.extract_regions(image, REGIONS) == {'timer': 'a', 'left': 'single', 'below': 'c'}
+    assert len(server.payloads) == 2
+
+
+def test_failed_request_not_retried_per_region(server, processor, image):
+    server.mode = 'error'
+    assert processor.extract_regions(image, REGIONS) == {name: '' for name in REGIONS}
+    assert len(server.payloads) == 1
+
+
+def test_single_region_uses_extract_text(server, processor, image):
+    server.reply = batch_reply(lambda count: '{}')
+    assert processor.extract_regions(image, {'timer': REGIONS['timer']}) == {'timer': 'single'}
+    assert len(server.payloads) == 1
+
+
+@pytest.mark.parametrize('fmt, mode, image_format', [('time', 'L', 'JPEG'), ('number', 'RGB', 'PNG')])
+def test_compact_encoding_only_for_timer_digits(monkeypatch, server, processor, image, fmt, mode, image_format):
+    # 本地识别置信度不足时回退到VLM，只有计时格式使用紧凑编码
+    monkeypatch.setattr(ocr, 'digit_reader', ocr.DigitReader())
+    processor.read_digits(image, REGIONS['timer'], fmt, min_confidence=1.1)
+    sent = Image.open(io.BytesIO(base64.b64decode(server.payloads[0]['images'][0])))
+    assert (sent.mode, sent.format) == (mode, image_format)
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import numpy as np
+
+from ScreenCapture import Frame, FrameRingBuffer, ScreenCaptureLoop
+
+
+def image(value: int) -> np.ndarray:
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def test_ring_buffer_keeps_latest_frames():
+    buffer = FrameRingBuffer(size=3)
+    assert buffer.latest() is None
+    for i in range(5):
+        buffer.push(image(i))
+    assert [frame.seq for frame in buffer.frames()] == [3, 4, 5]
+    assert buffer.latest().seq == 5 and buffer.latest()[0, 0, 0] == 4
+    # 已是Frame的沿用其序号和时间戳
+    frame = buffer.push(Frame(image(9), seq=42, timestamp=1.0))
+    assert (frame.seq, frame.timestamp) == (42, 1.0)
+    assert buffer.latest() is frame
+
+
+def test_wait_newer():
+    buffer = FrameRingBuffer()
+    buffer.push(image(0))
+    # 已有更新的帧时立即返回，没有时超时返回None
+    assert buffer.wait_newer(0, timeout=0).seq == 1
+    assert buffer.wait_newer(1, timeout=0.05) is None
+
+    timer = threading.Timer(0.05, buffer.push, args=(image(1),))
+    timer.start()
+    assert buffer.wait_newer(1, timeout=5).seq == 2
+    timer.join()
+
+
+def test_wait_after_ignores_frames_captured_before():
+    buffer = FrameRingBuffer()
+    buffer.push(image(0), timestamp=10.0)
+    assert buffer.wait_after(10.0, timeout=0).timestamp == 10.0
+    # 输入事件之后才开始采集的帧才算数，序号更新但采集更早的帧不行
+    buffer.push(image(1), timestamp=9.0)
+    assert buffer.wait_after(10.0, timeout=0.05) is None
+
+    timer = threading.Timer(0.05, buffer.push, args=(image(2), 11.0))
+    timer.start()
+    assert buffer.wait_after(10.5, timeout=5).timestamp == 11.0
+    timer.join()
+
+
+def test_capture_loop_stamps_capture_start():
+    starts = []
+
+    def capture():
+        starts.append(time.time())
+        time.sleep(0.02)
+        return image(len(starts))
+
+    loop = ScreenCaptureLoop(capture, buffer_size=2)
+    loop.start()
+    try:
+        assert loop.is_running
+        since = time.time()
+        frame = loop.buffer.wait_after(since, timeout=5)
+        # 时间戳是开始截图的时间，帧内容不早于该时刻
+        assert frame is not None and frame.timestamp >= since
+        assert frame.timestamp <= starts[frame[0, 0, 0] - 1]
+        assert len(loop.buffer.frames()) <= 2
+    finally:
+        loop.stop()
+    assert not loop.is_running
+
+
+def test_capture_loop_survives_errors(capsys):
+    calls = []
+
+    def capture():
+        calls.append(None)
+        if len(calls) == 1:
+            raise OSError('设备断开')
+        return image(0)
+
+    loop = ScreenCaptureLoop(capture, interval=0.01)
+    loop.start()
+    try:
+        # 失败后等待1秒再重试
+        assert loop.buffer.wait_newer(0, timeout=5) is not None
+    finally:
+        loop.stop()
+    assert '连续截图失败' in capsys.readouterr().out
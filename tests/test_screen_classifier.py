@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from MumuManager import MumuGameAutomator
+from ScreenCapture import Frame
+from ScreenClassifier import ScreenClassifier
+
+SCREENS = {
+    'world': ['templates/world_search.png', 'templates/intelligence_btn.png'],
+    'town': ['templates/orders.png'],
+    'arena_result': ['templates/arena_win.png', 'templates/arena_battle_record.png'],
+    'logged_out': ['templates/reconnect.png'],
+}
+
+
+def load_frame(name: int) -> Frame:
+    return Frame(np.array(Image.open(f'tests/{name}.png')))
+
+
+def compose_frame(paths) -> Frame:
+    """把锚点模板贴到不含任何锚点的截图(竞技场结果)上，用于tests/中没有截图的界面"""
+    image = Image.open('tests/301.png').convert('RGBA')
+    for i, path in enumerate(paths):
+        image.alpha_composite(Image.open(path).convert('RGBA'), (100 + 400 * i, 1000))
+    return Frame(np.array(image))
+
+
+@pytest.fixture
+def automator_classifier():
+    classifier = ScreenClassifier(MumuGameAutomator.SCREENS)
+    # 模板进程内共享，清除其他测试学到的搜索区域
+    for template in classifier._templates:
+        template.clear_matches()
+    return classifier
+
+
+def test_shared_anchors_indexed_once():
+    screens = {'a': ['templates/arena_win.png'], 'b': ['templates/arena_win.png', 'templates/reconnect.png']}
+    classifier = ScreenClassifier(screens)
+    assert len(classifier._fingerprints) == 2
+    assert classifier._screen_anchors == {'a': [0], 'b': [0, 1]}
+
+
+def test_classify():
+    classifier = ScreenClassifier(SCREENS)
+    assert classifier.classify(load_frame(301)) == 'arena_result'
+    assert classifier.classify(Frame(np.zeros((1920, 1080, 3), np.uint8))) is None
+
+
+def test_verifies_candidates_in_ranked_order():
+    classifier = ScreenClassifier(SCREENS)
+    frame = load_frame(301)
+    # 粗比对排第一的界面未通过确认时继续确认下一个
+    classifier.scores = lambda screenshot: [('logged_out', 0.99), ('arena_result', 0.9), ('town', 0.5)]
+    assert classifier.classify(frame) == 'arena_result'
+
+
+@pytest.mark.parametrize('name', ['world', 'island', 'logged_out', 'my_town'])
+def test_automator_screens_composed(automator_classifier, name):
+    frame = compose_frame(MumuGameAutomator.SCREENS[name])
+    assert automator_classifier.classify(frame) == name
+    assert automator_classifier.classify_all(frame) == [name]
+
+
+def test_automator_town_and_sidebar(automator_classifier):
+    assert automator_classifier.classify_all(load_frame(666)) == ['town']
+    # 城镇上打开侧边栏时两个界面同时识别出来
+    assert sorted(automator_classifier.classify_all(load_frame(683))) == ['sidebar', 'town']
+
+
+def test_world_needs_all_anchors(automator_classifier):
+    frame = compose_frame(MumuGameAutomator.SCREENS['world'][:1])
+    assert 'world' not in automator_classifier.classify_all(frame)
+
+
+def test_screen_with_missing_anchor_skipped(automator_classifier, capsys):
+    # templates/中没有position_share.png，该界面不参与识别，其他界面不受影响
+    classifier = ScreenClassifier({'position_share': ['templates/position_share.png'],
+                                   'town': ['templates/orders.png']})
+    assert '无法加载' in capsys.readouterr().out
+    assert list(classifier._screen_anchors) == ['town']
+    assert 'position_share' not in automator_classifier._screen_anchors
+    assert classifier.classify(load_frame(666)) == 'town'
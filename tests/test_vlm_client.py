@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from VLMClient import VLMClient
+from tests.fakes import FakeOllama
+
+
+@pytest.fixture
+def server():
+    server = FakeOllama()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server, **kwargs):
+    options = dict(read_timeout=2.0, max_retries=2, backoff=0.01, max_backoff=0.02,
+                   failure_threshold=3, reset_timeout=60)
+    options.update(kwargs)
+    return VLMClient(url=server.url, **options)
+
+
+def test_generate(server):
+    client = make_client(server)
+    assert client.generate('ocr', ['aW1n'], options={'temperature': 0}) == '01:25:56'
+    payload = server.payloads[-1]
+    assert payload['images'] == ['aW1n'] and payload['options'] == {'temperature': 0}
+    assert payload['stream'] is False
+    assert client.latency_stats()['default']['count'] == 1
+
+
+def test_retries_transient_errors(server):
+    client = make_client(server)
+    server.fail_next = 2
+    assert client.generate('ocr') == '01:25:56'
+    assert len(server.payloads) == 3
+
+
+def test_gives_up_after_max_retries(server):
+    client = make_client(server, max_retries=1)
+    server.mode = 'error'
+    assert client.generate('ocr', prompt_type='ocr_text') == ''
+    assert len(server.payloads) == 2
+    assert client.latency_stats()['ocr_text']['failures'] == 1
+
+
+def test_client_errors_not_retried(server):
+    client = make_client(server)
+    server.mode = 'error'
+    server.error_status = 400
+    assert client.generate('ocr') == ''
+    assert len(server.payloads) == 1
+
+
+def test_retry_empty(server):
+    client = make_client(server)
+    server.reply = lambda payload: ''
+    assert client.generate('ocr') == ''
+    assert len(server.payloads) == 1
+    assert client.generate('ocr', retry_empty=True) == ''
+    assert len(server.payloads) == 4
+
+
+def test_read_timeout(server):
+    client = make_client(server, read_timeout=0.2, max_retries=0)
+    server.mode = 'hang'
+    start = time.monotonic()
+    assert client.generate('ocr') == ''
+    assert time.monotonic() - start < 2
+
+
+def test_circuit_breaker(server):
+    client = make_client(server, max_retries=0, failure_threshold=2, reset_timeout=0.3)
+    server.mode = 'error'
+    client.generate('ocr')
+    assert not client.is_open
+    client.generate('ocr')
+    assert client.is_open
+
+    # 熔断期间不发请求
+    assert client.generate('ocr') == ''
+    assert len(server.payloads) == 2
+
+    # 到期后放行一个试探请求，成功则恢复
+    time.sleep(0.35)
+    server.mode = 'ok'
+    assert client.generate('ocr') == '01:25:56'
+    assert not client.is_open
+    assert len(server.payloads) == 3
+
+
+def test_failed_probe_reopens(server):
+    client = make_client(server, max_retries=0, failure_threshold=1, reset_timeout=0.2)
+    server.mode = 'error'
+    client.generate('ocr')
+    time.sleep(0.25)
+    client.generate('ocr')
+    assert len(server.payloads) == 2
+    assert client.is_open
@@ -0,0 +1,73 @@
+import itertools
+
+import pytest
+
+import WaitStrategy as ws
+from WaitStrategy import ExponentialBackoff, ImmediateProbe, WaitStrategy
+
+
+def test_wait_strategy_is_abstract():
+    with pytest.raises(TypeError):
+        WaitStrategy()
+
+
+def test_intervals():
+    assert list(itertools.islice(ImmediateProbe(0.5).intervals(), 3)) == [0.5, 0.5, 0.5]
+    assert list(itertools.islice(ExponentialBackoff(0.1, 2, 0.3).intervals(), 4)) == [0.1, 0.2, 0.3, 0.3]
+
+
+class FakeClock:
+    """替代WaitStrategy模块中的time，sleep只推进时间"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeADB:
+    def __init__(self, clock):
+        self.clock = clock
+        self.grabs = []
+
+    def get_frame(self):
+        self.grabs.append(self.clock.now)
+        return len(self.grabs)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ws, 'time', clock)
+    return clock
+
+
+def test_frames_probe_immediately_and_clamp_to_deadline(clock):
+    adb = FakeADB(clock)
+    frames = list(ExponentialBackoff(0.1, 2, 1.0).frames(adb, timeout=1.0))
+    # 第一帧不等待；最后一次等待截断到截止时间，不会睡过头
+    assert adb.grabs[0] == 0.0
+    assert clock.sleeps == pytest.approx([0.1, 0.2, 0.4, 0.3])
+    assert adb.grabs[-1] == pytest.approx(1.0)
+    assert frames == [1, 2, 3, 4, 5]
+
+
+def test_frames_timeout_zero_and_negative(clock):
+    adb = FakeADB(clock)
+    assert list(ImmediateProbe(1.0).frames(adb, timeout=0)) == [1]
+    assert list(ImmediateProbe(1.0).frames(adb, timeout=-1)) == []
+    assert clock.sleeps == []
+
+
+def test_frames_stop_when_consumer_stops(clock):
+    adb = FakeADB(clock)
+    for frame in ImmediateProbe(0.5).frames(adb, timeout=10):
+        if frame == 2:
+            break
+    assert clock.sleeps == [0.5]